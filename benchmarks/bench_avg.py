@@ -0,0 +1,52 @@
+"""Compare the average cost loop with the NumPy scan.
+
+Usage: python -m benchmarks.bench_avg [transactions ...]
+
+Uses the DCA-like history of bench_fifo. The scan times include building the
+AvgCost rows, the way view shows them.
+"""
+
+import sys
+import time
+from typing import Callable
+
+from hledger_lots import avg
+from hledger_lots.txn_columns import TxnColumns
+
+from .bench_fifo import dca_history
+
+
+def loop_history(txns: TxnColumns):
+    book = avg.AvgBook(txns=txns)
+    for index in range(len(txns)):
+        book.apply_index(index)
+    return book.history
+
+
+def scan_history(txns: TxnColumns):
+    return avg.AvgBook.from_txns(txns).history
+
+
+def measure(func: Callable, txns, repeat: int = 3) -> float:
+    """Best time of repeat runs"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(txns)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000]
+    print(f"{'transactions':>12} {'loop':>10} {'scan':>10}")
+
+    for size in sizes:
+        txns = TxnColumns.from_txns(dca_history(size))
+        loop = measure(loop_history, txns)
+        scan = measure(scan_history, txns)
+        print(f"{size:>12,} {loop:>9.3f}s {scan:>9.3f}s")
+
+
+if __name__ == "__main__":
+    main()
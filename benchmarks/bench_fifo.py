@@ -0,0 +1,88 @@
+"""Compare the single pass FIFO queue with the previous per-sell rescan.
+
+Usage: python -m benchmarks.bench_fifo [transactions ...]
+
+A DCA-like history is generated in memory: a buy every day and a partial sell
+of some earlier lots every few days, about 5 buys for every 2 sells.
+"""
+
+import copy
+import sys
+import time
+from datetime import date, timedelta
+from typing import Callable, List
+
+from hledger_lots import fifo
+from hledger_lots.lib import AdjustedTxn
+from hledger_lots.txn_columns import TxnColumns
+
+
+def dca_history(size: int) -> List[AdjustedTxn]:
+    start = date(2000, 1, 1)
+    txns: List[AdjustedTxn] = []
+    price = 10.0
+    for i in range(size):
+        day = (start + timedelta(days=i * 5 // 7)).isoformat()
+        if i % 7 in (3, 6):
+            txns.append(AdjustedTxn(day, price, "USD", -1.5, "Asset:Stocks"))
+        else:
+            price = round(price * 1.001, 2)
+            txns.append(AdjustedTxn(day, price, "USD", 1.0, "Asset:Stocks"))
+    return txns
+
+
+def rescan_get_lots(txns: List[AdjustedTxn]) -> List[AdjustedTxn]:
+    """The engine before the FIFO queue: every sell scans all buys again"""
+    local_txns = copy.deepcopy(txns)
+    buys = [txn for txn in local_txns if txn.qtty >= 0]
+    sells = [txn for txn in local_txns if txn.qtty < 0]
+
+    buys_lot: List[AdjustedTxn] = buys if len(sells) == 0 else []
+    for sell in sells:
+        previous_buys = [txn for txn in buys if txn.date <= sell.date]
+        if abs(sell.qtty) > abs(sum(txn.qtty for txn in previous_buys)):
+            raise ValueError(f"Short sell not allowed for sell {sell}")
+        later_buys = [txn for txn in buys if txn.date > sell.date]
+        sell_qtty = abs(sell.qtty)
+
+        i = 0
+        while i < len(previous_buys) and sell_qtty > 0:
+            previous_buy = previous_buys[i]
+            if sell_qtty >= previous_buy.qtty:
+                sell_qtty -= previous_buy.qtty
+                previous_buys[i].qtty = 0
+            else:
+                previous_buys[i].qtty -= sell_qtty
+                sell_qtty = 0
+            i += 1
+
+        buys_lot = [*previous_buys, *later_buys]
+
+    return buys_lot
+
+
+def queue_get_lots(txns: TxnColumns):
+    return fifo.get_lots(txns, check=False)
+
+
+def measure(func: Callable, txns) -> float:
+    start = time.perf_counter()
+    func(txns)
+    return time.perf_counter() - start
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000, 2_000, 4_000, 8_000]
+    print(f"{'transactions':>12} {'rescan':>10} {'queue':>10}")
+
+    for size in sizes:
+        txns = dca_history(size)
+        columns = TxnColumns.from_txns(txns)
+
+        queue = f"{measure(queue_get_lots, columns):.3f}s"
+        rescan = f"{measure(rescan_get_lots, txns):.3f}s" if size <= 20_000 else "-"
+        print(f"{size:>12,} {rescan:>10} {queue:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Compare the buffered `hledger print` JSON ingestion with the streaming one.
+
+Usage: python -m benchmarks.bench_hl [transactions]
+
+The JSON is generated in memory with the same shape as `hledger print -O json`,
+so hledger itself is not needed.
+"""
+
+import io
+import json
+import sys
+import time
+import tracemalloc
+from typing import Callable, List
+
+from hledger_lots.hl import adjust_txn, iter_json_array, json_loads, txns_list2txns
+
+
+def amount(commodity: str, mantissa: int, places: int, price=None):
+    return {
+        "acommodity": commodity,
+        "aquantity": {
+            "decimalMantissa": mantissa,
+            "decimalPlaces": places,
+            "floatingPoint": mantissa / 10**places,
+        },
+        "aprice": price,
+        "astyle": {
+            "ascommodityside": "R",
+            "ascommodityspaced": True,
+            "asdecimalpoint": ".",
+            "asdigitgroups": None,
+            "asprecision": places,
+        },
+    }
+
+
+def hledger_json(size: int) -> bytes:
+    txns = []
+    for i in range(size):
+        price = {"tag": "UnitPrice", "contents": amount("USD", 10000 + i, 2)}
+        postings = [
+            ("Asset:Stocks", [amount(f"C{i % 50}", 3 + i % 7, 0, price)]),
+            ("Asset:Bank", [amount("USD", -(10000 + i) * 3, 2)]),
+        ]
+        txns.append(
+            {
+                "tdate": f"{2000 + i % 20}-01-{1 + i % 28:02d}",
+                "tdescription": f"Buy C{i % 50}",
+                "tcomment": "",
+                "ttags": [],
+                "tpostings": [
+                    {"paccount": acct, "pamount": amts, "pcomment": "", "ptags": []}
+                    for acct, amts in postings
+                ],
+            }
+        )
+    return json.dumps(txns, indent=2).encode()
+
+
+def buffered(raw: bytes):
+    txns_list = json.loads(raw.decode("utf8"))
+    return [adjust_txn(txn) for _, txn in txns_list2txns(txns_list)]
+
+
+def streaming(raw: bytes):
+    txns_list = (json_loads(txn) for txn in iter_json_array(io.BytesIO(raw)))
+    return [adjust_txn(txn) for _, txn in txns_list2txns(txns_list)]
+
+
+def measure(func: Callable[[bytes], List], raw: bytes):
+    start = time.perf_counter()
+    func(raw)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    func(raw)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    raw = hledger_json(size)
+    print(f"{size:,} transactions, {len(raw) / 2**20:,.1f} MiB of JSON")
+    print(f"json backend: {json_loads.__module__}")
+
+    for name, func in [("buffered", buffered), ("streaming", streaming)]:
+        elapsed, peak = measure(func, raw)
+        print(f"{name:<10} {elapsed:8.3f} s   peak {peak / 2**20:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
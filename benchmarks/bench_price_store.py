@@ -0,0 +1,73 @@
+"""Compare reading the market prices as text with opening the price store.
+
+Usage: python -m benchmarks.bench_price_store [prices ...]
+
+Writes a prices journal with a daily price for 100 tickers. text parses the
+output of hledger prices (without running hledger), native reads the journal
+with the native parser and store opens the memory mapped price store built
+from it, then each one looks up the last price of every ticker.
+"""
+
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable, Tuple
+
+from hledger_lots.journal import Journal
+from hledger_lots.price_index import PriceIndex
+from hledger_lots.price_store import load_price_index
+
+TICKERS = [f"T{chr(65 + i // 26)}{chr(65 + i % 26)}" for i in range(100)]
+
+
+def write_prices(path: Path, size: int):
+    start = date(2000, 1, 3)
+    with open(path, "w") as f:
+        for i in range(size // len(TICKERS)):
+            day = (start + timedelta(days=i)).isoformat()
+            for n, ticker in enumerate(TICKERS):
+                f.write(f"P {day} {ticker} {10 + n + i * 0.01:.2f} USD\n")
+
+
+def read_native(files: Tuple[str, ...]) -> PriceIndex:
+    return PriceIndex.from_rows(Journal(files).get_price_rows())
+
+
+def measure(func: Callable[[], PriceIndex], repeat: int = 3) -> float:
+    """Best time of repeat runs"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        price_index = func()
+        for ticker in TICKERS:
+            price_index.get_last(ticker)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+    print(f"{'prices':>10} {'text':>10} {'native':>10} {'store':>10}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.environ["HLEDGER_LOTS_CACHE_DIR"] = tmp_dir
+        for size in sizes:
+            path = Path(tmp_dir, f"prices-{size}.journal")
+            write_prices(path, size)
+            files = (str(path),)
+            prices_txt = path.read_text()
+
+            text = measure(lambda: PriceIndex.from_hledger(prices_txt), repeat=1)
+            native = measure(lambda: read_native(files), repeat=1)
+            load_price_index(files, "native", lambda: read_native(files))
+            store = measure(
+                lambda: load_price_index(files, "native", lambda: read_native(files))
+            )
+            print(f"{size:>10,} {text:>9.3f}s {native:>9.3f}s {store:>9.4f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Compare the warm-started xirr history sweep with cold solves.
+
+Usage: python -m benchmarks.bench_xirr_history [transactions ...]
+
+Uses the DCA-like history of bench_fifo with a market price every day. cold
+calls lib.get_xirr for each date on the transactions up to it, sweep adds the
+cash flows while moving forward but solves each date from scratch, and warm
+also starts each solve from the rate of the previous date.
+"""
+
+import sys
+import time
+from datetime import date, timedelta
+from typing import Callable, List, Tuple
+
+from hledger_lots import lib
+from hledger_lots.lib import AdjustedTxn
+from hledger_lots.txn_columns import TxnColumns
+from hledger_lots.xirr_history import sweep_xirrs
+
+from .bench_fifo import dca_history
+
+Prices = List[Tuple[str, float]]
+
+
+def daily_prices(txns: List[AdjustedTxn]) -> Prices:
+    start = date.fromisoformat(txns[0].date)
+    days = (date.fromisoformat(txns[-1].date) - start).days + 1
+    return [
+        ((start + timedelta(days=i)).isoformat(), 10 * 1.0007**i + i % 5 * 0.1)
+        for i in range(days)
+    ]
+
+
+def cold_history(txns: List[AdjustedTxn], prices: Prices):
+    rates = []
+    n = 0
+    for price_date, price in prices:
+        while n < len(txns) and txns[n].date <= price_date:
+            n += 1
+        rates.append(lib.get_xirr(price, date.fromisoformat(price_date), txns[:n]))
+    return rates
+
+
+def sweep_history(txns: List[AdjustedTxn], prices: Prices):
+    return sweep_xirrs(TxnColumns.from_txns(txns), prices, warm=False)
+
+
+def warm_history(txns: List[AdjustedTxn], prices: Prices):
+    return sweep_xirrs(TxnColumns.from_txns(txns), prices)
+
+
+def measure(func: Callable, txns, prices, repeat: int = 3) -> float:
+    """Best time of repeat runs"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(txns, prices)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [500, 2_000, 5_000]
+    print(f"{'transactions':>12} {'dates':>7} {'cold':>10} {'sweep':>10} {'warm':>10}")
+
+    for size in sizes:
+        txns = dca_history(size)
+        prices = daily_prices(txns)
+        cold = measure(cold_history, txns, prices, repeat=1)
+        sweep = measure(sweep_history, txns, prices)
+        warm = measure(warm_history, txns, prices)
+        print(
+            f"{size:>12,} {len(prices):>7,} {cold:>9.3f}s {sweep:>9.3f}s {warm:>9.3f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,38 @@
-import subprocess
 from dataclasses import dataclass
 from datetime import date, datetime
 from decimal import Decimal
-from typing import List, Optional
-
-from hledger_lots.hl import adjust_txn
+from fractions import Fraction
+from typing import TYPE_CHECKING, List, Optional, Tuple, Union
 
 from . import checks
-from .lib import AdjustedTxn, CostMethodError, adjust_commodity, get_xirr
+from .journal import Posting
+from .lib import AdjustedTxn, CostMethodError, TxnLike, get_xirr
+from .lot_book import LotBook
+from .txn_columns import (
+    EXACT_PLACES,
+    TxnColumns,
+    TxnsLike,
+    as_number,
+    div_round,
+    from_exact,
+    ordinal2date,
+    to_places,
+)
+from .txn_print import PrintPosting, PrintTxn, format_txn, to_amount
+
+if TYPE_CHECKING:
+    import numpy as np
+else:
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+
+HAS_NUMPY = np is not None
+
+SCAN_THRESHOLD = 256
+
+SCALE_STEP = 64
 
 
 @dataclass
@@ -18,11 +43,12 @@ class AvgCost:
     avg_cost: float = 0
 
 
-def check_sell(sell: AdjustedTxn, avg_cost: float, check: bool):
+def check_sell(sell: TxnLike, avg_cost: float, check: bool):
     if not check:
         return
 
-    decimals_price = Decimal(str(sell.price)).as_tuple().exponent
+    price = int(sell.price) if float(sell.price).is_integer() else sell.price
+    decimals_price = Decimal(str(price)).as_tuple().exponent
     decimals_avg = Decimal(str(avg_cost)).as_tuple().exponent
     if type(decimals_price) == int and type(decimals_avg) == int:
         decimals = min(abs(decimals_price), abs(decimals_avg))
@@ -34,43 +60,292 @@ def check_sell(sell: AdjustedTxn, avg_cost: float, check: bool):
     pass
 
 
-def get_avg_cost(
-    txns: List[AdjustedTxn], check: bool, until: Optional[date] = None
-) -> List[AvgCost]:
-    if until:
-        included_txns = [
-            txn
-            for txn in txns
-            if datetime.strptime(txn.date, "%Y-%m-%d").date() <= until
-        ]
-    else:
-        included_txns = txns
+def check_sell_exact(txns: TxnColumns, index: int, avg_cost: int, check: bool):
+    """check_sell with the exact mantissas of the sale price and avg_cost"""
+    if not check:
+        return
+
+    sell_price = txns.get_unit_price(index)
+    tolerance = 10 ** max(EXACT_PLACES - txns.price_places[index], 0)
+    if abs(sell_price - avg_cost) > tolerance:
+        raise CostMethodError(txns[index], from_exact(avg_cost), txns[index].base_cur)
+
+
+def as_numbers(values: "np.ndarray") -> List[Union[int, float]]:
+    """as_number of every value"""
+    integral = (values == np.trunc(values)) & (np.abs(values) < 2**63)
+    int_values = np.where(integral, values, 0).astype(np.int64)
+    return [
+        int_value if is_integral else value
+        for value, int_value, is_integral in zip(
+            values.tolist(), int_values.tolist(), integral.tolist()
+        )
+    ]
+
+
+def scan_avg_cost(qttys: "np.ndarray", prices: "np.ndarray"):
+    """
+    Running total quantity, amount and average cost of transactions given as
+    quantity and unit price arrays, or None when a sale takes the quantity
+    from positive to negative.
+
+    A buy adds qtty * price to the amount and a sale multiplies it by the
+    quantity left over the quantity before it, keeping the average cost. This
+    linear recurrence is solved with cumulative sums and products, restarted
+    at sales of everything and when the product drifts SCALE_STEP orders of
+    magnitude (in e) away, so it doesn't overflow or lose precision.
+    """
+    size = len(qttys)
+    total_qtty = np.cumsum(qttys)
+    prev_qtty = np.concatenate(([0.0], total_qtty[:-1]))
+    sells = qttys < 0
+
+    ratio = np.ones_like(qttys)
+    held = sells & (prev_qtty != 0)
+    ratio[held] = total_qtty[held] / prev_qtty[held]
+    if np.any(ratio < 0):
+        return None
+
+    added = np.where(sells, 0.0, qttys * prices)
+    log_scale = np.cumsum(np.log(np.where(ratio == 0, 1.0, ratio)))
+    step = np.floor(log_scale / SCALE_STEP)
+    restarts = (ratio == 0) | (np.diff(step, prepend=np.nan) != 0)
+    starts = np.flatnonzero(restarts).tolist()
+
+    total_amount = np.empty_like(qttys)
+    amount = 0.0
+    for start, end in zip(starts, [*starts[1:], size]):
+        scale = np.exp(log_scale[start:end] - log_scale[start])
+        weighted = added[start:end] / scale
+        weighted[0] = amount * ratio[start] + added[start]
+        total_amount[start:end] = scale * np.cumsum(weighted)
+        amount = total_amount[end - 1]
+
+    avg_cost = np.zeros_like(qttys)
+    nonzero = total_qtty != 0
+    avg_cost[nonzero] = total_amount[nonzero] / total_qtty[nonzero]
+    return total_qtty, total_amount, avg_cost
+
+
+class AvgBook(LotBook):
+    """
+    Running total quantity, amount and average cost, one row per transaction.
+    When exact, the quantity is a mantissa of the txns scale, the amount and
+    average cost are mantissas of 10**-EXACT_PLACES and the cost of each sale
+    is rounded to it.
+    """
+
+    def __init__(
+        self,
+        check: bool = False,
+        exact: bool = False,
+        txns: Optional[TxnColumns] = None,
+        realized: bool = False,
+    ) -> None:
+        super().__init__(check, exact, txns, realized)
+        self.total_qtty: Union[int, float] = 0
+        self.total_amount: Union[int, float] = 0
+        self.avg_cost: Union[int, float] = 0
+        self.rows: List[AvgCost] = []
+        self.scan: Optional[Tuple["np.ndarray", ...]] = None
+
+    @property
+    def history(self) -> List[AvgCost]:
+        """One AvgCost per transaction, made from the scan arrays when first read"""
+        if self.scan is not None:
+            total_qtty, total_amount, avg_cost = self.scan
+            self.rows = list(
+                map(
+                    AvgCost,
+                    map(ordinal2date, self.txns.dates),
+                    as_numbers(total_qtty),
+                    as_numbers(total_amount),
+                    avg_cost.tolist(),
+                )
+            )
+            self.scan = None
+        return self.rows
+
+    @history.setter
+    def history(self, rows: List[AvgCost]):
+        self.rows = rows
+        self.scan = None
+
+    def get_last(self) -> Optional[AvgCost]:
+        if self.scan is not None:
+            total_qtty, total_amount, avg_cost = self.scan
+            last_qtty, last_amount = as_numbers(
+                np.array([total_qtty[-1], total_amount[-1]])
+            )
+            return AvgCost(
+                self.txns.get_date(len(self.txns) - 1),
+                last_qtty,
+                last_amount,
+                float(avg_cost[-1]),
+            )
+        return self.rows[-1] if self.rows else None
+
+    @classmethod
+    def from_txns(
+        cls, txns: TxnsLike, check: bool = False, exact: bool = False, **options
+    ):
+        """Use scan_avg_cost for long float histories when NumPy is installed"""
+        columns = TxnColumns.from_txns(txns)
+        short = len(columns) < SCAN_THRESHOLD
+        if exact or not HAS_NUMPY or short or options.get("realized"):
+            return super().from_txns(columns, check, exact, **options)
+
+        checks.check_base_currency(columns)
+        book = cls(check, exact, columns, **options)
+        if not book.apply_scan():
+            for index in range(len(columns)):
+                book.apply_index(index)
+        return book
+
+    def apply_scan(self) -> bool:
+        txns = self.txns
+        qttys = np.asarray(txns.qttys)
+        prices = np.asarray(txns.prices)
+        scan = scan_avg_cost(qttys, prices)
+        if scan is None:
+            return False
 
-    checks.check_base_currency(included_txns)
+        total_qtty, total_amount, avg_cost = scan
+        if self.check:
+            for index in np.flatnonzero(qttys < 0).tolist():
+                cost = float(avg_cost[index - 1]) if index > 0 else 0
+                check_sell(txns[index], cost, self.check)
 
-    total_qtty = 0
-    total_amount = 0
-    avg_cost = 0
+        self.scan = scan
+        self.total_qtty = as_number(float(total_qtty[-1]))
+        self.total_amount = float(total_amount[-1])
+        self.avg_cost = float(avg_cost[-1])
 
-    avg_costs: List[AvgCost] = []
+        accts = np.asarray(txns.accts)
+        balances = np.bincount(accts, weights=qttys)
+        self.balances = {
+            int(acct): float(balances[acct]) for acct in np.unique(accts).tolist()
+        }
+        return True
 
-    for txn in included_txns:
-        total_qtty += txn.qtty
+    def apply_index(self, index: int):
+        super().apply_index(index)
 
-        if txn.qtty >= 0:
-            total_amount += txn.qtty * txn.price
+        if self.exact:
+            qtty_scale = 10**self.qtty_scale
+            self.avg_cost = (
+                div_round(int(self.total_amount) * qtty_scale, int(self.total_qtty))
+                if self.total_qtty != 0
+                else 0
+            )
+            avg_cost = AvgCost(
+                self.txns.get_date(index),
+                as_number(self.total_qtty / qtty_scale),
+                from_exact(int(self.total_amount)),
+                from_exact(int(self.avg_cost)),
+            )
         else:
-            check_sell(txn, avg_cost, check)
-            total_amount += txn.qtty * avg_cost
+            self.avg_cost = (
+                self.total_amount / self.total_qtty if self.total_qtty != 0 else 0
+            )
+            avg_cost = AvgCost(
+                self.txns.get_date(index),
+                self.total_qtty,
+                self.total_amount,
+                self.avg_cost,
+            )
 
-        avg_cost = total_amount / total_qtty if total_qtty != 0 else 0
-        avg_costs.append(AvgCost(txn.date, total_qtty, total_amount, avg_cost))
+        self.history.append(avg_cost)
 
-    return avg_costs
+    def add_buy(self, index: int):
+        if self.exact:
+            self.total_qtty += self.txns.qtty_mantissas[index]
+            self.total_amount += self.txns.get_exact_cost(index)
+        else:
+            qtty = as_number(self.txns.qttys[index])
+            self.total_qtty += qtty
+            self.total_amount += qtty * as_number(self.txns.prices[index])
+
+    def sell(self, index: int):
+        if self.exact:
+            qtty = self.txns.qtty_mantissas[index]
+            avg_cost = int(self.avg_cost)
+            check_sell_exact(self.txns, index, avg_cost, self.check)
+            cost = to_places(
+                qtty * avg_cost, self.qtty_scale + EXACT_PLACES, EXACT_PLACES
+            )
+        else:
+            qtty = as_number(self.txns.qttys[index])
+            check_sell(self.txns[index], self.avg_cost, self.check)  # type: ignore
+            cost = qtty * self.avg_cost
 
+        self.total_qtty += qtty
+        self.total_amount += cost
+        if self.realized is not None:
+            self.add_realized(index, None, -qtty, -cost)
 
-def avg_sell(
-    txns: List[AdjustedTxn],
+    def rescale(self, factor: int):
+        if self.exact:
+            self.total_qtty *= factor
+
+    def get_available(self) -> Union[float, Fraction]:
+        if self.exact:
+            return Fraction(int(self.total_qtty), 10**self.qtty_scale)
+        return self.total_qtty
+
+    def get_cost(self) -> Union[int, float]:
+        if self.exact:
+            return from_exact(int(self.avg_cost))
+        return as_number(float(self.avg_cost))
+
+    def get_acct_cost(self, acct: str) -> float:
+        if self.exact:
+            qtty = int(self.get_acct_balance(acct))
+            places = self.qtty_scale + EXACT_PLACES
+            return from_exact(
+                to_places(qtty * int(self.avg_cost), places, EXACT_PLACES)
+            )
+        return self.get_acct_balance(acct) * self.avg_cost
+
+    def get_total_cost(self) -> float:
+        if self.total_qtty == 0:
+            return 0
+        if self.exact:
+            return from_exact(int(self.total_amount))
+        return self.total_amount
+
+    def preview_sell(
+        self, sell_qtty: float, sell_date: str, acct: Optional[str] = None
+    ) -> List[AdjustedTxn]:
+        self.check_sell_available(sell_qtty, acct)
+        base_cur = self.txns[0].base_cur if len(self.txns) > 0 else ""
+        cost = self.get_cost()
+        return [AdjustedTxn(sell_date, cost, base_cur, sell_qtty, acct or "")]
+
+    def snapshot(self) -> "AvgBook":
+        book = super().snapshot()
+        if book.scan is None:
+            book.rows = self.rows.copy()
+        return book
+
+
+def get_avg_cost(
+    txns: TxnsLike, check: bool, until: Optional[date] = None, exact: bool = False
+) -> List[AvgCost]:
+    columns = TxnColumns.from_txns(txns)
+    if until:
+        until_ordinal = until.toordinal()
+        included = columns.take(
+            i for i, ordinal in enumerate(columns.dates) if ordinal <= until_ordinal
+        )
+    else:
+        included = columns
+
+    return AvgBook.from_txns(included, check, exact).history
+
+
+def get_avg_sell_txn(
+    txns: TxnsLike,
     date: str,
     qtty: float,
     cur: str,
@@ -79,29 +354,60 @@ def avg_sell(
     comm_account: str,
     value: float,
     check: bool,
-):
-    adj_comm = adjust_commodity(cur)
-    checks.check_short_sell_current(txns, qtty)
-    checks.check_base_currency(txns)
-    checks.check_available(txns, comm_account, qtty)
+    exact: bool = False,
+    book: Optional[AvgBook] = None,
+) -> PrintTxn:
+    book = book or AvgBook.from_txns(txns, check, exact)
+    cost = book.preview_sell(qtty, date, comm_account)[0].price
 
     sell_date = datetime.strptime(date, "%Y-%m-%d").date()
-    avg_cost = get_avg_cost(txns, check)
-    cost = avg_cost[-1].avg_cost
 
     base_curr = txns[0].base_cur
     price = value / qtty
     xirr = get_xirr(price, sell_date, txns) or 0 * 100
 
-    txn_hl = f"""{date} Sold {cur}  ; cost_method:avg_cost
-    ; commodity:{cur}, qtty:{qtty:,.2f}, price:{price:,.2f}
-    ; xirr:{xirr:.2f}% annual percent rate 30/360US
-    {cash_account}    {value:.2f} {base_curr}
-    {comm_account}    {qtty * -1} {adj_comm} @ {cost} {base_curr}
-    {revenue_account}"""
+    comments = [
+        "cost_method:avg_cost",
+        f"commodity:{cur}, qtty:{qtty:,.2f}, price:{price:,.2f}",
+        f"xirr:{xirr:.2f}% annual percent rate 30/360US",
+    ]
+    postings: List[Posting] = [
+        PrintPosting(cash_account, to_amount(f"{value:.2f}", base_curr)),
+        PrintPosting(
+            comm_account,
+            to_amount(qtty * -1, cur),
+            to_amount(cost, base_curr),
+            "UnitPrice",
+        ),
+        PrintPosting(revenue_account, None),
+    ]
+    return PrintTxn(date, f"Sold {cur}", postings, comments)
 
-    comm = ["hledger", "-f-", "print", "--explicit"]
-    txn_proc = subprocess.run(comm, input=txn_hl.encode(), capture_output=True)
 
-    txn_print: str = txn_proc.stdout.decode("utf8")
-    return txn_print
+def avg_sell(
+    txns: TxnsLike,
+    date: str,
+    qtty: float,
+    cur: str,
+    cash_account: str,
+    revenue_account: str,
+    comm_account: str,
+    value: float,
+    check: bool,
+    exact: bool = False,
+    book: Optional[AvgBook] = None,
+):
+    txn = get_avg_sell_txn(
+        txns,
+        date,
+        qtty,
+        cur,
+        cash_account,
+        revenue_account,
+        comm_account,
+        value,
+        check,
+        exact,
+        book,
+    )
+    return format_txn(txn)
@@ -1,9 +1,11 @@
-from datetime import datetime
+from datetime import date
 from typing import Optional, Tuple
 
-from .avg import get_avg_cost
+from .avg import AvgBook
 from .info import AllInfo, Info, LotsInfo
-from .lib import dt_list2table
+from .lib import dt_list2table, parallel_map
+from .price_index import PriceIndex
+from .txn_columns import TxnColumns
 
 
 class AvgInfo(Info):
@@ -13,23 +15,40 @@ class AvgInfo(Info):
         commodity: str,
         check: bool,
         no_desc: Optional[str] = None,
+        txns: Optional[TxnColumns] = None,
+        exact: bool = False,
+        as_of: Optional[str] = None,
+        price_index: Optional[PriceIndex] = None,
     ):
-        super().__init__(journals, commodity, no_desc)
+        super().__init__(journals, commodity, no_desc, txns, as_of, price_index)
         self.check = check
-        self.avg_lots = get_avg_cost(self.txns, self.check)
-        self.table = dt_list2table(self.avg_lots)
+        self.exact = exact
+        self.book = self.get_book(AvgBook, check, exact)
+
+    @property
+    def avg_lots(self):
+        return self.book.history
+
+    @property
+    def table(self):
+        return dt_list2table(self.avg_lots)
+
+    def get_last_buy_date(self) -> Optional[date]:
+        last = self.book.get_last()
+        return date.fromisoformat(last.date) if last is not None else None
 
     def get_info(self):
-        if len(self.txns) == 0:
+        last = self.book.get_last()
+        if len(self.txns) == 0 or last is None:
             return
 
         commodity = self.commodity
         cur = self.txns[0].base_cur
-        qtty = self.avg_lots[-1].total_qtty
-        amount = self.avg_lots[-1].total_amount
-        avg_cost = self.avg_lots[-1].avg_cost
-        last_buy_date = datetime.strptime(self.avg_lots[-1].date, "%Y-%m-%d").date()
-        xirr = self.get_lots_xirr(last_buy_date)
+        qtty = last.total_qtty
+        amount = last.total_amount
+        avg_cost = last.avg_cost
+        last_buy_date = self.get_last_buy_date()
+        xirr = self.get_lots_xirr(last_buy_date) if last_buy_date else None
 
         if self.market_price and self.market_date and xirr:
             market_price_str = f"{self.market_price:,.4f}"
@@ -69,20 +88,44 @@ class AvgInfo(Info):
 
 
 class AllAvgInfo(AllInfo):
-    def __init__(self, journals: Tuple[str, ...], no_desc: str, check: bool):
-        super().__init__(journals, no_desc)
+    def __init__(
+        self,
+        journals: Tuple[str, ...],
+        no_desc: str,
+        check: bool,
+        exact: bool = False,
+        as_of: Optional[str] = None,
+    ):
+        super().__init__(journals, no_desc, as_of)
         self.check = check
+        self.exact = exact
+
+    def get_avg_info(self, commodity: str) -> Optional[AvgInfo]:
+        txns = self.get_txns(commodity)
+        if len(txns) == 0:
+            return None
+
+        return AvgInfo(
+            self.journals,
+            commodity,
+            self.check,
+            self.no_desc,
+            txns,
+            self.exact,
+            self.as_of,
+            self.price_index,
+        )
 
     def get_info(self, commodity: str):
-        avg_obj = AvgInfo(self.journals, commodity, self.check)
-        if len(avg_obj.txns) == 0:
-            return
-        else:
-            return avg_obj.get_info()
+        avg_info = self.get_avg_info(commodity)
+        return avg_info.get_info() if avg_info is not None else None
 
     @property
     def infos(self):
-        infos = [self.get_info(com) for com in self.commodities]
+        avg_infos = parallel_map(self.get_avg_info, self.commodities)
+        avg_infos = [info for info in avg_infos if info is not None]
+        self.set_xirrs(avg_infos)
+        infos = [info.get_info() for info in avg_infos]
         infos = [info for info in infos if info]
         return infos
 
@@ -0,0 +1,190 @@
+import glob
+import hashlib
+import os
+import pickle
+import re
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, TypeVar
+
+CACHE_VERSION = 6
+DEFAULT_SIZE_MB = 256
+
+INCLUDE_REGEX = re.compile(r"^include\s+(?:\w+:)?(.+?)\s*(?:;.*)?$")
+
+T = TypeVar("T")
+
+FileFingerprint = Tuple[str, int, int, int]
+
+
+def get_cache_dir() -> Path:
+    cache_dir = os.getenv("HLEDGER_LOTS_CACHE_DIR")
+    if cache_dir:
+        return Path(cache_dir)
+
+    xdg_cache = os.getenv("XDG_CACHE_HOME")
+    base_dir = Path(xdg_cache) if xdg_cache else Path.home() / ".cache"
+    return base_dir / "hledger-lots"
+
+
+def get_max_size() -> int:
+    size_mb = os.getenv("HLEDGER_LOTS_CACHE_SIZE", str(DEFAULT_SIZE_MB))
+    return int(float(size_mb) * 2**20)
+
+
+def get_file_fingerprint(file: str) -> FileFingerprint:
+    stat = os.stat(file)
+    return (os.path.abspath(file), stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+def get_includes(file: str) -> Tuple[List[str], List[str]]:
+    """Return files and glob patterns included by a journal, recursively"""
+    files: List[str] = []
+    patterns: List[str] = []
+    seen: Set[str] = set()
+
+    pending = [os.path.abspath(file)]
+    while pending:
+        current = pending.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+
+        with open(current, "r") as f:
+            for row in f:
+                if not row.startswith("include"):
+                    continue
+
+                search = INCLUDE_REGEX.search(row)
+                if not search:
+                    continue
+
+                path = os.path.expanduser(search.group(1))
+                pattern = os.path.join(os.path.dirname(current), path)
+                patterns.append(pattern)
+                included = sorted(glob.glob(pattern, recursive=True))
+                files = [*files, *included]
+                pending = [*pending, *included]
+
+    return files, patterns
+
+
+def read_pickle(path: Path) -> Optional[Any]:
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+        return None
+
+
+def write_pickle(path: Path, value: Any):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def evict(cache_dir: Path, max_size: int):
+    """Remove least recently used cache files until they fit in max_size bytes"""
+    entries = []
+    for path in cache_dir.glob("*.pickle"):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime_ns, stat.st_size, path))
+
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_size <= max_size:
+            break
+        path.unlink(missing_ok=True)
+        total_size -= size
+
+
+class TxnCache:
+    def __init__(
+        self,
+        files: Tuple[str, ...],
+        cache_dir: Optional[Path] = None,
+        max_size: Optional[int] = None,
+    ) -> None:
+        self.files = files
+        self.cache_dir = cache_dir or get_cache_dir()
+        self.max_size = get_max_size() if max_size is None else max_size
+        self.fingerprint = self.get_fingerprint()
+
+    @property
+    def enabled(self):
+        return self.max_size > 0 and self.fingerprint is not None
+
+    def get_fingerprint(self) -> Optional[Tuple[FileFingerprint, ...]]:
+        try:
+            return tuple(get_file_fingerprint(file) for file in self.files)
+        except OSError:
+            return None
+
+    def get_path(self, *key: str) -> Path:
+        key_repr = repr((CACHE_VERSION, self.fingerprint, key)).encode()
+        name = hashlib.sha256(key_repr).hexdigest()
+        return self.cache_dir / f"{name}.pickle"
+
+    def get_dependencies(self) -> Dict[str, Any]:
+        files: List[str] = []
+        patterns: List[str] = []
+        for file in self.files:
+            included_files, included_patterns = get_includes(file)
+            files = [*files, *included_files]
+            patterns = [*patterns, *included_patterns]
+
+        fingerprints = tuple(get_file_fingerprint(file) for file in files)
+        return {"fingerprints": fingerprints, "patterns": patterns}
+
+    def is_fresh(self, dependencies: Dict[str, Any]) -> bool:
+        files = [fingerprint[0] for fingerprint in dependencies["fingerprints"]]
+        globbed = [
+            file
+            for pattern in dependencies["patterns"]
+            for file in sorted(glob.glob(pattern, recursive=True))
+        ]
+        if sorted(set(globbed)) != sorted(set(files)):
+            return False
+
+        try:
+            fingerprints = tuple(get_file_fingerprint(file) for file in files)
+        except OSError:
+            return False
+
+        return fingerprints == dependencies["fingerprints"]
+
+    def get(self, *key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+
+        path = self.get_path(*key)
+        entry = read_pickle(path)
+        if entry is None:
+            return None
+
+        version, dependencies, value = entry
+        if version != CACHE_VERSION or not self.is_fresh(dependencies):
+            return None
+
+        os.utime(path)
+        return value
+
+    def put(self, value: Any, *key: str):
+        if not self.enabled:
+            return
+
+        entry = (CACHE_VERSION, self.get_dependencies(), value)
+        write_pickle(self.get_path(*key), entry)
+        evict(self.cache_dir, self.max_size)
+
+    def get_or_set(self, func: Callable[[], T], *key: str) -> T:
+        value = self.get(*key)
+        if value is None:
+            value = func()
+            self.put(value, *key)
+        return value
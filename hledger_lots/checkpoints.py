@@ -0,0 +1,100 @@
+from bisect import bisect_right
+from typing import Generic, List, Optional, Tuple, Type
+
+from . import checks
+from .cache import TxnCache
+from .hl import get_backend
+from .lot_book import BookT
+from .txn_columns import TxnColumns, TxnsLike, date2ordinal
+
+DEFAULT_EVERY = 256
+MAX_CHECKPOINTS = 64
+
+
+def get_every(size: int) -> int:
+    """Transactions between checkpoints, so there are at most MAX_CHECKPOINTS"""
+    return max(DEFAULT_EVERY, -(-size // MAX_CHECKPOINTS))
+
+
+class Checkpoints(Generic[BookT]):
+    """
+    Snapshots of a LotBook taken while it applies a history, one every `every`
+    transactions. as_of() restores the last one taken before a date and
+    replays only the transactions after it.
+    """
+
+    def __init__(
+        self,
+        book_cls: Type[BookT],
+        txns: TxnsLike,
+        check: bool = False,
+        exact: bool = False,
+        every: Optional[int] = None,
+        **options,
+    ) -> None:
+        columns = TxnColumns.from_txns(txns)
+        checks.check_base_currency(columns)
+
+        book = book_cls(check, exact, columns, **options)
+        self.txns = columns
+        self.order = book.get_order(columns)
+        self.every = every or get_every(len(self.order))
+
+        # Latest date applied by each checkpoint and where it is in order
+        self.dates: List[int] = [0]
+        self.positions: List[int] = [0]
+        self.books: List[BookT] = [book.snapshot()]
+        self.is_sorted = True
+
+        last_date = 0
+        for pos, index in enumerate(self.order, start=1):
+            book.apply_index(index)
+            date_ordinal = columns.dates[index]
+            self.is_sorted = self.is_sorted and date_ordinal >= last_date
+            last_date = max(last_date, date_ordinal)
+
+            if pos % self.every == 0 or pos == len(self.order):
+                self.dates.append(last_date)
+                self.positions.append(pos)
+                self.books.append(book.snapshot())
+
+    def as_of(self, date_str: str) -> BookT:
+        """Book with the transactions until date_str, inclusive"""
+        ordinal = date2ordinal(date_str)
+        i = bisect_right(self.dates, ordinal) - 1
+
+        book = self.books[i].snapshot()
+        dates = self.txns.dates
+        for index in self.order[self.positions[i] :]:
+            if dates[index] <= ordinal:
+                book.apply_index(index)
+            elif self.is_sorted:
+                break
+
+        return book
+
+
+def get_checkpoints(
+    journals: Tuple[str, ...],
+    commodity: str,
+    no_desc: Optional[str],
+    txns: TxnColumns,
+    book_cls: Type[BookT],
+    check: bool,
+    exact: bool,
+    **options,
+) -> Checkpoints[BookT]:
+    """Checkpoints of a commodity, kept in the cache while the journals don't change"""
+    backend = get_backend()
+    cache = TxnCache(journals, max_size=None if backend.cacheable else 0)
+    return cache.get_or_set(
+        lambda: Checkpoints(book_cls, txns, check, exact, **options),
+        backend.name,
+        "checkpoints",
+        book_cls.__name__,
+        commodity.upper(),
+        no_desc or "",
+        str(check),
+        str(exact),
+        repr(sorted(options.items())),
+    )
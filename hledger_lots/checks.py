@@ -1,6 +1,8 @@
-from typing import List
+from fractions import Fraction
+from typing import Union
 
-from .lib import AdjustedTxn
+from .lib import TxnLike
+from .txn_columns import TxnColumns, TxnsLike
 
 
 class MultipleBaseCurrencies(Exception):
@@ -9,29 +11,81 @@ class MultipleBaseCurrencies(Exception):
         self.message = f"More than one base currency: {currencies}"
 
 
-def check_short_sell_past(previous_buys: List[AdjustedTxn], sell: AdjustedTxn):
-    previous_buys_qtty = sum([txn.qtty for txn in previous_buys])
-    if abs(sell.qtty) > abs(previous_buys_qtty):
+def check_short_sell_past(previous_buys: TxnsLike, sell: TxnLike, exact: bool = False):
+    columns = TxnColumns.from_txns(previous_buys)
+    if exact:
+        previous_buys_qtty = columns.get_exact_qtty()
+        sell_qtty = Fraction(repr(sell.qtty))
+    else:
+        previous_buys_qtty = sum(columns.qttys)
+        sell_qtty = sell.qtty
+
+    check_short_sell_available(sell, sell_qtty, previous_buys_qtty)
+
+
+def check_short_sell_available(
+    sell: TxnLike, sell_qtty: Union[int, float, Fraction], available
+):
+    if abs(sell_qtty) > abs(available):
         raise ValueError(f"Short sell not allowed for sell {sell}")
 
 
-def check_short_sell_current(previous_buys: List[AdjustedTxn], sell_qtty: float):
-    previous_buys_qtty = sum([txn.qtty for txn in previous_buys])
-    if sell_qtty > previous_buys_qtty:
+def check_short_sell_current(
+    previous_buys: TxnsLike, sell_qtty: float, exact: bool = False
+):
+    columns = TxnColumns.from_txns(previous_buys)
+    if exact:
+        previous_buys_qtty: Union[float, Fraction] = columns.get_exact_qtty()
+    else:
+        previous_buys_qtty = sum(columns.qttys)
+
+    check_short_sell_qtty(previous_buys_qtty, sell_qtty, exact)
+
+
+def check_short_sell_qtty(
+    available: Union[float, Fraction], sell_qtty: float, exact: bool = False
+):
+    if exact:
+        enough = Fraction(repr(sell_qtty)) <= available
+    else:
+        enough = sell_qtty <= available
+
+    if not enough:
         raise ValueError(
-            f"Short sell not allowed for sell. You have {previous_buys_qtty:.4f}, which is less than you want to sell: {sell_qtty:.4f}"
+            f"Short sell not allowed for sell. You have {float(available):.4f}, which is less than you want to sell: {sell_qtty:.4f}"
         )
 
 
-def check_base_currency(txns: List[AdjustedTxn]):
-    base_currencies = set(txn.base_cur for txn in txns)
+def check_base_currency(txns: TxnsLike):
+    base_currencies = TxnColumns.from_txns(txns).get_base_curs()
     if len(base_currencies) > 1:
         raise MultipleBaseCurrencies(base_currencies)
 
 
-def check_available(txns: List[AdjustedTxn], account: str, sell_qtty: float):
-    sum_qtty = sum(txn.qtty for txn in txns if txn.acct == account)
-    if sell_qtty > sum_qtty:
+def check_available(
+    txns: TxnsLike, account: str, sell_qtty: float, exact: bool = False
+):
+    columns = TxnColumns.from_txns(txns)
+    if exact:
+        available: Union[float, Fraction] = columns.get_exact_acct_qtty(account)
+    else:
+        available = columns.get_acct_qtty(account)
+
+    check_acct_qtty(account, available, sell_qtty, exact)
+
+
+def check_acct_qtty(
+    account: str,
+    available: Union[float, Fraction],
+    sell_qtty: float,
+    exact: bool = False,
+):
+    if exact:
+        enough = Fraction(repr(sell_qtty)) <= available
+    else:
+        enough = sell_qtty <= available
+
+    if not enough:
         raise ValueError(
-            f"You can't sell {sell_qtty:,.2f} in {account} because there is only {sum_qtty:,.2f} available"
+            f"You can't sell {sell_qtty:,.2f} in {account} because there is only {float(available):,.2f} available"
         )
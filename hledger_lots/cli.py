@@ -1,16 +1,33 @@
-from typing import Tuple, TypedDict
+import subprocess
+import sys
+from datetime import datetime
+from typing import Optional, TextIO, Tuple, TypedDict
 
 import rich_click as click
 
 from .avg_info import AllAvgInfo, AvgInfo
 from .fifo_info import AllFifoInfo, FifoInfo
-from .info import AllInfo
-from .lib import get_default_file, get_file_from_stdin, get_files_comm
+from .history import PERIODS as HISTORY_PERIODS
+from .history import AllHistory, write_csv, write_json, write_plain
+from .hl import set_backend
+from .journal import NativeBackend
+from .lib import (
+    DEFAULT_WORKERS,
+    get_default_file,
+    get_file_from_stdin,
+    get_files_comm,
+    set_workers,
+)
 from .options import Options, get_options
 from .prices_yahoo import YahooPrices
 from .prompt import get_append_file
 from .prompt_buy import PromptBuy
 from .prompt_sell import PromptSell
+from .rate_limit import DEFAULT_RATE, DEFAULT_RETRIES, RateLimit
+from .realized import AllRealized
+from .sell_batch import SellBatch, read_sells
+from .web import DEFAULT_URL, WebBackend
+from .xirr_history import PERIODS, AllXirrHistory
 
 
 class Obj(TypedDict):
@@ -18,6 +35,20 @@ class Obj(TypedDict):
     opt: Options
 
 
+def get_as_of(as_of: Optional[datetime]):
+    return as_of.date().isoformat() if as_of else None
+
+
+as_of_option = click.option(
+    "-d",
+    "--date",
+    "--as-of",
+    "as_of",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    help="Report the lots as they were at the end of this date (YYYY-MM-DD), ignoring later transactions and market prices",
+)
+
+
 CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
 
 click.rich_click.USE_MARKDOWN = True
@@ -45,15 +76,46 @@ click.rich_click.STYLE_OPTIONS_PANEL_BORDER = "dim"  # Possibly conceal
     multiple=True,
     help="Inform the journal file path. If \"-\", read from stdin. Without this flag read from $LEDGER_FILE or ~/.hledger.journal in this order  or '-f-'.",
 )
+@click.option(
+    "-b",
+    "--backend",
+    type=click.Choice(["hledger", "native", "web"]),
+    default="hledger",
+    help="How journals are read. 'hledger' runs the hledger executable. 'native' uses a built-in reader, faster but limited to transactions, price, commodity, account and include directives. 'web' queries a running hledger-web at --url.",
+)
+@click.option(
+    "-u",
+    "--url",
+    default=DEFAULT_URL,
+    show_default=True,
+    help="Base URL of hledger-web used by '--backend web'. The journal files are still read for hledger-lots options.",
+)
+@click.option(
+    "-w",
+    "--workers",
+    type=click.IntRange(min=1),
+    default=DEFAULT_WORKERS,
+    show_default=True,
+    envvar="HLEDGER_LOTS_WORKERS",
+    help="Maximum number of commodities processed at the same time, each one running its own hledger commands or price downloads. Use 1 to process them one after another.",
+)
 @click.pass_context
 @click.version_option()
-def cli(ctx: click.Context, file: Tuple[str, ...]):
+def cli(
+    ctx: click.Context, file: Tuple[str, ...], backend: str, url: str, workers: int
+):
     """
     Commands to apply FIFO(first-in-first-out) or AVERAGE COST accounting principles without manual management of lots. Useful for transactions involving buying and selling foreign currencies or stocks.
 
     To find out more, visit [https://github.com/edkedk99/hledger-lots](https://github.com/edkedk99/hledger-lots)
     """
     obj = ctx.obj
+    set_workers(workers)
+
+    if backend == "native":
+        set_backend(NativeBackend())
+    elif backend == "web":
+        set_backend(WebBackend(url))
 
     if file[0] == "-":
         stdin_file = (get_file_from_stdin(),)
@@ -81,7 +143,9 @@ def buy(obj: Obj):
 
     file = obj["file"]
     opt = obj["opt"]
-    prompt_buy = PromptBuy(file, opt.avg_cost, opt.check, opt.no_desc)
+    prompt_buy = PromptBuy(
+        file, opt.avg_cost, opt.check, opt.no_desc, opt.exact, opt.lot_method
+    )
     txn_print = prompt_buy.get_hl_txn()
     click.echo("\n" + txn_print)
 
@@ -94,17 +158,31 @@ def buy(obj: Obj):
 
     commodity = prompt_buy.info["comm"]
     if opt.avg_cost:
-        info = AvgInfo(file, commodity, opt.check)
+        info = AvgInfo(file, commodity, opt.check, exact=opt.exact)
     else:
-        info = FifoInfo(file, commodity, opt.check)
+        info = FifoInfo(
+            file, commodity, opt.check, exact=opt.exact, method=opt.lot_method
+        )
 
     click.echo(info.table)
     click.echo(info.info_txt)
 
 
 @click.command()
+@click.option(
+    "-B",
+    "--batch",
+    type=click.File("r"),
+    help="Create the sales in a csv file without prompts, one per row, with the columns commodity, commodity_account, cash_account, revenue_account, date, quantity and price. The transactions are printed only if all of them are valid.",
+)
+@click.option(
+    "--validate/--no-validate",
+    default=True,
+    show_default=True,
+    help="Check the transactions created with '--batch' with a single hledger call before printing them",
+)
 @click.pass_obj
-def sell(obj: Obj):
+def sell(obj: Obj, batch: Optional[TextIO], validate: bool):
     """
     Create a transaction with automatic FIFO or AVERAGE COST for a commodity by answering some prompts that tries to avoid errors with validation and using current journal data to filter possible answers give informations that guides the user thru the process.\r
 
@@ -117,10 +195,31 @@ def sell(obj: Obj):
     - Multiple lot postings: Each posting represents a lot you are selling for the cost price on purchasing date, according to FIFO accounting principles or one postings in case of AVERAGE COST method.
 
     - Revenue posting: posting that represent Capital Gain or Loss as the difference between the total cost and the amount received on the base-currency.
+
+    ### Batch
+
+    With '--batch', the sales in the csv file are applied by date, each one taking the lots left by the journal and the sales before it, and printed together in file order. A sale dated before journal transactions it conflicts with is an error. Use *BASH* redirection to append them to the journal.
+
+    The transactions are formatted without running hledger. '--validate', the default, also checks all of them with one hledger call.
     """
     file = obj["file"]
     opt = obj["opt"]
-    prompt_sell = PromptSell(file, opt.avg_cost, opt.check, opt.no_desc)
+
+    if batch:
+        sell_batch = SellBatch(
+            file, opt.avg_cost, opt.check, opt.no_desc, opt.exact, opt.lot_method
+        )
+        try:
+            txns_print = sell_batch.get_hl_txns(read_sells(batch), validate)
+        except (ValueError, subprocess.SubprocessError) as e:
+            raise click.ClickException(str(e))
+
+        click.echo(txns_print, nl=False)
+        return
+
+    prompt_sell = PromptSell(
+        file, opt.avg_cost, opt.check, opt.no_desc, opt.exact, opt.lot_method
+    )
 
     txn_print = prompt_sell.get_hl_txn()
     click.echo("\n" + txn_print)
@@ -134,9 +233,11 @@ def sell(obj: Obj):
 
     commodity = prompt_sell.info["comm"]
     if opt.avg_cost:
-        info = AvgInfo(file, commodity, opt.check)
+        info = AvgInfo(file, commodity, opt.check, exact=opt.exact)
     else:
-        info = FifoInfo(file, commodity, opt.check)
+        info = FifoInfo(
+            file, commodity, opt.check, exact=opt.exact, method=opt.lot_method
+        )
 
     click.echo(info.table)
     click.echo(info.info_txt)
@@ -150,8 +251,9 @@ def sell(obj: Obj):
 
 @click.command()
 @click.argument("commodity", type=click.STRING, required=True)
+@as_of_option
 @click.pass_obj
-def view(obj: Obj, commodity: str):
+def view(obj: Obj, commodity: str, as_of: Optional[datetime]):
     """
     Report lots for a commodity.\r
 
@@ -163,9 +265,24 @@ def view(obj: Obj, commodity: str):
     opt = obj["opt"]
 
     if opt.avg_cost:
-        info = AvgInfo(file, commodity, opt.check, opt.no_desc)
+        info = AvgInfo(
+            file,
+            commodity,
+            opt.check,
+            opt.no_desc,
+            exact=opt.exact,
+            as_of=get_as_of(as_of),
+        )
     else:
-        info = FifoInfo(file, commodity, opt.check, opt.no_desc)
+        info = FifoInfo(
+            file,
+            commodity,
+            opt.check,
+            opt.no_desc,
+            exact=opt.exact,
+            method=opt.lot_method,
+            as_of=get_as_of(as_of),
+        )
 
     click.echo(info.table)
     click.echo(info.info_txt)
@@ -179,8 +296,9 @@ def view(obj: Obj, commodity: str):
     default="plain",
     help="Format to output the report",
 )
+@as_of_option
 @click.pass_obj
-def list_commodities(obj: Obj, output_format: str):
+def list_commodities(obj: Obj, output_format: str, as_of: Optional[datetime]):
     """
     List indicators for all your commodities in a tabular format sorted from higher to lower **XIRR**. It is advised to use full-screen of the terminal. See the docs for a list of indicators and output examples.
 
@@ -189,12 +307,17 @@ def list_commodities(obj: Obj, output_format: str):
 
     file = obj["file"]
     opt = obj["opt"]
-    lots_info = AllInfo(file, opt.no_desc)
-
     lots_info = (
-        AllAvgInfo(file, opt.no_desc, opt.check)
+        AllAvgInfo(file, opt.no_desc, opt.check, opt.exact, get_as_of(as_of))
         if opt.avg_cost
-        else AllFifoInfo(file, opt.no_desc, opt.check)
+        else AllFifoInfo(
+            file,
+            opt.no_desc,
+            opt.check,
+            opt.exact,
+            opt.lot_method,
+            get_as_of(as_of),
+        )
     )
 
     if output_format == "pretty":
@@ -209,8 +332,163 @@ def list_commodities(obj: Obj, output_format: str):
 
 
 @click.command()
+@click.option(
+    "-c",
+    "--commodity",
+    help="Report only the sales of this commodity",
+)
+@click.option(
+    "-o",
+    "--output-format",
+    type=click.Choice(["plain", "pretty", "csv", "json"]),
+    default="plain",
+    help="Format to output the report",
+)
+@click.pass_obj
+def realized(obj: Obj, commodity: Optional[str], output_format: str):
+    """
+    Report the realized gain or loss of every sale, one row for each lot it took using FIFO or the configured lot method, or one row for the sale using AVERAGE COST.
+
+    The gains are recorded while the sales are matched to the lots, in the same pass that computes the lots. Proceeds are the cash the sale transaction got, shared by quantity among its lots: its postings without price in the base currency, leaving out the ones to accounts of the Revenue type, so sales recorded at their cost, like the ones created by the sell command, show the gain of their revenue posting. An account has the Revenue type when it or a parent account is declared with a `type: R` tag, or else when its name starts with income or revenue. A gain posted to another account counts as cash and shows zero gain. A sale without such postings, or selling more than one commodity for the same currency, is taken at the price of its posting.
+
+    It can output in four formats: *plain, pretty, csv and json*.
+    """
+
+    file = obj["file"]
+    opt = obj["opt"]
+    gains = AllRealized(
+        file,
+        opt.no_desc,
+        opt.check,
+        opt.avg_cost,
+        opt.exact,
+        opt.lot_method,
+        commodity,
+    )
+
+    if output_format == "pretty":
+        table = gains.gains_table("mixed_grid")
+    elif output_format == "csv":
+        table = gains.gains_csv().read()
+    elif output_format == "json":
+        table = gains.gains_json()
+    else:
+        table = gains.gains_table("plain")
+
+    click.echo(table)
+
+
+@click.command(name="xirr-history")
+@click.option(
+    "-c",
+    "--commodity",
+    help="Report only the history of this commodity",
+)
+@click.option(
+    "-p",
+    "--period",
+    type=click.Choice(PERIODS),
+    default="monthly",
+    help="Compute the xirr on every market price date or on the last one of each month",
+)
+@click.option(
+    "-o",
+    "--output-format",
+    type=click.Choice(["plain", "pretty", "csv", "json"]),
+    default="plain",
+    help="Format to output the report",
+)
+@click.pass_obj
+def xirr_history(obj: Obj, commodity: Optional[str], period: str, output_format: str):
+    """
+    Report the **XIRR** of each commodity over time, selling what was held at the market price of each date, the value *list* would show if the journal ended on that date.
+
+    The dates are swept forward adding the cash flows as they come, and each date starts solving from the rate of the previous one.
+
+    It can output in four formats: *plain, pretty, csv and json*.
+    """
+
+    file = obj["file"]
+    opt = obj["opt"]
+    history = AllXirrHistory(file, opt.no_desc, period, commodity)
+
+    if output_format == "pretty":
+        table = history.history_table("mixed_grid")
+    elif output_format == "csv":
+        table = history.history_csv().read()
+    elif output_format == "json":
+        table = history.history_json()
+    else:
+        table = history.history_table("plain")
+
+    click.echo(table)
+
+
+@click.command()
+@click.option(
+    "-c",
+    "--commodity",
+    help="Report only the history of this commodity, without totals",
+)
+@click.option(
+    "-p",
+    "--period",
+    type=click.Choice(HISTORY_PERIODS),
+    default="monthly",
+    help="Report the holdings at the end of every day, week or month",
+)
+@click.option(
+    "-o",
+    "--output-format",
+    type=click.Choice(["plain", "csv", "json"]),
+    default="plain",
+    help="Format to output the report",
+)
+@click.pass_obj
+def history(obj: Obj, commodity: Optional[str], period: str, output_format: str):
+    """
+    Report the quantity held, cost basis, market value and unrealized profit of each commodity at the end of every day, week or month, followed by the totals of each base currency. Holdings without a market price count at cost in the totals.
+
+    Each commodity's transactions and market prices are merged in one pass by date, and the rows are written as they are produced.
+
+    It can output in three formats: *plain, csv and json*.
+    """
+
+    file = obj["file"]
+    opt = obj["opt"]
+    all_history = AllHistory(
+        file,
+        opt.no_desc,
+        opt.check,
+        opt.avg_cost,
+        opt.exact,
+        opt.lot_method,
+        period,
+        commodity,
+    )
+
+    writers = {"plain": write_plain, "csv": write_csv, "json": write_json}
+    writers[output_format](all_history.iter_rows(), sys.stdout)
+
+
+@click.command()
+@click.option(
+    "-r",
+    "--rate",
+    type=click.FloatRange(min=0, min_open=True),
+    default=DEFAULT_RATE,
+    show_default=True,
+    help="Most requests a second to Yahoo Finance, shared by all workers. Lowered while Yahoo answers with too many requests",
+)
+@click.option(
+    "--retries",
+    type=click.IntRange(min=0),
+    default=DEFAULT_RETRIES,
+    show_default=True,
+    help="Times to send again a request answered with too many requests, waiting twice as long each time",
+)
 @click.pass_obj
-def prices(obj: Obj):
+def prices(obj: Obj, rate: float, retries: int):
     """
     Download market prices from Yahoo Finance and print as **price directives**. Use *BASH* redirection to append to the journal or copy/paste the data.
 
@@ -224,11 +502,13 @@ def prices(obj: Obj):
     commodity \"PETR4\"    ; yahoo_ticker:PETR4.SA
     commodity BTC        ; yahoo_ticker:BTC-USD
     ```
+
+    Commodities are downloaded by up to *--workers* threads at once, within the *--rate* limit, and printed in the same order as their directives.
     """
 
     file = obj["file"]
 
-    yahoo_prices = YahooPrices(file)
+    yahoo_prices = YahooPrices(file, RateLimit(rate, retries))
     yahoo_prices.print_prices()
 
 
@@ -236,4 +516,7 @@ cli.add_command(buy)
 cli.add_command(sell)
 cli.add_command(view)
 cli.add_command(list_commodities)
+cli.add_command(realized)
+cli.add_command(xirr_history)
+cli.add_command(history)
 cli.add_command(prices)
@@ -1,98 +1,502 @@
-import copy
-import subprocess
+from array import array
+from copy import copy
 from datetime import datetime
-from typing import List
+from fractions import Fraction
+from itertools import chain
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    TypeVar,
+    Union,
+    overload,
+)
 
 from . import checks
-from .lib import AdjustedTxn, CostMethodError, adjust_commodity, get_avg_fifo, get_xirr
+from .journal import Posting
+from .lib import AdjustedTxn, CostMethodError, TxnLike, get_avg_fifo, get_xirr
+from .lot_book import LotBook
+from .lot_methods import LOT_METHODS, LotOrder
+from .txn_columns import (
+    EXACT_PLACES,
+    FIELDS,
+    IntColumn,
+    TxnColumns,
+    TxnsLike,
+    TxnView,
+    append_int,
+    as_number,
+    date2ordinal,
+    float2mantissa,
+    from_exact,
+    int_column,
+    to_places,
+)
+from .txn_print import PrintPosting, PrintTxn, format_txn, to_amount
 
+T = TypeVar("T")
 
-def check_sell(sell: AdjustedTxn, previous_buys: List[AdjustedTxn], check: bool):
+
+def is_same_price(sell_price: int, sell_places: int, buy_price: int):
+    """
+    Compare exact unit price mantissas. A buy price with more decimals, like
+    one from a total price, matches the sell price rounded to its places.
+    """
+    if sell_price == buy_price:
+        return True
+
+    return to_places(buy_price, EXACT_PLACES, sell_places) == to_places(
+        sell_price, EXACT_PLACES, sell_places
+    )
+
+
+def check_sell(
+    txns: TxnColumns, sell_index: int, buy_index: int, check: bool, exact: bool = False
+):
     if not check:
         return
 
-    diff_zero = [
-        previous_buy for previous_buy in previous_buys if previous_buy.qtty != 0
-    ]
-    if len(diff_zero) == 0:
-        return
+    sell = txns[sell_index]
+    buy = txns[buy_index]
+    if exact:
+        same_price = is_same_price(
+            txns.get_unit_price(sell_index),
+            txns.price_places[sell_index],
+            txns.get_unit_price(buy_index),
+        )
+    else:
+        same_price = sell.price == buy.price
 
-    previous_buy = diff_zero[0]
-    if sell.price != previous_buy.price or sell.base_cur != previous_buy.base_cur:
-        raise CostMethodError(sell, previous_buy.price, previous_buy.base_cur)
+    if not same_price or sell.base_cur != buy.base_cur:
+        raise CostMethodError(sell, buy.price, buy.base_cur)
 
 
-def get_lots(txns: List[AdjustedTxn], check: bool) -> List[AdjustedTxn]:
-    local_txns = copy.deepcopy(txns)
-    checks.check_base_currency(txns)
+def get_date_order(columns: TxnColumns) -> Sequence[int]:
+    """Row indexes by date, buys before sells of the same date"""
+    qttys = columns.qttys
+    dates = columns.dates
 
-    buys = [txn for txn in local_txns if txn.qtty >= 0]
-    sells = [txn for txn in local_txns if txn.qtty < 0]
+    def key(i: int):
+        return (dates[i], qttys[i] < 0)
 
-    buys_lot: List[AdjustedTxn] = buys if len(sells) == 0 else []
-    for sell in sells:
-        previous_buys = [txn for txn in buys if txn.date <= sell.date]
-        checks.check_short_sell_past(previous_buys, sell)
-        later_buys = [txn for txn in buys if txn.date > sell.date]
-        sell_qtty = abs(sell.qtty)
+    # Journals are usually in order already, which needs no list of indexes
+    if all(key(i - 1) <= key(i) for i in range(1, len(columns))):
+        return range(len(columns))
+    return sorted(range(len(columns)), key=key)
 
-        i = 0
-        while i < len(previous_buys) and sell_qtty > 0:
-            previous_buy = previous_buys[i]
-            check_sell(sell, previous_buys, check)
-            if sell_qtty >= previous_buy.qtty:
-                sell_qtty -= previous_buy.qtty
-                previous_buys[i].qtty = 0
-            else:
-                previous_buys[i].qtty -= sell_qtty
-                sell_qtty = 0
 
-            i += 1
+class LotView:
+    """
+    Lot of a FifoBook read in place: the row of its buy with the quantity
+    left in the lot, or with qtty when given.
+    """
 
-        buys_lot = [*previous_buys, *later_buys]
+    __slots__ = ("book", "pos", "lot_qtty", "row")
 
-    return buys_lot
+    def __init__(
+        self, book: "FifoBook", pos: int, qtty: Optional[float] = None
+    ) -> None:
+        self.book = book
+        self.pos = pos
+        self.lot_qtty = qtty
+        self.row = TxnView(book.txns, book.buys[pos])
 
+    @property
+    def date(self) -> str:
+        return self.row.date
 
-def get_sell_lots(
-    lots: List[AdjustedTxn], sell_date: str, sell_qtty: float, check: bool
-):
-    checks.check_short_sell_current(lots, sell_qtty)
-    buy_lots = get_lots(lots, check)
-    previous_buys = [lot for lot in buy_lots.copy() if lot.date <= sell_date]
-
-    fifo_lots: List[AdjustedTxn] = []
-    sell_qtty_curr = sell_qtty
-
-    i = 0
-    while sell_qtty_curr > 0 and i < len(lots):
-        buy = previous_buys[i]
-        if buy.qtty == 0:
-            pass
-        elif sell_qtty_curr > buy.qtty:
-            fifo_lots.append(
-                AdjustedTxn(buy.date, buy.price, buy.base_cur, buy.qtty, buy.acct)
+    @property
+    def price(self) -> float:
+        return self.row.price
+
+    @property
+    def base_cur(self) -> str:
+        return self.row.base_cur
+
+    @property
+    def qtty(self) -> float:
+        if self.lot_qtty is not None:
+            return self.lot_qtty
+        return self.book.get_lot_qtty(self.pos)
+
+    @property
+    def acct(self) -> str:
+        return self.row.acct
+
+    def to_txn(self) -> AdjustedTxn:
+        return AdjustedTxn(self.date, self.price, self.base_cur, self.qtty, self.acct)
+
+    def asdict(self) -> dict:
+        return {**self.row.asdict(), "qtty": self.qtty}
+
+    def __eq__(self, other) -> bool:
+        if not all(hasattr(other, field) for field in FIELDS):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in FIELDS)
+
+    def __repr__(self) -> str:
+        return repr(self.to_txn())
+
+
+class ColumnView(Sequence[T]):
+    """Values of a column at the buys of a book, read in place"""
+
+    def __init__(self, column: Sequence[T], indexes: Sequence[int]) -> None:
+        self.column = column
+        self.indexes = indexes
+
+    @overload
+    def __getitem__(self, i: int) -> T: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> List[T]: ...
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[T, List[T]]:
+        if isinstance(i, slice):
+            return [self.column[index] for index in self.indexes[i]]
+        return self.column[self.indexes[i]]
+
+    def __len__(self) -> int:
+        return len(self.indexes)
+
+
+class LotsView(Sequence[LotView]):
+    """
+    Lots of a FifoBook read like a TxnColumns without copying them. It shows
+    the book as it is when read: take a snapshot() to keep the lots of a moment.
+    """
+
+    def __init__(self, book: "FifoBook") -> None:
+        self.book = book
+
+    @property
+    def dates(self) -> ColumnView[int]:
+        return ColumnView(self.book.txns.dates, self.book.buys)
+
+    @property
+    def prices(self) -> ColumnView[float]:
+        return ColumnView(self.book.txns.prices, self.book.buys)
+
+    @property
+    def qttys(self) -> Sequence[float]:
+        if self.book.exact:
+            return [self.book.get_lot_qtty(pos) for pos in range(len(self))]
+        return self.book.qttys
+
+    @property
+    def qtty_mantissas(self) -> Sequence[int]:
+        """Quantities left as mantissas of 10**-qtty_scale, in exact books"""
+        return self.book.qttys  # type: ignore
+
+    def get_total_qtty(self) -> Union[int, float]:
+        if self.book.exact:
+            return as_number(float(self.get_exact_qtty()))
+        return as_number(float(sum(self.book.qttys)))
+
+    def get_exact_qtty(self) -> Fraction:
+        if self.book.exact:
+            return Fraction(sum(self.qtty_mantissas), 10**self.book.qtty_scale)
+        return Fraction(sum(self.book.qttys))
+
+    def get_exact_amount(self) -> Fraction:
+        book = self.book
+        costs = [book.get_lot_cost(pos, qtty) for pos, qtty in enumerate(book.qttys)]
+        if book.exact:
+            return Fraction(int(sum(costs)), 10**EXACT_PLACES)
+        return sum(map(Fraction, costs), Fraction(0))
+
+    def get_exact_avg_cost(self) -> Fraction:
+        qtty = self.get_exact_qtty()
+        return self.get_exact_amount() / qtty if qtty != 0 else Fraction(0)
+
+    def to_txns(self) -> List[AdjustedTxn]:
+        return [view.to_txn() for view in self]
+
+    def to_dicts(self) -> List[dict]:
+        return [view.asdict() for view in self]
+
+    def __len__(self) -> int:
+        return len(self.book.buys)
+
+    def __iter__(self) -> Iterator[LotView]:
+        return (LotView(self.book, pos) for pos in range(len(self)))
+
+    @overload
+    def __getitem__(self, i: int) -> LotView: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> List[LotView]: ...
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[LotView, List[LotView]]:
+        if isinstance(i, slice):
+            return [LotView(self.book, pos) for pos in range(*i.indices(len(self)))]
+
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("LotsView index out of range")
+        return LotView(self.book, i)
+
+    def __eq__(self, other) -> bool:
+        try:
+            return len(self) == len(other) and all(
+                view == txn for view, txn in zip(self, other)
             )
-            sell_qtty_curr -= buy.qtty
-        else:
-            fifo_lots.append(
-                AdjustedTxn(buy.date, buy.price, buy.base_cur, sell_qtty_curr, buy.acct)
+        except TypeError:
+            return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"LotsView({self.to_txns()!r})"
+
+
+class FifoBook(LotBook):
+    """
+    Buy lots with the quantity left in each one. Sales deplete them in the order
+    of method, one of LOT_METHODS: FIFO by default, LIFO, highest or lowest
+    price first or specific lots, so a sale costs at most O(k log n) for the k
+    lots it takes. Transactions must be applied by date.
+
+    Each account has its own order and a sale takes the lots of its account
+    first. What they lack, like lots moved in by a transfer, is taken from
+    the order over all accounts, which also previews sales that don't name one.
+    """
+
+    def __init__(
+        self,
+        check: bool = False,
+        exact: bool = False,
+        txns: Optional[TxnColumns] = None,
+        method: str = "fifo",
+        realized: bool = False,
+    ) -> None:
+        super().__init__(check, exact, txns, realized)
+        self.method = method
+        self.buys = array("l")
+        self.qttys: Union[IntColumn, "array[float]"] = array("q" if exact else "d")
+        self.order = LOT_METHODS[method](self)
+        self.acct_orders: Dict[int, LotOrder] = {}
+        # Cost of the lots bought in each account, exact ones as mantissas
+        self.acct_amounts: Dict[int, Union[int, float]] = {}
+        self.remaining: Union[int, float] = 0
+        self.last_date = 0
+
+    def get_order(self, columns: TxnColumns) -> Sequence[int]:
+        return get_date_order(columns)
+
+    def apply_index(self, index: int):
+        date_ordinal = self.txns.dates[index]
+        if date_ordinal < self.last_date:
+            raise ValueError(
+                f"Transaction {self.txns[index]} is older than the last one applied"
             )
-            sell_qtty_curr = 0
-        i += 1
 
-    return fifo_lots
+        self.last_date = date_ordinal
+        super().apply_index(index)
 
+    def get_acct_order(self, acct: int) -> LotOrder:
+        order = self.acct_orders.get(acct)
+        if order is None:
+            order = self.acct_orders[acct] = LOT_METHODS[self.method](self)
+        return order
 
-def txn2hl(
-    txns: List[AdjustedTxn],
+    def get_lot_cost(self, pos: int, qtty: Union[int, float]) -> Union[int, float]:
+        """
+        Amount paid for qtty of the lot at pos. When exact, qtty is a mantissa
+        of the txns scale and the cost one of 10**-EXACT_PLACES, rounded.
+        """
+        index = self.buys[pos]
+        if self.exact:
+            cost = int(qtty) * self.txns.get_unit_price(index)
+            return to_places(cost, self.qtty_scale + EXACT_PLACES, EXACT_PLACES)
+        return qtty * self.txns.prices[index]
+
+    def add_buy(self, index: int):
+        qtty = self.get_qtty(index)
+        self.buys.append(index)
+        if self.exact:
+            self.qttys = append_int(self.qttys, int(qtty))  # type: ignore
+        else:
+            self.qttys.append(qtty)  # type: ignore
+        pos = len(self.buys) - 1
+        acct = self.txns.accts[index]
+        self.order.add(pos)
+        self.get_acct_order(acct).add(pos)
+        cost = self.get_lot_cost(pos, qtty)
+        self.acct_amounts[acct] = self.acct_amounts.get(acct, 0) + cost
+        self.remaining += qtty
+
+    def sell(self, index: int):
+        sell_qtty = -self.get_qtty(index)
+        acct = self.txns.accts[index]
+        checks.check_short_sell_available(self.txns[index], sell_qtty, self.remaining)
+        self.remaining -= sell_qtty
+
+        sell_qtty = self.take_lots(index, self.get_acct_order(acct), sell_qtty)
+        if sell_qtty > 0:
+            # Transfers have no price and aren't applied, so lots moved to acct
+            # are still in the account of their buy and sold from there
+            sell_qtty = self.take_lots(index, self.order, sell_qtty)
+        if sell_qtty > 0 and self.method == "specific":
+            buy_date = self.txns.get_buy_date(index)
+            lot = f"bought on {buy_date}" if buy_date else "named by a buy_date tag"
+            raise ValueError(f"No open lot {lot} for sale {self.txns[index]}")
+
+    def take_lots(
+        self, index: int, order: LotOrder, sell_qtty: Union[int, float]
+    ) -> Union[int, float]:
+        """Take up to sell_qtty from the lots of order, returning what is left"""
+        qttys = self.qttys
+        accts = self.txns.accts
+        acct = accts[index]
+        while sell_qtty > 0:
+            pos = order.first(index)
+            if pos is None:
+                break
+
+            buy_index = self.buys[pos]
+            check_sell(self.txns, index, buy_index, self.check, self.exact)
+            buy_qtty = qttys[pos]
+            taken = min(sell_qtty, buy_qtty)
+            qttys[pos] = buy_qtty - taken  # type: ignore
+            sell_qtty -= taken
+            cost = self.get_lot_cost(pos, taken)
+            buy_acct = accts[buy_index]
+            self.acct_amounts[buy_acct] -= cost
+            if buy_acct != acct:
+                self.balances[buy_acct] -= taken
+                self.balances[acct] = self.balances.get(acct, 0) + taken
+            if self.realized is not None:
+                self.add_realized(index, buy_index, taken, cost)
+
+        return sell_qtty
+
+    def rescale(self, factor: int):
+        if self.exact:
+            self.qttys = int_column([int(qtty) * factor for qtty in self.qttys])
+            self.remaining *= factor
+
+    def get_lot_qtty(self, pos: int) -> Union[int, float]:
+        if self.exact:
+            return as_number(self.qttys[pos] / 10**self.qtty_scale)
+        return as_number(self.qttys[pos])
+
+    def get_lots(self) -> LotsView:
+        return LotsView(self)
+
+    def get_available(self) -> Union[float, Fraction]:
+        if self.exact:
+            return Fraction(int(self.remaining), 10**self.qtty_scale)
+        return self.remaining
+
+    def get_acct_cost(self, acct: str) -> float:
+        code = self.txns.acct_names.codes.get(acct)
+        if code is None or self.balances.get(code, 0) == 0:
+            return 0
+        amount = self.acct_amounts[code]
+        return from_exact(int(amount)) if self.exact else amount
+
+    def get_total_cost(self) -> float:
+        amount = sum(
+            amount
+            for acct, amount in self.acct_amounts.items()
+            if self.balances.get(acct, 0) != 0
+        )
+        return from_exact(int(amount)) if self.exact else amount
+
+    def get_sell_available(self, acct: str) -> Union[float, Fraction]:
+        # Like sell, a sale from acct takes the lots moved to it by transfers
+        # from the other accounts
+        return self.get_available()
+
+    def preview_sell(
+        self, sell_qtty: float, sell_date: str, acct: Optional[str] = None
+    ) -> Sequence[TxnLike]:
+        self.check_sell_available(sell_qtty, acct)
+        positions: Iterable[int] = self.order.preview()
+        if acct is not None:
+            code = self.txns.acct_names.codes.get(acct)
+            acct_order = self.acct_orders.get(code) if code is not None else None
+            if acct_order is not None:
+                positions = dict.fromkeys(chain(acct_order.preview(), positions))
+
+        sell_ordinal = date2ordinal(sell_date)
+        sell_qtty_curr: Union[int, float] = sell_qtty
+        places, factor = self.qtty_scale, 1
+        if self.exact:
+            # Mantissas of 10**-places, enough for the lots and the sale
+            mantissa, sell_places = float2mantissa(sell_qtty)
+            places = max(sell_places, self.qtty_scale)
+            sell_qtty_curr = to_places(mantissa, sell_places, places)
+            factor = 10 ** (places - self.qtty_scale)
+
+        fifo_lots: List[TxnLike] = []
+        dates = self.txns.dates
+        for i in positions:
+            if sell_qtty_curr <= 0:
+                break
+
+            if dates[self.buys[i]] > sell_ordinal or self.qttys[i] == 0:
+                continue
+
+            if self.exact:
+                buy_qtty = self.qttys[i] * factor
+            else:
+                buy_qtty = as_number(self.qttys[i])
+
+            if sell_qtty_curr > buy_qtty:
+                sell_qtty_curr -= buy_qtty
+                lot_qtty = buy_qtty
+            else:
+                lot_qtty, sell_qtty_curr = sell_qtty_curr, 0
+
+            if self.exact:
+                lot_qtty = as_number(lot_qtty / 10**places)
+            fifo_lots.append(LotView(self, i, lot_qtty))
+
+        return fifo_lots
+
+    def snapshot(self) -> "FifoBook":
+        book = super().snapshot()
+        book.buys = array("l", self.buys)
+        book.qttys = copy(self.qttys)
+        book.order = self.order.copy(book)
+        book.acct_orders = {
+            acct: order.copy(book) for acct, order in self.acct_orders.items()
+        }
+        book.acct_amounts = self.acct_amounts.copy()
+        return book
+
+
+def get_lots(
+    txns: TxnsLike, check: bool, exact: bool = False, method: str = "fifo"
+) -> LotsView:
+    return FifoBook.from_txns(txns, check, exact, method=method).get_lots()
+
+
+def get_sell_lots(
+    lots: TxnsLike,
+    sell_date: str,
+    sell_qtty: float,
+    check: bool,
+    exact: bool = False,
+    method: str = "fifo",
+):
+    book = FifoBook.from_txns(lots, check, exact, method=method)
+    return book.preview_sell(sell_qtty, sell_date)
+
+
+def get_sell_txn(
+    txns: Sequence[TxnLike],
     date: str,
     cur: str,
     cash_account: str,
     revenue_account: str,
     value: float,
-):
-    adj_comm = adjust_commodity(cur)
+    method: str = "fifo",
+) -> PrintTxn:
     base_curr = txns[0].base_cur
     avg_cost = get_avg_fifo(txns)
     sum_qtty = sum(txn.qtty for txn in txns)
@@ -100,22 +504,36 @@ def txn2hl(
     dt = datetime.strptime(date, "%Y-%m-%d").date()
     xirr = get_xirr(price, dt, txns) or 0 * 100
 
-    txn_hl = f"""
-{date} Sold {cur}  ; cost_method:fifo
-    ; commodity:{cur}, qtty:{sum_qtty:,.2f}, price:{price:,.2f}
-    ; avg_cost:{avg_cost:,.4f}, xirr:{xirr:.2f}% annual percent rate 30/360US
-    {cash_account}  {value:.2f} {base_curr}
-"""
-
+    comments = [
+        f"cost_method:{method}",
+        f"commodity:{cur}, qtty:{sum_qtty:,.2f}, price:{price:,.2f}",
+        f"avg_cost:{avg_cost:,.4f}, xirr:{xirr:.2f}% annual percent rate 30/360US",
+    ]
+    postings: List[Posting] = [
+        PrintPosting(cash_account, to_amount(f"{value:.2f}", base_curr))
+    ]
     for txn in txns:
-        txn_hl += f"    {txn.acct}    {txn.qtty * -1} {adj_comm} @ {txn.price} {base_curr}  ; buy_date:{txn.date}, base_cur:{txn.base_cur}\n"
-
-    txn_hl += f"    {revenue_account}   "
-    comm = ["hledger", "-f-", "print", "--explicit"]
-    txn_proc = subprocess.run(
-        comm,
-        input=txn_hl.encode(),
-        capture_output=True,
-    )
-    txn_print: str = txn_proc.stdout.decode("utf8")
-    return txn_print
+        lot = PrintPosting(
+            txn.acct,
+            to_amount(txn.qtty * -1, cur),
+            to_amount(txn.price, base_curr),
+            "UnitPrice",
+            f"buy_date:{txn.date}, base_cur:{txn.base_cur}",
+        )
+        postings.append(lot)
+    postings.append(PrintPosting(revenue_account, None))
+
+    return PrintTxn(date, f"Sold {cur}", postings, comments)
+
+
+def txn2hl(
+    txns: Sequence[TxnLike],
+    date: str,
+    cur: str,
+    cash_account: str,
+    revenue_account: str,
+    value: float,
+    method: str = "fifo",
+):
+    txn = get_sell_txn(txns, date, cur, cash_account, revenue_account, value, method)
+    return format_txn(txn)
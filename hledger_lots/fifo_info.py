@@ -1,11 +1,11 @@
-from datetime import datetime
+from datetime import date
 from typing import Optional, Tuple
 
-from .checks import MultipleBaseCurrencies
-from .fifo import get_lots
-from .hl import hledger2txn
+from .fifo import FifoBook
 from .info import AllInfo, Info, LotsInfo
-from .lib import dt_list2table, get_avg_fifo
+from .lib import dt_list2table, get_avg_fifo, parallel_map
+from .price_index import PriceIndex
+from .txn_columns import TxnColumns, as_number
 
 
 class FifoInfo(Info):
@@ -15,16 +15,28 @@ class FifoInfo(Info):
         commodity: str,
         check: bool,
         no_desc: Optional[str] = None,
+        txns: Optional[TxnColumns] = None,
+        exact: bool = False,
+        method: str = "fifo",
+        as_of: Optional[str] = None,
+        price_index: Optional[PriceIndex] = None,
     ):
-        super().__init__(journals, commodity, no_desc)
+        super().__init__(journals, commodity, no_desc, txns, as_of, price_index)
         self.check = check
+        self.exact = exact
 
-        self.lots = get_lots(self.txns, check)
+        self.book = self.get_book(FifoBook, check, exact, method=method)
+        self.lots = self.book.get_lots()
         self.last_buy_date = self.lots[-1].date if len(self.lots) > 0 else None
 
-        self.buy_lots = get_lots(self.txns, check)
+        self.buy_lots = self.lots
         self.table = dt_list2table(self.buy_lots)
 
+    def get_last_buy_date(self) -> Optional[date]:
+        if len(self.lots) == 0:
+            return None
+        return date.fromordinal(self.lots.dates[-1])
+
     def get_info(self):
         if len(self.txns) == 0:
             return None
@@ -32,13 +44,19 @@ class FifoInfo(Info):
         commodity = self.commodity
 
         cur = self.lots[0].base_cur
-        qtty = sum(lot.qtty for lot in self.lots)
-        amount = sum(lot.price * lot.qtty for lot in self.lots)
-        avg_cost = get_avg_fifo(self.lots) if qtty > 0 else 0
-
-        if self.has_txn:
-            last_buy_date_str = self.lots[-1].date
-            last_buy_date = datetime.strptime(last_buy_date_str, "%Y-%m-%d").date()
+        if self.exact:
+            qtty = as_number(float(self.lots.get_exact_qtty()))
+            amount = float(self.lots.get_exact_amount())
+            avg_cost = float(self.lots.get_exact_avg_cost())
+        else:
+            qtty = self.lots.get_total_qtty()
+            amount = sum(
+                price * qtty for price, qtty in zip(self.lots.prices, self.lots.qttys)
+            )
+            avg_cost = get_avg_fifo(self.lots) if qtty > 0 else 0
+
+        last_buy_date = self.get_last_buy_date()
+        if self.has_txn and last_buy_date:
             xirr = self.get_lots_xirr(last_buy_date)
         else:
             xirr = 0
@@ -81,24 +99,48 @@ class FifoInfo(Info):
 
 
 class AllFifoInfo(AllInfo):
-    def __init__(self, journals: Tuple[str, ...], no_desc: str, check: bool):
-        super().__init__(journals, no_desc)
+    def __init__(
+        self,
+        journals: Tuple[str, ...],
+        no_desc: str,
+        check: bool,
+        exact: bool = False,
+        method: str = "fifo",
+        as_of: Optional[str] = None,
+    ):
+        super().__init__(journals, no_desc, as_of)
         self.check = check
+        self.exact = exact
+        self.method = method
 
-    def get_info(self, commodity: str):
-        txns = hledger2txn(self.journals, commodity, self.no_desc)
-        try:
-            lots = get_lots(txns, self.check)
-        except MultipleBaseCurrencies:
+    def get_fifo_info(self, commodity: str) -> Optional[FifoInfo]:
+        txns = self.get_txns(commodity)
+        if len(txns.get_base_curs()) > 1:
             return None
 
-        if len(lots) > 0:
-            lot_info = FifoInfo(self.journals, commodity, self.check).get_info()
-            return lot_info
+        if any(qtty >= 0 for qtty in txns.qttys):
+            return FifoInfo(
+                self.journals,
+                commodity,
+                self.check,
+                self.no_desc,
+                txns,
+                self.exact,
+                self.method,
+                self.as_of,
+                self.price_index,
+            )
+
+    def get_info(self, commodity: str):
+        fifo_info = self.get_fifo_info(commodity)
+        return fifo_info.get_info() if fifo_info is not None else None
 
     @property
     def infos(self):
-        infos = [self.get_info(com) for com in self.commodities]
+        fifo_infos = parallel_map(self.get_fifo_info, self.commodities)
+        fifo_infos = [info for info in fifo_infos if info is not None]
+        self.set_xirrs(fifo_infos)
+        infos = [info.get_info() for info in fifo_infos]
         infos = [info for info in infos if info is not None]
         return infos
 
@@ -0,0 +1,229 @@
+import csv
+import heapq
+import json
+from dataclasses import asdict, astuple, dataclass
+from datetime import date, timedelta
+from itertools import groupby
+from typing import IO, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .avg import AvgBook
+from .fifo import FifoBook
+from .info import AllInfo
+from .lot_book import LotBook
+from .txn_columns import TxnColumns, as_number, date2ordinal
+
+PERIODS = ("daily", "weekly", "monthly")
+
+TOTAL = "Total"
+
+# width and format of each column in the plain output
+PLAIN_COLUMNS = (
+    (10, ""),
+    (-12, ""),
+    (-5, ""),
+    (14, ",.4f"),
+    (16, ",.2f"),
+    (12, ",.4f"),
+    (16, ",.2f"),
+    (16, ",.2f"),
+)
+
+
+@dataclass
+class HistoryRow:
+    date: str
+    comm: str
+    cur: str
+    qtty: Optional[float]
+    cost: float
+    mkt_price: Optional[float]
+    mkt_value: Optional[float]
+    unrealized: Optional[float]
+
+
+def get_period_end(ordinal: int, period: str) -> int:
+    """Ordinal of the last day of the period holding ordinal, weeks end on Sunday"""
+    if period == "daily":
+        return ordinal
+
+    day = date.fromordinal(ordinal)
+    if period == "weekly":
+        return ordinal + 6 - day.weekday()
+
+    next_month = day.replace(day=28) + timedelta(days=4)
+    return next_month.toordinal() - next_month.day
+
+
+def sweep_history(
+    commodity: str,
+    book: LotBook,
+    prices: Sequence[Tuple[str, float]],
+    period: str,
+    end: int,
+) -> Iterator[HistoryRow]:
+    """
+    Rows at the end of each period until end, merging the transactions
+    applied to book with the prices, both sorted by date, in one pass.
+    Periods holding nothing have no row.
+    """
+    txns = book.txns
+    order = book.get_order(txns)
+    if len(order) == 0:
+        return
+
+    cur = txns.base_cur_names.names[txns.base_curs[order[0]]]
+    price_dates = [date2ordinal(price_date) for price_date, _ in prices]
+    n, p, price = 0, 0, None
+    period_end = get_period_end(txns.dates[order[0]], period)
+    while period_end <= get_period_end(end, period):
+        while n < len(order) and txns.dates[order[n]] <= period_end:
+            book.apply_index(order[n])
+            n += 1
+        while p < len(prices) and price_dates[p] <= period_end:
+            price = prices[p][1]
+            p += 1
+
+        qtty = as_number(float(book.get_available()))
+        if qtty != 0:
+            cost = float(book.get_total_cost())
+            mkt_value = qtty * price if price is not None else None
+            yield HistoryRow(
+                date.fromordinal(period_end).isoformat(),
+                commodity,
+                cur,
+                qtty,
+                cost,
+                price,
+                mkt_value,
+                mkt_value - cost if mkt_value is not None else None,
+            )
+        period_end = get_period_end(period_end + 1, period)
+
+
+def get_totals(rows: List[HistoryRow]) -> List[HistoryRow]:
+    """
+    Cost, market value and unrealized profit of rows of the same date by base
+    currency. Holdings without a market price count at cost.
+    """
+    totals: Dict[str, HistoryRow] = {}
+    for row in rows:
+        total = totals.setdefault(
+            row.cur, HistoryRow(row.date, TOTAL, row.cur, None, 0, None, 0, 0)
+        )
+        mkt_value = row.mkt_value if row.mkt_value is not None else row.cost
+        total.cost += row.cost
+        total.mkt_value += mkt_value  # type: ignore
+        total.unrealized += mkt_value - row.cost  # type: ignore
+    return list(totals.values())
+
+
+class AllHistory(AllInfo):
+    """
+    Holdings, cost basis, market value and unrealized profit of each
+    commodity at the end of every day, week or month, streamed as produced.
+    """
+
+    def __init__(
+        self,
+        journals: Tuple[str, ...],
+        no_desc: str,
+        check: bool,
+        avg_cost: bool,
+        exact: bool = False,
+        method: str = "fifo",
+        period: str = "monthly",
+        commodity: Optional[str] = None,
+    ) -> None:
+        super().__init__(journals, no_desc)
+        self.check = check
+        self.avg_cost = avg_cost
+        self.exact = exact
+        self.method = method
+        self.period = period
+        self.totals = not commodity
+        if commodity:
+            self.commodities = [commodity.upper()]
+
+    def get_book(self, txns: TxnColumns) -> LotBook:
+        if self.avg_cost:
+            return AvgBook(self.check, self.exact, txns)
+        return FifoBook(self.check, self.exact, txns, method=self.method)
+
+    def get_prices(self) -> Dict[str, List[Tuple[str, float]]]:
+        return {
+            commodity: self.price_index.get_range(commodity)
+            for commodity in self.commodities
+            if len(self.get_txns(commodity)) > 0
+        }
+
+    def get_end(self, prices: Dict[str, List[Tuple[str, float]]]) -> int:
+        """Last transaction or price date of all commodities"""
+        txns_ends = [max(self.get_txns(comm).dates) for comm in prices]
+        prices_ends = [
+            date2ordinal(comm_prices[-1][0])
+            for comm_prices in prices.values()
+            if comm_prices
+        ]
+        return max([*txns_ends, *prices_ends], default=0)
+
+    def iter_rows(self) -> Iterator[HistoryRow]:
+        """Rows of all commodities by date, each date followed by its totals"""
+        prices = self.get_prices()
+        end = self.get_end(prices)
+
+        sweeps = []
+        for commodity, comm_prices in prices.items():
+            txns = self.get_txns(commodity)
+            if len(txns.get_base_curs()) > 1:
+                continue
+            book = self.get_book(txns)
+            sweeps.append(sweep_history(commodity, book, comm_prices, self.period, end))
+
+        rows = heapq.merge(*sweeps, key=lambda row: row.date)
+        for _, date_rows in groupby(rows, key=lambda row: row.date):
+            if not self.totals:
+                yield from date_rows
+                continue
+
+            date_rows = list(date_rows)
+            yield from date_rows
+            yield from get_totals(date_rows)
+
+
+FIELDS = list(HistoryRow.__dataclass_fields__)
+
+
+def format_plain(values: Sequence) -> str:
+    cells = []
+    for value, (width, number_format) in zip(values, PLAIN_COLUMNS):
+        if value is None:
+            value = ""
+        elif number_format and not isinstance(value, str):
+            value = format(value, number_format)
+        align = "<" if width < 0 else ">"
+        cells.append(f"{value:{align}{abs(width)}}")
+    return "  ".join(cells).rstrip()
+
+
+def write_plain(rows: Iterator[HistoryRow], out: IO[str]):
+    """Rows as fixed width columns, written as they come"""
+    out.write(format_plain(FIELDS) + "\n")
+    for row in rows:
+        out.write(format_plain(astuple(row)) + "\n")
+
+
+def write_csv(rows: Iterator[HistoryRow], out: IO[str]):
+    writer = csv.writer(out)
+    writer.writerow(FIELDS)
+    for row in rows:
+        writer.writerow(astuple(row))
+
+
+def write_json(rows: Iterator[HistoryRow], out: IO[str]):
+    """Rows as a JSON array, one object per line"""
+    out.write("[")
+    separator = "\n"
+    for row in rows:
+        out.write(separator + "  " + json.dumps(asdict(row)))
+        separator = ",\n"
+    out.write("\n]\n")
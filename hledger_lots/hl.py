@@ -1,9 +1,42 @@
 import json
+import re
 import subprocess
 import sys
-from typing import List, Optional, Tuple
+import tempfile
+from abc import ABC, abstractmethod
+from datetime import date
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
-from .lib import AdjustedTxn, Txn, get_avg_fifo, get_files_comm, get_xirr
+from .cache import TxnCache
+from .lib import (
+    AdjustedTxn,
+    ExactAmounts,
+    PricedAmount,
+    PricelessAmount,
+    Txn,
+    get_avg_fifo,
+    get_files_comm,
+    get_sales,
+    get_xirr,
+    is_revenue_name,
+)
+from .price_index import PriceIndex
+from .price_store import load_price_index, use_price_store
+from .txn_columns import TxnColumns
+
+try:
+    import orjson
+
+    json_loads: Callable[[bytes], Any] = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+CHUNK_SIZE = 1 << 16
+JSON_TOKENS = re.compile(rb'[{}\[\]"]')
+JSON_STRING_END = re.compile(rb'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+JSON_ARRAY_START = re.compile(rb"\s*\[(?:(\n[ \t]*)[{\[]|\s*\S)")
+JSON_EMPTY = re.compile(rb"[{\[]\s*[}\]]")
+JSON_NEXT_ELEMENT = re.compile(rb"\s*(?:,\s*[{\[]|\])")
 
 
 def adjust_txn(txn: Txn) -> AdjustedTxn:
@@ -13,38 +46,426 @@ def adjust_txn(txn: Txn) -> AdjustedTxn:
     return result
 
 
-def prices_items2txn(date: str, prices_items: dict, account: str) -> Txn:
+def get_exact_amounts(qtty: dict, price: dict) -> Optional[ExactAmounts]:
+    try:
+        return (
+            qtty["decimalMantissa"],
+            qtty["decimalPlaces"],
+            price["decimalMantissa"],
+            price["decimalPlaces"],
+        )
+    except KeyError:
+        return None
+
+
+def get_buy_date(posting_items: dict) -> Optional[str]:
+    for name, value in posting_items.get("ptags", []):
+        if name == "buy_date":
+            return value.strip()
+    return None
+
+
+def prices_items2txn(
+    date: str,
+    prices_items: dict,
+    account: str,
+    buy_date: Optional[str] = None,
+    sale: Optional[ExactAmounts] = None,
+) -> Txn:
     price = prices_items["aprice"]["contents"]["aquantity"]["floatingPoint"]
     base_cur = prices_items["aprice"]["contents"]["acommodity"]
     qtty = prices_items["aquantity"]["floatingPoint"]
     price_type = prices_items["aprice"]["tag"]
+    exact = get_exact_amounts(
+        prices_items["aquantity"], prices_items["aprice"]["contents"]["aquantity"]
+    )
 
-    txn = Txn(date, price, base_cur, qtty, account, price_type)
+    txn = Txn(date, price, base_cur, qtty, account, price_type, exact, buy_date, sale)
     return txn
 
 
+def iter_scanned_elements(
+    chunks: Iterator[bytes], buf: bytes, pos: int
+) -> Iterator[bytes]:
+    depth = 1
+    start = 0
+
+    while True:
+        while True:
+            token = JSON_TOKENS.search(buf, pos)
+            if not token:
+                pos = len(buf)
+                break
+
+            char = token.group()
+            if char == b'"':
+                string_end = JSON_STRING_END.match(buf, token.end())
+                if not string_end:
+                    pos = token.start()
+                    break
+                pos = string_end.end()
+                continue
+
+            pos = token.end()
+            if char in b"{[":
+                depth += 1
+                if depth == 2:
+                    start = token.start()
+            else:
+                depth -= 1
+                if depth == 1:
+                    yield buf[start:pos]
+                elif depth == 0:
+                    return
+
+        cut = start if depth >= 2 else pos
+        buf = buf[cut:]
+        pos -= cut
+        start -= cut
+
+        chunk = next(chunks, b"")
+        if not chunk:
+            return
+        buf += chunk
+
+
+def iter_indented_elements(
+    chunks: Iterator[bytes], buf: bytes, pos: int, indent: bytes
+) -> Iterator[bytes]:
+    # Pretty printed JSON has no raw newline inside strings, so the closing
+    # bracket of a top level element is the only one found right after "\n"
+    # and the element indentation
+    element_end = re.compile(re.escape(indent) + rb"[}\]]")
+
+    while True:
+        end = JSON_EMPTY.match(buf, pos) or element_end.search(buf, pos)
+        next_element = JSON_NEXT_ELEMENT.match(buf, end.end()) if end else None
+        if not end or not next_element:
+            buf = buf[pos:]
+            pos = 0
+            chunk = next(chunks, b"")
+            if not chunk:
+                return
+            buf += chunk
+            continue
+
+        yield buf[pos : end.end()]
+        if next_element.group().endswith(b"]"):
+            return
+        pos = next_element.end() - 1
+
+
+def iter_json_array(stream: IO[bytes], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield the raw bytes of each element of a top level JSON array, one at a time"""
+    chunks = iter(lambda: stream.read(chunk_size), b"")
+    buf = b""
+
+    array_start = None
+    for chunk in chunks:
+        buf += chunk
+        array_start = JSON_ARRAY_START.match(buf)
+        if array_start:
+            break
+
+    if not array_start:
+        return
+
+    pos = array_start.end() - 1
+    indent = array_start.group(1)
+    if indent:
+        yield from iter_indented_elements(chunks, buf, pos, indent)
+    else:
+        yield from iter_scanned_elements(chunks, buf, pos)
+
+
+def run_print(file_path: Tuple[str, ...], *query: str) -> Iterator[dict]:
+    files_comm = get_files_comm(file_path)
+    comm = ["hledger", *files_comm, "print", *query, "--output-format=json"]
+
+    with tempfile.TemporaryFile() as stderr:
+        with subprocess.Popen(
+            comm, stdin=sys.stdin, stdout=subprocess.PIPE, stderr=stderr
+        ) as hl_proc:
+            assert hl_proc.stdout
+            for txn_bytes in iter_json_array(hl_proc.stdout):
+                yield json_loads(txn_bytes)
+
+        if hl_proc.returncode != 0:
+            stderr.seek(0)
+            raise ValueError(stderr.read().decode("utf8"))
+
+
+def get_txn_sales(
+    txn: dict, is_revenue: Callable[[str], bool] = is_revenue_name
+) -> Dict[str, ExactAmounts]:
+    """Quantity of each commodity the transaction sold and the cash it got"""
+    priced: List[PricedAmount] = []
+    priceless: List[PricelessAmount] = []
+    try:
+        for posting_items in txn["tpostings"]:
+            for prices_items in posting_items["pamount"]:
+                qtty = prices_items["aquantity"]
+                amount = (qtty["decimalMantissa"], qtty["decimalPlaces"])
+                if prices_items["aprice"]:
+                    base_cur = prices_items["aprice"]["contents"]["acommodity"]
+                    priced.append((prices_items["acommodity"], base_cur, *amount))
+                else:
+                    account = posting_items["paccount"]
+                    priceless.append((account, prices_items["acommodity"], *amount))
+    except KeyError:
+        return {}
+    return get_sales(priced, priceless, is_revenue)
+
+
+def txns_list2txns(
+    txns_list: Iterable[dict], is_revenue: Callable[[str], bool] = is_revenue_name
+) -> Iterator[Tuple[str, Txn]]:
+    for txn in txns_list:
+        sales = get_txn_sales(txn, is_revenue)
+        for posting_items in txn["tpostings"]:
+            for prices_items in posting_items["pamount"]:
+                if prices_items["aprice"]:
+                    cur = prices_items["acommodity"].upper()
+                    yield cur, prices_items2txn(
+                        txn["tdate"],
+                        prices_items,
+                        posting_items["paccount"],
+                        get_buy_date(posting_items),
+                        sales.get(prices_items["acommodity"]),
+                    )
+
+
+def txns2columns_by_cur(txns: Iterable[Tuple[str, Txn]]) -> Dict[str, TxnColumns]:
+    txns_by_cur: Dict[str, TxnColumns] = {}
+    for cur, txn in txns:
+        if cur not in txns_by_cur:
+            txns_by_cur[cur] = TxnColumns()
+        txns_by_cur[cur].append_txn(txn)
+
+    return txns_by_cur
+
+
+class Backend(ABC):
+    name = ""
+    cacheable = True
+    # Backends that keep their own transactions between runs aren't cached
+    # again by TxnCache
+    keeps_txns = False
+
+    def __init__(self) -> None:
+        self.price_indexes: Dict[Tuple[str, ...], PriceIndex] = {}
+
+    @abstractmethod
+    def read_txns(
+        self, file_path: Tuple[str, ...], cur: str, no_desc: Optional[str] = None
+    ) -> TxnColumns:
+        raise NotImplementedError
+
+    @abstractmethod
+    def read_txns_by_cur(
+        self, file_path: Tuple[str, ...], no_desc: Optional[str] = None
+    ) -> Dict[str, TxnColumns]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def read_price_index(self, file_path: Tuple[str, ...]) -> PriceIndex:
+        """Market prices of all commodities, including reverse prices"""
+        raise NotImplementedError
+
+    def get_price_index(self, file_path: Tuple[str, ...]) -> PriceIndex:
+        """The price index of file_path, read once and shared by every report"""
+        price_index = self.price_indexes.get(file_path)
+        if price_index is None:
+            price_index = self.price_indexes[file_path] = self.load_price_index(
+                file_path
+            )
+        return price_index
+
+    def load_price_index(self, file_path: Tuple[str, ...]) -> PriceIndex:
+        """From the price store if enabled, read again only if the prices changed"""
+        if self.cacheable and use_price_store():
+            return load_price_index(
+                file_path, self.name, lambda: self.read_price_index(file_path)
+            )
+        return self.read_price_index(file_path)
+
+    def read_prices(
+        self, file_path: Tuple[str, ...], commodity: str
+    ) -> List[Tuple[str, float]]:
+        """Dates and market prices of commodity, including reverse prices"""
+        return self.get_price_index(file_path).get_range(commodity)
+
+    def read_last_price(
+        self, file_path: Tuple[str, ...], commodity: str
+    ) -> Tuple[Optional[date], Optional[float]]:
+        return self.get_price_index(file_path).get_last(commodity)
+
+    @abstractmethod
+    def read_commodities(self, file_path: Tuple[str, ...]) -> List[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def read_accounts(
+        self,
+        file_path: Tuple[str, ...],
+        cur: Optional[str] = None,
+        no_desc: Optional[str] = None,
+    ) -> List[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def read_last_purchase(
+        self, file_path: Tuple[str, ...], cur: str, no_desc: Optional[str] = None
+    ) -> Optional[str]:
+        raise NotImplementedError
+
+
+def run_hledger(file_path: Tuple[str, ...], *comm: str) -> str:
+    command = ["hledger", *get_files_comm(file_path), *comm]
+    proc = subprocess.run(command, capture_output=True)
+    if proc.returncode != 0:
+        raise subprocess.SubprocessError(proc.stderr.decode("utf8"))
+
+    result = proc.stdout.decode("utf8")
+    return result
+
+
+def print_txns(txns_hl: Iterable[str]) -> str:
+    """
+    Format transactions written as journal text with a single hledger print.
+    If any of them is invalid, none is printed.
+    """
+    comm = ["hledger", "-f-", "print", "--explicit"]
+    txns_text = "\n\n".join(txn_hl.strip("\n") for txn_hl in txns_hl)
+    proc = subprocess.run(comm, input=txns_text.encode(), capture_output=True)
+    if proc.returncode != 0:
+        raise subprocess.SubprocessError(proc.stderr.decode("utf8"))
+
+    return proc.stdout.decode("utf8")
+
+
+def get_rows(text: str) -> List[str]:
+    return [row for row in text.split("\n") if row != ""]
+
+
+class HledgerBackend(Backend):
+    name = "hledger"
+
+    def read_txns(
+        self, file_path: Tuple[str, ...], cur: str, no_desc: Optional[str] = None
+    ) -> TxnColumns:
+        query = [f"cur:{cur}"]
+        if no_desc:
+            query.append(f"not:desc:{no_desc}")
+
+        txns_list = run_print(file_path, *query)
+        is_revenue = self.read_revenue_test(file_path)
+        adjusted_txns = TxnColumns()
+        for txn_cur, txn in txns_list2txns(txns_list, is_revenue):
+            if txn_cur == cur.upper():
+                adjusted_txns.append_txn(txn)
+
+        return adjusted_txns
+
+    def read_txns_by_cur(
+        self, file_path: Tuple[str, ...], no_desc: Optional[str] = None
+    ) -> Dict[str, TxnColumns]:
+        query = [f"not:desc:{no_desc}"] if no_desc else []
+        txns_list = run_print(file_path, *query)
+        is_revenue = self.read_revenue_test(file_path)
+        return txns2columns_by_cur(txns_list2txns(txns_list, is_revenue))
+
+    def read_revenue_test(self, file_path: Tuple[str, ...]) -> Callable[[str], bool]:
+        """
+        Whether an account has the Revenue type, declared or inferred from its
+        name. hledger versions without the type: query only infer it by name.
+        """
+        try:
+            revenue_accts = set(get_rows(run_hledger(file_path, "accounts", "type:R")))
+        except subprocess.SubprocessError:
+            return is_revenue_name
+        return lambda account: account in revenue_accts
+
+    def read_price_index(self, file_path: Tuple[str, ...]) -> PriceIndex:
+        prices_txt = run_hledger(file_path, "prices", "--infer-reverse-prices")
+        return PriceIndex.from_hledger(prices_txt)
+
+    def read_commodities(self, file_path: Tuple[str, ...]) -> List[str]:
+        comm = ["hledger", *get_files_comm(file_path), "commodities"]
+        commodities_proc = subprocess.run(comm, capture_output=True)
+        commodities_str = commodities_proc.stdout.decode("utf8")
+        return get_rows(commodities_str)
+
+    def read_accounts(
+        self,
+        file_path: Tuple[str, ...],
+        cur: Optional[str] = None,
+        no_desc: Optional[str] = None,
+    ) -> List[str]:
+        query = [f"cur:{cur}"] if cur else []
+        if no_desc:
+            query.append(f"not:desc:{no_desc}")
+
+        accts_txt = run_hledger(file_path, "accounts", *query)
+        return get_rows(accts_txt)
+
+    def read_last_purchase(
+        self, file_path: Tuple[str, ...], cur: str, no_desc: Optional[str] = None
+    ) -> Optional[str]:
+        query = [f"cur:{cur}", "amt:>0"]
+        if no_desc:
+            query.append(f"not:desc:{no_desc}")
+
+        reg = run_hledger(file_path, "reg", *query)
+        rows_list = get_rows(reg)
+        if len(rows_list) > 0:
+            last_date = rows_list[-1][0:10]
+            return last_date
+
+
+backend: Backend = HledgerBackend()
+
+
+def get_backend() -> Backend:
+    return backend
+
+
+def set_backend(new_backend: Backend):
+    global backend
+    backend = new_backend
+
+
+def get_txn_cache(file_path: Tuple[str, ...], backend: Backend) -> TxnCache:
+    cacheable = backend.cacheable and not backend.keeps_txns
+    return TxnCache(file_path, max_size=None if cacheable else 0)
+
+
 def hledger2txn(
     file_path: Tuple[str, ...], cur: str, no_desc: Optional[str] = None
-) -> List[AdjustedTxn]:
-    files_comm = get_files_comm(file_path)
-    comm = ["hledger", *files_comm, "print", f"cur:{cur}", "--output-format=json"]
-    if no_desc:
-        comm.append(f"not:desc:{no_desc}")
-
-    hl_proc = subprocess.run(comm, stdin=sys.stdin, capture_output=True)
-    if hl_proc.returncode != 0:
-        raise ValueError(hl_proc.stderr.decode("utf8"))
-
-    hl_data = hl_proc.stdout.decode("utf8")
-    txns_list = json.loads(hl_data)
-
-    txns = [
-        prices_items2txn(txn["tdate"], prices_items, posting_items["paccount"])
-        for txn in txns_list
-        for posting_items in txn["tpostings"]
-        for prices_items in posting_items["pamount"]
-        if prices_items["acommodity"].upper() == cur.upper() and prices_items["aprice"]
-    ]
-
-    adjusted_txns = [adjust_txn(txn) for txn in txns]
-    return adjusted_txns
+) -> TxnColumns:
+    backend = get_backend()
+    cache = get_txn_cache(file_path, backend)
+    txns_by_cur = cache.get(backend.name, "txns_by_cur", no_desc or "")
+    if txns_by_cur is not None:
+        return txns_by_cur.get(cur.upper(), TxnColumns())
+
+    return cache.get_or_set(
+        lambda: backend.read_txns(file_path, cur, no_desc),
+        backend.name,
+        "txns",
+        cur.upper(),
+        no_desc or "",
+    )
+
+
+def hledger2txns_by_cur(
+    file_path: Tuple[str, ...], no_desc: Optional[str] = None
+) -> Dict[str, TxnColumns]:
+    backend = get_backend()
+    cache = get_txn_cache(file_path, backend)
+    return cache.get_or_set(
+        lambda: backend.read_txns_by_cur(file_path, no_desc),
+        backend.name,
+        "txns_by_cur",
+        no_desc or "",
+    )
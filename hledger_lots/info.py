@@ -1,15 +1,19 @@
 import csv
-import re
-import subprocess
+from abc import ABC, abstractmethod
+from array import array
 from dataclasses import dataclass
-from datetime import date, datetime
+from datetime import date
 from io import StringIO
-from typing import List, Optional, Tuple, TypedDict
+from typing import Hashable, List, Optional, Sequence, Tuple, Type, TypedDict
 
 from tabulate import tabulate
 
-from .hl import hledger2txn
-from .lib import adjust_commodity, get_files_comm, get_xirr
+from .checkpoints import get_checkpoints
+from .hl import get_backend, hledger2txn, hledger2txns_by_cur
+from .lib import XirrResults, adjust_commodity, get_files_comm, get_xirrs
+from .lot_book import BookT
+from .price_index import PriceIndex
+from .txn_columns import TxnColumns, date2ordinal
 
 
 class LotsInfo(TypedDict):
@@ -33,63 +37,110 @@ class Price:
     cur: str
 
 
-def get_last_price(files_comm: List[str], commodity: str):
-    prices_comm = [
-        "hledger",
-        *files_comm,
-        "prices",
-        f"cur:{commodity}",
-        "--infer-reverse-prices",
-    ]
-    prices_proc = subprocess.run(prices_comm, capture_output=True)
-    prices_str = prices_proc.stdout.decode("utf8")
+def get_last_price(journals: Tuple[str, ...], commodity: str):
+    return get_backend().read_last_price(journals, commodity)
 
-    if prices_str == "":
-        return (None, None)
 
-    prices_list = [row.split(" ", 3) for row in prices_str.split("\n") if row != ""]
-
-    date_list = [
-        (row[1], re.sub(r"[^0-9.]", "", row[3])) for row in prices_list if len(row) > 0
-    ]
-
-    if len(date_list) == 0:
-        return (None, None)
-
-    last_date_str = date_list[-1][0]
-    last_date = datetime.strptime(last_date_str, "%Y-%m-%d").date()
-    last_price = float(date_list[-1][1])
-    return (last_date, last_price)
+def get_price_index(journals: Tuple[str, ...]) -> PriceIndex:
+    return get_backend().get_price_index(journals)
 
 
 def get_commodities(journals: Tuple[str, ...]):
-    files_comm = get_files_comm(journals)
-    comm = ["hledger", *files_comm, "commodities"]
-    commodities_proc = subprocess.run(comm, capture_output=True)
-    commodities_str = commodities_proc.stdout.decode("utf8")
+    return get_backend().read_commodities(journals)
 
-    commodities_list = [com for com in commodities_str.split("\n") if com != ""]
-    return commodities_list
 
-
-class Info:
+class Info(ABC):
     def __init__(
-        self, journals: Tuple[str, ...], commodity: str, no_desc: Optional[str] = None
+        self,
+        journals: Tuple[str, ...],
+        commodity: str,
+        no_desc: Optional[str] = None,
+        txns: Optional[TxnColumns] = None,
+        as_of: Optional[str] = None,
+        price_index: Optional[PriceIndex] = None,
     ) -> None:
         self.journals = journals
         self.files_comm = get_files_comm(journals)
         self.commodity = commodity.upper()
-        self.txns = hledger2txn(journals, commodity, no_desc)
+        self.no_desc = no_desc
+        self.all_txns = (
+            txns if txns is not None else hledger2txn(journals, commodity, no_desc)
+        )
+        self.as_of = as_of
+        self.txns = self.get_txns_as_of()
 
         self.has_txn = len(self.txns) > 0
-        self.last_price = get_last_price(self.files_comm, commodity)
+        self.price_index = price_index or get_price_index(journals)
+        self.last_price = self.price_index.get_last(commodity)
 
         self.market_date, self.market_price = self.last_price
+        if as_of:
+            self.market_date, self.market_price = self.price_index.get_as_of(
+                commodity, date2ordinal(as_of)
+            )
+
+        self.xirrs: Optional[XirrResults] = None
+        self.xirr_group: Hashable = self.commodity
+
+    def get_txns_as_of(self) -> TxnColumns:
+        if not self.as_of:
+            return self.all_txns
+
+        ordinal = date2ordinal(self.as_of)
+        dates = self.all_txns.dates
+        return self.all_txns.take(i for i in range(len(dates)) if dates[i] <= ordinal)
+
+    def get_book(
+        self, book_cls: Type[BookT], check: bool, exact: bool, **options
+    ) -> BookT:
+        """Book of the transactions, restored from a checkpoint when as_of is set"""
+        if not self.as_of:
+            return book_cls.from_txns(self.txns, check, exact, **options)
+
+        points = get_checkpoints(
+            self.journals,
+            self.commodity,
+            self.no_desc,
+            self.all_txns,
+            book_cls,
+            check,
+            exact,
+            **options,
+        )
+        return points.as_of(self.as_of)
+
+    @abstractmethod
+    def get_last_buy_date(self) -> Optional[date]:
+        raise NotImplementedError
+
+    def get_xirr_flows(self, last_buy_date: Optional[date]):
+        """
+        Date ordinals and amounts of the transactions and of selling what is
+        left at market price, or None without a market price after last_buy_date
+        """
+        if not (self.market_date and self.market_price and last_buy_date):
+            return None
+        if self.market_date < last_buy_date or len(self.txns) == 0:
+            return None
+
+        txns = self.txns
+        dates = array("l", txns.dates)
+        amounts = array(
+            "d", (price * qtty for price, qtty in zip(txns.prices, txns.qttys))
+        )
+        dates.append(self.market_date.toordinal())
+        amounts.append(-sum(txns.qttys) * self.market_price)
+        return dates, amounts
 
     def get_lots_xirr(self, last_buy_date: date):
-        if self.market_date and self.market_price and self.market_date >= last_buy_date:
-            xirr = get_xirr(self.market_price, self.market_date, self.txns)
-            return xirr
+        """Rate of the xirr flows, None when they have none"""
+        if self.xirrs is None:
+            flows = self.get_xirr_flows(last_buy_date)
+            if flows is None:
+                return None
+            dates, amounts = flows
+            self.xirrs = get_xirrs(dates, amounts, [self.xirr_group] * len(dates))
+        return self.xirrs.rates.get(self.xirr_group)
 
     def get_info_txt(self, info: LotsInfo):
         info_txt = f"""
@@ -116,10 +167,34 @@ Xirr:          {info['xirr']} (APR 30/360US)
 
 
 class AllInfo:
-    def __init__(self, journals: Tuple[str, ...], no_desc: str) -> None:
+    def __init__(
+        self, journals: Tuple[str, ...], no_desc: str, as_of: Optional[str] = None
+    ) -> None:
         self.journals = journals
         self.no_desc = no_desc
+        self.as_of = as_of
         self.commodities = get_commodities(journals)
+        self.txns_by_cur = hledger2txns_by_cur(journals, no_desc)
+        self.price_index = get_price_index(journals)
+
+    def get_txns(self, commodity: str) -> TxnColumns:
+        return self.txns_by_cur.get(commodity.upper(), TxnColumns())
+
+    def set_xirrs(self, infos: Sequence[Info]) -> XirrResults:
+        """Compute the xirr of all infos in one batch, grouped by commodity"""
+        dates, amounts, groups = array("l"), array("d"), array("l")
+        for group, info in enumerate(infos):
+            info.xirr_group = group
+            flows = info.get_xirr_flows(info.get_last_buy_date())
+            if flows is not None:
+                dates.extend(flows[0])
+                amounts.extend(flows[1])
+                groups.extend([group] * len(flows[0]))
+
+        xirrs = get_xirrs(dates, amounts, groups)
+        for info in infos:
+            info.xirrs = xirrs
+        return xirrs
 
     def get_infos_table(self, infos: List[LotsInfo], output_format: str):
         infos_list = [info for info in infos]
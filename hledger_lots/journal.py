@@ -0,0 +1,738 @@
+import glob
+import hashlib
+import os
+import re
+from dataclasses import dataclass, field
+from datetime import date
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .cache import (
+    CACHE_VERSION,
+    evict,
+    get_cache_dir,
+    get_max_size,
+    read_pickle,
+    write_pickle,
+)
+from .hl import Backend
+from .lib import (
+    ExactAmounts,
+    PricedAmount,
+    PricelessAmount,
+    Txn,
+    get_sales,
+    is_revenue_name,
+)
+from .price_index import PriceIndex
+from .price_index import PriceRow as IndexRow
+from .txn_columns import TxnColumns
+
+DATE_REGEX = re.compile(r"^(?:(\d{4})[-/.])?(\d{1,2})[-/.](\d{1,2})(?:=\S+)?")
+STATUS_REGEX = re.compile(r"^\s*[*!]\s*")
+CODE_REGEX = re.compile(r"^\([^)]*\)\s*")
+SEPARATOR_REGEX = re.compile(r" {2,}|\t")
+SYMBOL_PATTERN = r'"[^"]*"|[^-+\d\s.,@;="\'()*{}\[\]]+'
+NUMBER_PATTERN = r"\d[\d,.]*|[.,]\d+"
+AMOUNT_REGEX = re.compile(
+    rf"^(?P<sign>[-+]?)\s*(?:"
+    rf"(?P<lsym>{SYMBOL_PATTERN})\s*(?P<lsign>[-+]?)\s*(?P<lnum>{NUMBER_PATTERN})"
+    rf"|(?P<rnum>{NUMBER_PATTERN})\s*(?P<rsym>{SYMBOL_PATTERN})?)$"
+)
+PRICE_REGEX = re.compile(
+    rf"^P\s+(?P<date>\S+)(?:\s+\d{{1,2}}:\d{{2}}(?::\d{{2}})?)?"
+    rf"\s+(?P<comm>{SYMBOL_PATTERN})\s+(?P<amount>.+)$"
+)
+COMMENT_PREFIXES = (";", "#", "*", "%")
+BUY_DATE_REGEX = re.compile(r"\bbuy_date:\s*(\d{4}-\d{2}-\d{2})")
+TYPE_REGEX = re.compile(r"\btype:\s*(\w+)")
+REVENUE_TYPES = ("R", "REVENUE")
+
+AmountRow = Tuple[str, int, int]
+PostingRow = Tuple[str, Optional[AmountRow], Optional[AmountRow], str, str]
+TxnRow = Tuple[str, str, Tuple[PostingRow, ...]]
+PriceRow = Tuple[str, str, AmountRow]
+
+
+class JournalError(Exception):
+    def __init__(self, file: str, line: int, message: str) -> None:
+        self.message = f"{file}:{line}: {message}"
+        super().__init__(self.message)
+
+
+@dataclass
+class Amount:
+    commodity: str
+    mantissa: int
+    places: int
+
+    @property
+    def quantity(self) -> float:
+        return self.mantissa / 10**self.places
+
+    def to_row(self) -> AmountRow:
+        return (self.commodity, self.mantissa, self.places)
+
+
+@dataclass
+class Posting:
+    account: str
+    amount: Optional[Amount]
+    price: Optional[Amount] = None
+    price_type: str = ""
+    comment: str = ""
+
+    @property
+    def buy_date(self) -> Optional[str]:
+        """Date of the lot a sale posting takes, in its buy_date tag"""
+        search = BUY_DATE_REGEX.search(self.comment)
+        return search.group(1) if search else None
+
+    def to_row(self) -> PostingRow:
+        amount = self.amount.to_row() if self.amount else None
+        price = self.price.to_row() if self.price else None
+        return (self.account, amount, price, self.price_type, self.comment)
+
+    @classmethod
+    def from_row(cls, row: PostingRow):
+        account, amount, price, price_type, comment = row
+        return cls(
+            account,
+            Amount(*amount) if amount else None,
+            Amount(*price) if price else None,
+            price_type,
+            comment,
+        )
+
+    def add_comment(self, comment: str):
+        """Comment after the posting or in a comment row below it"""
+        comment = comment.strip().lstrip(";").strip()
+        self.comment = f"{self.comment}\n{comment}" if self.comment else comment
+
+
+@dataclass
+class Transaction:
+    date: str
+    description: str
+    postings: List[Posting] = field(default_factory=list)
+
+    def to_row(self) -> TxnRow:
+        postings = tuple(posting.to_row() for posting in self.postings)
+        return (self.date, self.description, postings)
+
+    def get_sales(self, is_revenue: Callable[[str], bool]) -> Dict[str, ExactAmounts]:
+        """Quantity of each commodity the transaction sold and the cash it got"""
+        priced: List[PricedAmount] = []
+        priceless: List[PricelessAmount] = []
+        for posting in self.postings:
+            amount = posting.amount
+            if amount is None:
+                # cash left for hledger to infer, at the posting prices
+                if not is_revenue(posting.account):
+                    return {}
+            elif posting.price:
+                base_cur = posting.price.commodity
+                priced.append(
+                    (amount.commodity, base_cur, amount.mantissa, amount.places)
+                )
+            else:
+                priceless.append(
+                    (posting.account, amount.commodity, amount.mantissa, amount.places)
+                )
+        return get_sales(priced, priceless, is_revenue)
+
+    @classmethod
+    def from_row(cls, row: TxnRow):
+        txn_date, description, postings = row
+        return cls(txn_date, description, [Posting.from_row(p) for p in postings])
+
+
+@dataclass
+class PriceDirective:
+    date: str
+    commodity: str
+    price: Amount
+
+    def to_row(self) -> PriceRow:
+        return (self.date, self.commodity, self.price.to_row())
+
+    @classmethod
+    def from_row(cls, row: PriceRow):
+        price_date, commodity, price = row
+        return cls(price_date, commodity, Amount(*price))
+
+
+@dataclass
+class FileState:
+    offset: int = 0
+    checksum: str = ""
+    mtime_ns: int = 0
+    line: int = 0
+    year: Optional[int] = None
+    decimal_mark: Optional[str] = None
+    in_comment: bool = False
+
+
+class JournalRewritten(Exception):
+    pass
+
+
+def unquote(symbol: str) -> str:
+    return symbol[1:-1] if symbol.startswith('"') else symbol
+
+
+def strip_comment(text: str) -> str:
+    in_quotes = False
+    for i, char in enumerate(text):
+        if char == '"':
+            in_quotes = not in_quotes
+        elif char == ";" and not in_quotes:
+            return text[:i].rstrip()
+    return text.rstrip()
+
+
+def parse_number(number: str, decimal_mark: Optional[str]) -> Tuple[int, int]:
+    marks = [char for char in number if char in ".,"]
+    if len(set(marks)) == 2:
+        decimal_mark = marks[-1]
+    elif len(marks) > 0 and decimal_mark not in (".", ","):
+        decimal_mark = marks[0] if len(marks) == 1 else None
+
+    if decimal_mark and decimal_mark in number:
+        integer, decimals = number.rsplit(decimal_mark, 1)
+    else:
+        integer, decimals = number, ""
+
+    digits = re.sub(r"[^0-9]", "", integer) + decimals
+    return int(digits or "0"), len(decimals)
+
+
+class Journal:
+    def __init__(self, files: Tuple[str, ...]) -> None:
+        self.files = files
+        self.txn_objects: List[Transaction] = []
+        self.txn_rows: Optional[List[TxnRow]] = None
+        self.prices: List[PriceDirective] = []
+        self.parsed_txns: List[Transaction] = []
+        self.parsed_prices: List[PriceDirective] = []
+        self.declared_commodities: List[str] = []
+        self.declared_accounts: List[str] = []
+        self.account_types: Dict[str, str] = {}
+        self.decimal_marks: Dict[str, str] = {}
+        self.files_read: List[str] = []
+        self.file_states: Dict[str, FileState] = {}
+        self.includes: List[Tuple[str, List[str]]] = []
+        self.txns_by_cur: Dict[str, Dict[str, TxnColumns]] = {}
+
+        for file in files:
+            self.read_file(file)
+
+        self.txn_objects = sorted(self.parsed_txns, key=lambda txn: txn.date)
+        self.prices = sorted(self.parsed_prices, key=lambda price: price.date)
+        self.parsed_txns = []
+        self.parsed_prices = []
+
+    @property
+    def txns(self) -> List[Transaction]:
+        if self.txn_rows is not None:
+            self.txn_objects = [Transaction.from_row(row) for row in self.txn_rows]
+            self.txn_rows = None
+        return self.txn_objects
+
+    def get_txn_rows(self) -> List[TxnRow]:
+        if self.txn_rows is not None:
+            return self.txn_rows
+        return [txn.to_row() for txn in self.txn_objects]
+
+    def get_last_txn_date(self) -> str:
+        if self.txn_rows is not None:
+            return self.txn_rows[-1][0] if self.txn_rows else ""
+        return self.txn_objects[-1].date if self.txn_objects else ""
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["txn_rows"] = self.get_txn_rows()
+        state["txn_objects"] = []
+        state["prices"] = [price.to_row() for price in self.prices]
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self.prices = [PriceDirective.from_row(row) for row in state["prices"]]
+
+    def update(self) -> bool:
+        """
+        Parse only the rows appended to the journal files since they were read.
+        Return True if the journal state changed. Raise JournalRewritten if the
+        files changed in another way and the journal must be read again.
+        """
+        touched = False
+        for pattern, files in self.includes:
+            if sorted(glob.glob(pattern, recursive=True)) != files:
+                raise JournalRewritten(f"Files included by {pattern} changed")
+
+        tails: List[Tuple[str, bytes, FileState]] = []
+        for file_path, state in self.file_states.items():
+            try:
+                stat = os.stat(file_path)
+                if stat.st_size == state.offset and stat.st_mtime_ns == state.mtime_ns:
+                    continue
+
+                with open(file_path, "rb") as f:
+                    data = f.read()
+            except OSError:
+                raise JournalRewritten(f"Can't read {file_path}")
+
+            prefix = data[: state.offset]
+            if hashlib.sha1(prefix).hexdigest() != state.checksum:
+                raise JournalRewritten(f"{file_path} was modified")
+
+            if len(data) == state.offset:
+                state.mtime_ns = stat.st_mtime_ns
+                touched = True
+                continue
+
+            first_char = data[state.offset : state.offset + 1]
+            if prefix[-1:] not in (b"", b"\n") or first_char in (b" ", b"\t"):
+                raise JournalRewritten(f"{file_path} continues its last entry")
+
+            tails.append((file_path, data, state))
+
+        if len(tails) == 0:
+            return touched
+        if len(tails) > 1:
+            raise JournalRewritten("More than one file was appended")
+
+        file_path, data, state = tails[0]
+        last_file = file_path == os.path.abspath(os.path.expanduser(self.files[-1]))
+        last_txn_date = self.get_last_txn_date()
+        last_price_date = self.prices[-1].date if self.prices else ""
+
+        account_types = self.account_types.copy()
+        self.read_rows(file_path, data, state)
+        new_txns = sorted(self.parsed_txns, key=lambda txn: txn.date)
+        new_prices = sorted(self.parsed_prices, key=lambda price: price.date)
+        self.parsed_txns = []
+        self.parsed_prices = []
+
+        in_order = (len(new_txns) == 0 or new_txns[0].date > last_txn_date) and (
+            len(new_prices) == 0 or new_prices[0].date > last_price_date
+        )
+        if not in_order and not last_file:
+            raise JournalRewritten(f"{file_path} added entries dated before others")
+
+        if in_order and self.txn_rows is not None:
+            self.txn_rows.extend(txn.to_row() for txn in new_txns)
+        else:
+            self.txns.extend(new_txns)
+
+        self.prices.extend(new_prices)
+        if not in_order:
+            self.txns.sort(key=lambda txn: txn.date)
+            self.prices.sort(key=lambda price: price.date)
+        if not in_order or self.account_types != account_types:
+            # a new account type changes which postings are the cash of sales
+            self.txns_by_cur = {}
+
+        for no_desc, txns_by_cur in self.txns_by_cur.items():
+            self.add_txns_by_cur(txns_by_cur, self.filter_txns(no_desc, new_txns))
+
+        return True
+
+    def get_date(self, date_str: str, year: Optional[int]) -> str:
+        search = DATE_REGEX.search(date_str)
+        if not search:
+            raise ValueError(f"Invalid date {date_str}")
+
+        year_str, month, day = search.groups()
+        if year_str:
+            year = int(year_str)
+        elif not year:
+            year = date.today().year
+
+        return date(year, int(month), int(day)).strftime("%Y-%m-%d")
+
+    def parse_amount(self, text: str, decimal_mark: Optional[str]) -> Amount:
+        search = AMOUNT_REGEX.search(text.strip())
+        if not search:
+            raise ValueError(f"Invalid amount {text}")
+
+        groups = search.groupdict()
+        if groups["lnum"]:
+            symbol, number = groups["lsym"], groups["lnum"]
+            negative = (groups["sign"] == "-") != (groups["lsign"] == "-")
+        else:
+            symbol, number = groups["rsym"] or "", groups["rnum"]
+            negative = groups["sign"] == "-"
+
+        commodity = unquote(symbol)
+        mark = self.decimal_marks.get(commodity, decimal_mark)
+        mantissa, places = parse_number(number, mark)
+        return Amount(commodity, -mantissa if negative else mantissa, places)
+
+    def parse_posting(self, row: str, decimal_mark: Optional[str]) -> Posting:
+        posting = self.parse_posting_amounts(row, decimal_mark)
+        comment = row[len(strip_comment(row)) :]
+        if comment.strip():
+            posting.add_comment(comment)
+        return posting
+
+    def parse_posting_amounts(self, row: str, decimal_mark: Optional[str]) -> Posting:
+        content = STATUS_REGEX.sub("", strip_comment(row).strip())
+        account_amount = SEPARATOR_REGEX.split(content, 1)
+        account = account_amount[0].strip("()[]")
+
+        if len(account_amount) == 1:
+            return Posting(account, None)
+
+        amount_text = account_amount[1].split("=", 1)[0].strip()
+        if amount_text == "":
+            return Posting(account, None)
+
+        if "@@" in amount_text:
+            amount_str, price_str = amount_text.split("@@", 1)
+            price_type = "TotalPrice"
+        elif "@" in amount_text:
+            amount_str, price_str = amount_text.split("@", 1)
+            price_type = "UnitPrice"
+        else:
+            amount_str, price_str, price_type = amount_text, "", ""
+
+        amount = self.parse_amount(amount_str, decimal_mark)
+        price = self.parse_amount(price_str, decimal_mark) if price_str else None
+        return Posting(account, amount, price, price_type)
+
+    def parse_commodity(self, row: str):
+        content = strip_comment(row[len("commodity") :]).strip()
+        if content == "":
+            return
+
+        try:
+            amount = self.parse_amount(content, None)
+            commodity = amount.commodity
+            marks = [char for char in content if char in ".,"]
+            if marks:
+                self.decimal_marks[commodity] = marks[-1]
+        except ValueError:
+            commodity = unquote(content)
+
+        self.declared_commodities.append(commodity)
+
+    def parse_account_type(self, account: str, row: str):
+        """Type of account in the type tag of its directive"""
+        search = TYPE_REGEX.search(row[len(strip_comment(row)) :])
+        if search:
+            self.account_types[account] = search.group(1).upper()
+
+    def is_revenue(self, account: str) -> bool:
+        """
+        Whether account has the Revenue type, declared for it or the closest
+        parent with a type, or else inferred by hledger from its name
+        """
+        parts = account.split(":")
+        for end in range(len(parts), 0, -1):
+            account_type = self.account_types.get(":".join(parts[:end]))
+            if account_type:
+                return account_type in REVENUE_TYPES
+        return is_revenue_name(account)
+
+    def parse_price(self, row: str, year: Optional[int], decimal_mark: Optional[str]):
+        search = PRICE_REGEX.search(strip_comment(row))
+        if not search:
+            raise ValueError(f"Invalid price directive {row.strip()}")
+
+        price_date = self.get_date(search.group("date"), year)
+        commodity = unquote(search.group("comm"))
+        price = self.parse_amount(search.group("amount"), decimal_mark)
+        self.parsed_prices.append(PriceDirective(price_date, commodity, price))
+
+    def read_file(self, file: str):
+        file_path = os.path.abspath(os.path.expanduser(file))
+        self.files_read.append(file_path)
+
+        with open(file_path, "rb") as f:
+            data = f.read()
+
+        self.read_rows(file_path, data, FileState())
+
+    def read_rows(self, file_path: str, data: bytes, state: FileState):
+        rows = data[state.offset :].decode("utf8").splitlines()
+
+        year = state.year
+        decimal_mark = state.decimal_mark
+        txn: Optional[Transaction] = None
+        account: Optional[str] = None
+        in_comment = state.in_comment
+        skip_block = False
+
+        for i, row in enumerate(rows, start=state.line + 1):
+            try:
+                if in_comment:
+                    in_comment = not row.startswith("end comment")
+                    continue
+
+                if row.strip() == "":
+                    txn = None
+                    account = None
+                    skip_block = False
+                    continue
+
+                if row[0] in " \t":
+                    if skip_block:
+                        if account:
+                            self.parse_account_type(account, row)
+                        continue
+                    if row.strip().startswith(COMMENT_PREFIXES[0]):
+                        if txn and txn.postings:
+                            txn.postings[-1].add_comment(row)
+                        continue
+                    if txn:
+                        txn.postings.append(self.parse_posting(row, decimal_mark))
+                    continue
+
+                txn = None
+                account = None
+                skip_block = False
+                if row.startswith(COMMENT_PREFIXES):
+                    continue
+
+                if row[0].isdigit():
+                    txn = self.parse_txn(row, year)
+                    self.parsed_txns.append(txn)
+                elif row.startswith("P "):
+                    self.parse_price(row, year, decimal_mark)
+                elif row.startswith("commodity "):
+                    self.parse_commodity(row)
+                    skip_block = True
+                elif row.startswith("account "):
+                    account = strip_comment(row[len("account") :]).strip()
+                    self.declared_accounts.append(account)
+                    self.parse_account_type(account, row)
+                    skip_block = True
+                elif row.startswith("include "):
+                    self.read_include(file_path, row)
+                elif row.startswith(("Y ", "year ")):
+                    year = int(row.split()[1])
+                elif row.startswith("decimal-mark "):
+                    decimal_mark = row.split()[1]
+                elif row.startswith("comment"):
+                    in_comment = True
+                else:
+                    skip_block = True
+            except ValueError as e:
+                raise JournalError(file_path, i, str(e))
+
+        self.file_states[file_path] = FileState(
+            len(data),
+            hashlib.sha1(data).hexdigest(),
+            os.stat(file_path).st_mtime_ns,
+            state.line + len(rows),
+            year,
+            decimal_mark,
+            in_comment,
+        )
+
+    def read_include(self, file_path: str, row: str):
+        path = strip_comment(row[len("include") :]).strip()
+        path = re.sub(r"^\w+:", "", path)
+        pattern = os.path.join(os.path.dirname(file_path), os.path.expanduser(path))
+        included = sorted(glob.glob(pattern, recursive=True))
+        if len(included) == 0:
+            raise ValueError(f"No file found for include {path}")
+
+        self.includes.append((pattern, included))
+
+        for file in included:
+            self.read_file(file)
+
+    def parse_txn(self, row: str, year: Optional[int]) -> Transaction:
+        content = strip_comment(row)
+        date_search = DATE_REGEX.search(content)
+        if not date_search:
+            raise ValueError(f"Invalid transaction date in {row}")
+
+        txn_date = self.get_date(date_search.group(), year)
+        description = content[date_search.end() :]
+        description = STATUS_REGEX.sub("", description)
+        description = CODE_REGEX.sub("", description.strip()).strip()
+        return Transaction(txn_date, description)
+
+    def filter_txns(
+        self, no_desc: Optional[str] = None, txns: Optional[List[Transaction]] = None
+    ):
+        txns = self.txns if txns is None else txns
+        if not no_desc:
+            return txns
+
+        regex = re.compile(no_desc, re.IGNORECASE)
+        return [txn for txn in txns if not regex.search(txn.description)]
+
+    def get_txns_by_cur(self, no_desc: Optional[str] = None):
+        key = no_desc or ""
+        if key not in self.txns_by_cur:
+            txns_by_cur: Dict[str, TxnColumns] = {}
+            self.add_txns_by_cur(txns_by_cur, self.filter_txns(no_desc))
+            self.txns_by_cur[key] = txns_by_cur
+
+        return {cur: txns.copy() for cur, txns in self.txns_by_cur[key].items()}
+
+    def add_txns_by_cur(
+        self, txns_by_cur: Dict[str, TxnColumns], txns: List[Transaction]
+    ):
+        for txn in txns:
+            sales = txn.get_sales(self.is_revenue)
+            for posting in txn.postings:
+                if posting.amount and posting.price:
+                    raw_txn = Txn(
+                        txn.date,
+                        posting.price.quantity,
+                        posting.price.commodity,
+                        posting.amount.quantity,
+                        posting.account,
+                        posting.price_type,
+                        (
+                            posting.amount.mantissa,
+                            posting.amount.places,
+                            posting.price.mantissa,
+                            posting.price.places,
+                        ),
+                        posting.buy_date,
+                        sales.get(posting.amount.commodity),
+                    )
+                    cur = posting.amount.commodity.upper()
+                    if cur not in txns_by_cur:
+                        txns_by_cur[cur] = TxnColumns()
+                    txns_by_cur[cur].append_txn(raw_txn)
+
+    def get_price_rows(self) -> List[IndexRow]:
+        """Date, commodity, price and quote currency of each price and its reverse"""
+        prices = [
+            (price.date, price.commodity, price.price.quantity, price.price.commodity)
+            for price in self.prices
+        ]
+        reverse_prices = [
+            (
+                price.date,
+                price.price.commodity,
+                1 / price.price.quantity,
+                price.commodity,
+            )
+            for price in self.prices
+            if price.price.mantissa != 0
+        ]
+        return [*prices, *reverse_prices]
+
+    def get_commodities(self):
+        commodities = set(self.declared_commodities)
+        for txn in self.txns:
+            for posting in txn.postings:
+                for amount in [posting.amount, posting.price]:
+                    if amount:
+                        commodities.add(amount.commodity)
+
+        for price in self.prices:
+            commodities.add(price.commodity)
+            commodities.add(price.price.commodity)
+
+        commodities.discard("")
+        return sorted(commodities)
+
+    def get_accounts(self, cur: Optional[str] = None, no_desc: Optional[str] = None):
+        accounts = set() if cur else set(self.declared_accounts)
+        for txn in self.filter_txns(no_desc):
+            for posting in txn.postings:
+                amount_cur = posting.amount.commodity if posting.amount else ""
+                if not cur or amount_cur.upper() == cur.upper():
+                    accounts.add(posting.account)
+        return sorted(accounts)
+
+    def get_last_purchase(self, cur: str, no_desc: Optional[str] = None):
+        purchases = [
+            txn.date
+            for txn in self.filter_txns(no_desc)
+            for posting in txn.postings
+            if posting.amount
+            and posting.amount.commodity.upper() == cur.upper()
+            and posting.amount.mantissa > 0
+        ]
+        return purchases[-1] if purchases else None
+
+
+def get_state_path(files: Tuple[str, ...]) -> Path:
+    files_abs = tuple(os.path.abspath(os.path.expanduser(file)) for file in files)
+    key_repr = repr((CACHE_VERSION, "journal", files_abs)).encode()
+    name = hashlib.sha256(key_repr).hexdigest()
+    return get_cache_dir() / f"journal-{name}.pickle"
+
+
+def save_journal(journal: Journal):
+    max_size = get_max_size()
+    if max_size > 0:
+        path = get_state_path(journal.files)
+        write_pickle(path, journal)
+        evict(path.parent, max_size)
+
+
+@lru_cache(maxsize=4)
+def load_journal(files: Tuple[str, ...]) -> Journal:
+    if get_max_size() == 0:
+        return Journal(files)
+
+    path = get_state_path(files)
+    journal = read_pickle(path)
+    if isinstance(journal, Journal) and journal.files == files:
+        try:
+            if journal.update():
+                save_journal(journal)
+            else:
+                os.utime(path)
+            return journal
+        except (JournalRewritten, JournalError):
+            pass
+
+    journal = Journal(files)
+    save_journal(journal)
+    return journal
+
+
+class NativeBackend(Backend):
+    name = "native"
+    # The saved journal keeps the transactions by commodity and is updated
+    # with the appended rows, when TxnCache would read all of them again
+    keeps_txns = True
+
+    def read_txns(
+        self, file_path: Tuple[str, ...], cur: str, no_desc: Optional[str] = None
+    ) -> TxnColumns:
+        txns_by_cur = self.read_txns_by_cur(file_path, no_desc)
+        return txns_by_cur.get(cur.upper(), TxnColumns())
+
+    def read_txns_by_cur(
+        self, file_path: Tuple[str, ...], no_desc: Optional[str] = None
+    ) -> Dict[str, TxnColumns]:
+        journal = load_journal(file_path)
+        saved = (no_desc or "") in journal.txns_by_cur
+        txns_by_cur = journal.get_txns_by_cur(no_desc)
+        if not saved:
+            save_journal(journal)
+        return txns_by_cur
+
+    def read_price_index(self, file_path: Tuple[str, ...]) -> PriceIndex:
+        return PriceIndex.from_rows(load_journal(file_path).get_price_rows())
+
+    def read_commodities(self, file_path: Tuple[str, ...]) -> List[str]:
+        return load_journal(file_path).get_commodities()
+
+    def read_accounts(
+        self,
+        file_path: Tuple[str, ...],
+        cur: Optional[str] = None,
+        no_desc: Optional[str] = None,
+    ) -> List[str]:
+        return load_journal(file_path).get_accounts(cur, no_desc)
+
+    def read_last_purchase(
+        self, file_path: Tuple[str, ...], cur: str, no_desc: Optional[str] = None
+    ) -> Optional[str]:
+        return load_journal(file_path).get_last_purchase(cur, no_desc)
@@ -1,16 +1,47 @@
+import math
 import os
 import re
 import shlex
 import sys
 import tempfile
-from dataclasses import asdict, dataclass
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
 from datetime import date
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Protocol,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
 
-from pyxirr import DayCount, xirr
+from pyxirr import DayCount, InvalidPaymentsError, xirr
 from tabulate import tabulate
 
+if TYPE_CHECKING:
+    import numpy as np
+else:
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+
+HAS_NUMPY = np is not None
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
 
 @dataclass
 class AdjustedTxn:
@@ -21,17 +52,125 @@ class AdjustedTxn:
     acct: str
 
 
+class TxnLike(Protocol):
+    """Transaction read like an AdjustedTxn, as the rows of TxnColumns are"""
+
+    @property
+    def date(self) -> str: ...
+
+    @property
+    def price(self) -> float: ...
+
+    @property
+    def base_cur(self) -> str: ...
+
+    @property
+    def qtty(self) -> float: ...
+
+    @property
+    def acct(self) -> str: ...
+
+
+# quantity mantissa, quantity decimal places, price mantissa, price decimal places
+ExactAmounts = Tuple[int, int, int, int]
+
+
 @dataclass
 class Txn(AdjustedTxn):
     type: str
+    exact: Optional[ExactAmounts] = field(default=None, compare=False, repr=False)
+    # Lot a sale takes, from the buy_date tag of its posting
+    buy_date: Optional[str] = field(default=None, compare=False, repr=False)
+    # Quantity a sale took out of the commodity and the cash it got for it
+    sale: Optional[ExactAmounts] = field(default=None, compare=False, repr=False)
+
+
+# Accounts hledger gives the Revenue type by their names
+REVENUE_REGEX = re.compile(r"^(income|revenue)s?(:|$)", re.IGNORECASE)
+
+# Commodity, base currency, quantity mantissa and decimal places of a posting
+# with price, or account, commodity, mantissa and decimal places of one without
+PricedAmount = Tuple[str, str, int, int]
+PricelessAmount = Tuple[str, str, int, int]
+
+
+def sum_exact(amounts: Iterable[Tuple[int, int]]) -> Tuple[int, int]:
+    """Sum of mantissas and decimal places, in the most places of them"""
+    amounts = list(amounts)
+    places = max((amount_places for _, amount_places in amounts), default=0)
+    mantissa = sum(m * 10 ** (places - m_places) for m, m_places in amounts)
+    return mantissa, places
+
+
+def is_revenue_name(account: str) -> bool:
+    """Whether hledger infers the Revenue type of account from its name"""
+    return REVENUE_REGEX.match(account) is not None
+
+
+def get_sales(
+    priced: List[PricedAmount],
+    priceless: List[PricelessAmount],
+    is_revenue: Callable[[str], bool] = is_revenue_name,
+) -> Dict[str, ExactAmounts]:
+    """
+    Quantity of each commodity a transaction sold and the cash it got for it:
+    its postings without price in the base currency, but the revenue ones. A
+    commodity sold along others, or bought, for the same currency is left out.
+    """
+    by_base_cur: Dict[str, Dict[str, List[Tuple[int, int]]]] = {}
+    for commodity, base_cur, mantissa, places in priced:
+        comm_qttys = by_base_cur.setdefault(base_cur, {})
+        comm_qttys.setdefault(commodity, []).append((mantissa, places))
+
+    sales: Dict[str, ExactAmounts] = {}
+    for base_cur, comm_qttys in by_base_cur.items():
+        in_base_cur = [amount for amount in priceless if amount[1] == base_cur]
+        if len(comm_qttys) != 1 or len(in_base_cur) == 0:
+            continue
+
+        [(commodity, qttys)] = comm_qttys.items()
+        if any(mantissa >= 0 for mantissa, _ in qttys):
+            continue
+
+        qtty, qtty_places = sum_exact(qttys)
+        cash = sum_exact(
+            (mantissa, places)
+            for acct, _, mantissa, places in in_base_cur
+            if not is_revenue(acct)
+        )
+        sales[commodity] = (-qtty, qtty_places, *cash)
+    return sales
 
 
 class CostMethodError(Exception):
-    def __init__(self, sell: AdjustedTxn, price: float, base_cur: str) -> None:
+    def __init__(self, sell: TxnLike, price: float, base_cur: str) -> None:
         self.message = f"Error in sale {sell}. Correct price should be {price} in currency {base_cur}"
         super().__init__(self.message)
 
 
+workers = DEFAULT_WORKERS
+
+
+def get_workers() -> int:
+    return workers
+
+
+def set_workers(new_workers: int):
+    global workers
+    workers = max(1, new_workers)
+
+
+def parallel_map(func: Callable[[T], R], items: Iterable[T]) -> List[R]:
+    """Call func on each item using up to get_workers() threads, keeping order"""
+    items = list(items)
+    max_workers = min(get_workers(), len(items))
+    if max_workers <= 1:
+        return [func(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers) as executor:
+        return list(executor.map(func, items))
+
+
 def get_file_from_stdin():
     tmp_file = tempfile.NamedTemporaryFile(suffix=".journal", delete=False)
     name = tmp_file.name
@@ -60,7 +199,7 @@ def get_files_comm(file_path: Tuple[str, ...]) -> List[str]:
     return files
 
 
-def get_avg_fifo(txns: List[AdjustedTxn]):
+def get_avg_fifo(txns: Sequence[TxnLike]):
     total_qtty = sum(txn.qtty for txn in txns)
     if total_qtty == 0:
         return 0
@@ -70,25 +209,100 @@ def get_avg_fifo(txns: List[AdjustedTxn]):
     return avg
 
 
+class XirrConvergenceError(Exception):
+    def __init__(self, group: Hashable) -> None:
+        self.group = group
+        self.message = f"Xirr of group {group} did not converge"
+        super().__init__(self.message)
+
+
+@dataclass
+class XirrResults:
+    """Rate of each group, or the error that kept it from having one"""
+
+    rates: Dict[Hashable, float] = field(default_factory=dict)
+    errors: Dict[Hashable, Exception] = field(default_factory=dict)
+
+
+def split_flows(dates: Sequence[int], amounts: Sequence[float], groups: Sequence):
+    """Dates and amounts of each group, the dates as numpy days or date objects"""
+    if len(groups) == 0:
+        return []
+
+    if HAS_NUMPY:
+        groups_arr = np.asarray(groups)
+        order = np.argsort(groups_arr, kind="stable")
+        sorted_groups = groups_arr[order]
+        days = np.asarray(dates, dtype=np.int64)[order] - EPOCH_ORDINAL
+        days = days.astype("datetime64[D]")
+        amts = np.asarray(amounts, dtype=np.float64)[order]
+        starts = np.flatnonzero(sorted_groups[1:] != sorted_groups[:-1]) + 1
+        bounds = zip([0, *starts], [*starts, len(order)])
+        return [
+            (sorted_groups[start].item(), days[start:end], amts[start:end])
+            for start, end in bounds
+        ]
+
+    rows: Dict[Hashable, List[int]] = {}
+    for i, group in enumerate(groups):
+        rows.setdefault(group, []).append(i)
+    return [
+        (
+            group,
+            [date.fromordinal(dates[i]) for i in indexes],
+            [amounts[i] for i in indexes],
+        )
+        for group, indexes in rows.items()
+    ]
+
+
+def get_xirrs(
+    dates: Sequence[int],
+    amounts: Sequence[float],
+    groups: Sequence,
+    day_count: DayCount = DayCount.THIRTY_U_360,
+) -> XirrResults:
+    """
+    Xirr of the cash flows of each group, given as columns of date ordinals,
+    amounts and group ids. A group's rows don't need to be contiguous.
+    """
+    results = XirrResults()
+    for group, group_dates, group_amounts in split_flows(dates, amounts, groups):
+        try:
+            rate = xirr(group_dates, group_amounts, day_count=day_count)
+        except InvalidPaymentsError as e:
+            results.errors[group] = e
+            continue
+
+        if rate is None or math.isnan(rate):
+            results.errors[group] = XirrConvergenceError(group)
+        else:
+            results.rates[group] = rate
+    return results
+
+
 def get_xirr(
-    sell_price: float, sell_date: date, txns: List[AdjustedTxn]
+    sell_price: float, sell_date: date, txns: Sequence[TxnLike]
 ) -> Optional[float]:
     if len(txns) == 0:
         return 0
 
-    dates = [txn.date for txn in txns]
-    buy_amts = [txn.price * txn.qtty for txn in txns]
+    dates = [date.fromisoformat(txn.date).toordinal() for txn in txns]
+    amts = [txn.price * txn.qtty for txn in txns]
     total_qtty = sum(txn.qtty for txn in txns)
 
-    sell_date_txt = sell_date.strftime("%Y-%m-%d")
-    dates = [*dates, sell_date_txt]
-    amts = [*buy_amts, -total_qtty * sell_price]
-    sell_xirr = xirr(dates, amts, day_count=DayCount.THIRTY_U_360)
-    return sell_xirr
+    dates.append(sell_date.toordinal())
+    amts.append(-total_qtty * sell_price)
+    results = get_xirrs(dates, amts, [0] * len(dates))
+
+    error = results.errors.get(0)
+    if isinstance(error, InvalidPaymentsError):
+        raise error
+    return results.rates.get(0)
 
 
-def dt_list2table(dt_list: List, tablefmt: str = "simple"):
-    lots_dict = [asdict(dt) for dt in dt_list]
+def dt_list2table(dt_list: Iterable, tablefmt: str = "simple"):
+    lots_dict = [dt.asdict() if hasattr(dt, "asdict") else asdict(dt) for dt in dt_list]
     table = tabulate(
         lots_dict,
         headers="keys",
@@ -0,0 +1,223 @@
+from abc import ABC, abstractmethod
+from copy import copy
+from dataclasses import dataclass
+from fractions import Fraction
+from typing import Dict, List, Optional, Sequence, TypeVar, Union
+
+from . import checks
+from .lib import TxnLike
+from .txn_columns import (
+    EXACT_PLACES,
+    TxnColumns,
+    TxnsLike,
+    as_number,
+    from_exact,
+    to_places,
+)
+
+BookT = TypeVar("BookT", bound="LotBook")
+
+
+@dataclass
+class RealizedGain:
+    sell_date: str
+    buy_date: Optional[str]
+    acct: str
+    qtty: float
+    cost: float
+    proceeds: float
+    gain: float
+    days: Optional[int]
+    base_cur: str
+
+
+class LotBook(ABC):
+    """
+    Lots of a commodity kept up to date one transaction at a time.
+
+    apply() adds a transaction in amortized O(1), preview_sell() tells what a
+    sale would take without changing the book and snapshot() copies the
+    current state. The book reads the rows it applied from txns, which is only
+    copied when a book created over shared transactions applies a new one.
+    The quantity held in each account is kept as a running balance.
+
+    With realized, sales also record the gain of each lot they take.
+    """
+
+    def __init__(
+        self,
+        check: bool = False,
+        exact: bool = False,
+        txns: Optional[TxnColumns] = None,
+        realized: bool = False,
+    ) -> None:
+        self.check = check
+        self.exact = exact
+        self.txns = txns if txns is not None else TxnColumns()
+        self.shared = txns is not None
+        self.qtty_scale = self.txns.qtty_scale
+        self.balances: Dict[int, Union[int, float]] = {}
+        self.realized: Optional[List[RealizedGain]] = [] if realized else None
+
+    @classmethod
+    def from_txns(
+        cls, txns: TxnsLike, check: bool = False, exact: bool = False, **options
+    ):
+        columns = TxnColumns.from_txns(txns)
+        checks.check_base_currency(columns)
+
+        book = cls(check, exact, columns, **options)
+        for index in book.get_order(columns):
+            book.apply_index(index)
+        return book
+
+    def get_order(self, columns: TxnColumns) -> Sequence[int]:
+        return range(len(columns))
+
+    def apply(self, txn: TxnLike):
+        if self.shared:
+            self.txns = self.txns.copy()
+            self.shared = False
+
+        txns = self.txns
+        if len(txns) > 0 and txn.base_cur != txns[0].base_cur:
+            raise checks.MultipleBaseCurrencies({txns[0].base_cur, txn.base_cur})
+
+        txns.append_txn(txn)
+        if txns.qtty_scale != self.qtty_scale:
+            factor = 10 ** (txns.qtty_scale - self.qtty_scale)
+            if self.exact:
+                self.balances = {
+                    acct: qtty * factor for acct, qtty in self.balances.items()
+                }
+            self.rescale(factor)
+            self.qtty_scale = txns.qtty_scale
+
+        self.apply_index(len(txns) - 1)
+
+    def apply_index(self, index: int):
+        if self.txns.qttys[index] >= 0:
+            self.add_buy(index)
+        else:
+            self.sell(index)
+
+        acct = self.txns.accts[index]
+        self.balances[acct] = self.balances.get(acct, 0) + self.get_qtty(index)
+
+    def get_qtty(self, index: int) -> Union[int, float]:
+        if self.exact:
+            return self.txns.qtty_mantissas[index]
+        return self.txns.qttys[index]
+
+    def add_realized(
+        self,
+        sell_index: int,
+        buy_index: Optional[int],
+        qtty: Union[int, float],
+        cost: Union[int, float],
+    ):
+        """
+        Record the sale of qtty bought at buy_index, or at average cost if None,
+        for the cash its transaction got. When exact, qtty and cost are
+        mantissas, as the book keeps them.
+        """
+        txns = self.txns
+        sale_price = txns.sale_prices[sell_index]
+        if self.exact:
+            proceeds = to_places(
+                int(qtty) * sale_price, self.qtty_scale + EXACT_PLACES, EXACT_PLACES
+            )
+            qtty = qtty / 10**self.qtty_scale
+            proceeds, cost = from_exact(proceeds), from_exact(int(cost))
+        else:
+            proceeds = qtty * sale_price / 10**EXACT_PLACES
+
+        buy_date, days = None, None
+        if buy_index is not None:
+            buy_date = txns.get_date(buy_index)
+            days = txns.dates[sell_index] - txns.dates[buy_index]
+
+        gain = RealizedGain(
+            txns.get_date(sell_index),
+            buy_date,
+            txns.acct_names.names[txns.accts[sell_index]],
+            as_number(float(qtty)),
+            float(cost),
+            float(proceeds),
+            float(proceeds - cost),
+            days,
+            txns.base_cur_names.names[txns.base_curs[sell_index]],
+        )
+        self.realized.append(gain)  # type: ignore
+
+    def get_acct_balance(self, acct: str) -> Union[int, float]:
+        code = self.txns.acct_names.codes.get(acct)
+        return self.balances.get(code, 0) if code is not None else 0
+
+    def get_acct_available(self, acct: str) -> Union[float, Fraction]:
+        if self.exact:
+            return Fraction(int(self.get_acct_balance(acct)), 10**self.qtty_scale)
+        return self.get_acct_balance(acct)
+
+    def get_accts_available(self) -> Dict[str, Union[float, Fraction]]:
+        """Accounts holding the commodity with their quantity"""
+        names = self.txns.acct_names.names
+        accts = {
+            names[code]: self.get_acct_available(names[code]) for code in self.balances
+        }
+        return {acct: qtty for acct, qtty in accts.items() if qtty > 0}
+
+    def get_sell_available(self, acct: str) -> Union[float, Fraction]:
+        """Quantity a sale from acct can take"""
+        return self.get_acct_available(acct)
+
+    def check_sell_available(self, sell_qtty: float, acct: Optional[str] = None):
+        if acct is None:
+            checks.check_short_sell_qtty(self.get_available(), sell_qtty, self.exact)
+        else:
+            available = self.get_sell_available(acct)
+            checks.check_acct_qtty(acct, available, sell_qtty, self.exact)
+
+    @abstractmethod
+    def add_buy(self, index: int):
+        raise NotImplementedError
+
+    @abstractmethod
+    def sell(self, index: int):
+        raise NotImplementedError
+
+    @abstractmethod
+    def rescale(self, factor: int):
+        """Multiply exact quantities after txns got more decimal places"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_available(self) -> Union[float, Fraction]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_acct_cost(self, acct: str) -> float:
+        """Amount paid for what the account holds"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_total_cost(self) -> float:
+        """Amount paid for what all accounts hold"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def preview_sell(
+        self, sell_qtty: float, sell_date: str, acct: Optional[str] = None
+    ) -> Sequence[TxnLike]:
+        """Lots a sale would take, only from acct when given"""
+        raise NotImplementedError
+
+    def snapshot(self: BookT) -> BookT:
+        """Copy of the book. Subclasses copy the state they change in place."""
+        book = copy(self)
+        book.balances = self.balances.copy()
+        if self.realized is not None:
+            book.realized = self.realized.copy()
+        self.shared = True
+        book.shared = True
+        return book
@@ -0,0 +1,181 @@
+import heapq
+from abc import ABC, abstractmethod
+from array import array
+from collections import deque
+from itertools import islice
+from typing import TYPE_CHECKING, Deque, Dict, Iterable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from .fifo import FifoBook
+
+# Depleted lots a FifoOrder keeps before it removes them from its queue
+COMPACT_MIN = 64
+
+
+class LotOrder(ABC):
+    """
+    Order in which sales take the open lots of a FifoBook. Lots are positions
+    in the book's buys. A depleted lot isn't removed by the book: first()
+    skips lots whose remaining quantity reached zero.
+    """
+
+    def __init__(self, book: "FifoBook") -> None:
+        self.book = book
+
+    @abstractmethod
+    def add(self, pos: int):
+        raise NotImplementedError
+
+    @abstractmethod
+    def first(self, sell_index: int) -> Optional[int]:
+        """Open lot the sale at txns row sell_index takes next"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def preview(self) -> Iterable[int]:
+        """Open lots in the order a new sale would take them"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def copy(self, book: "FifoBook") -> "LotOrder":
+        raise NotImplementedError
+
+
+class FifoOrder(LotOrder):
+    """Lots in a queue of positions. Depleted lots before head are dropped in bulk."""
+
+    def __init__(self, book: "FifoBook") -> None:
+        super().__init__(book)
+        self.queue = array("l")
+        self.head = 0
+
+    def add(self, pos: int):
+        self.queue.append(pos)
+
+    def first(self, sell_index: int) -> Optional[int]:
+        qttys = self.book.qttys
+        queue = self.queue
+        head = self.head
+        while head < len(queue) and qttys[queue[head]] == 0:
+            head += 1
+
+        if head > COMPACT_MIN and head * 2 > len(queue):
+            del queue[:head]
+            head = 0
+        self.head = head
+        return queue[head] if head < len(queue) else None
+
+    def preview(self) -> Iterable[int]:
+        self.first(-1)
+        return islice(self.queue, self.head, None)
+
+    def copy(self, book: "FifoBook") -> "FifoOrder":
+        order = FifoOrder(book)
+        order.queue = self.queue[self.head :]
+        return order
+
+
+class LifoOrder(LotOrder):
+    def __init__(self, book: "FifoBook") -> None:
+        super().__init__(book)
+        self.stack = array("l")
+
+    def add(self, pos: int):
+        self.stack.append(pos)
+
+    def first(self, sell_index: int) -> Optional[int]:
+        qttys = self.book.qttys
+        while self.stack and qttys[self.stack[-1]] == 0:
+            self.stack.pop()
+        return self.stack[-1] if self.stack else None
+
+    def preview(self) -> Iterable[int]:
+        self.first(-1)
+        return reversed(self.stack)
+
+    def copy(self, book: "FifoBook") -> "LifoOrder":
+        order = LifoOrder(book)
+        order.stack = array("l", self.stack)
+        return order
+
+
+class PriceOrder(LotOrder):
+    """Lots by unit price, oldest first among equal prices, kept in a heap"""
+
+    highest = False
+
+    def __init__(self, book: "FifoBook") -> None:
+        super().__init__(book)
+        self.heap: List[Tuple[float, int]] = []
+
+    def add(self, pos: int):
+        price = self.book.txns.prices[self.book.buys[pos]]
+        heapq.heappush(self.heap, (-price if self.highest else price, pos))
+
+    def first(self, sell_index: int) -> Optional[int]:
+        qttys = self.book.qttys
+        while self.heap and qttys[self.heap[0][1]] == 0:
+            heapq.heappop(self.heap)
+        return self.heap[0][1] if self.heap else None
+
+    def preview(self) -> Iterable[int]:
+        self.first(-1)
+        return (pos for _, pos in sorted(self.heap))
+
+    def copy(self, book: "FifoBook") -> "PriceOrder":
+        order = self.__class__(book)
+        order.heap = self.heap.copy()
+        return order
+
+
+class HifoOrder(PriceOrder):
+    highest = True
+
+
+class LofoOrder(PriceOrder):
+    highest = False
+
+
+class SpecificOrder(LotOrder):
+    """
+    A sale takes the lots named by the buy_date tags of its postings, the
+    way sales written by hledger-lots name each lot they take. In the order
+    of an account, these are the lots bought on that date in the account.
+    A sale whose lot isn't open takes none, and FifoBook raises.
+    New sales are previewed oldest first.
+    """
+
+    def __init__(self, book: "FifoBook") -> None:
+        super().__init__(book)
+        self.fifo = FifoOrder(book)
+        self.by_date: Dict[int, Deque[int]] = {}
+
+    def add(self, pos: int):
+        buy_date = self.book.txns.dates[self.book.buys[pos]]
+        self.by_date.setdefault(buy_date, deque()).append(pos)
+        self.fifo.add(pos)
+
+    def first(self, sell_index: int) -> Optional[int]:
+        qttys = self.book.qttys
+        lots = self.by_date.get(self.book.txns.buy_dates[sell_index])
+        while lots and qttys[lots[0]] == 0:
+            lots.popleft()
+        return lots[0] if lots else None
+
+    def preview(self) -> Iterable[int]:
+        return self.fifo.preview()
+
+    def copy(self, book: "FifoBook") -> "SpecificOrder":
+        order = SpecificOrder(book)
+        order.fifo = self.fifo.copy(book)
+        order.by_date = {date: deque(lots) for date, lots in self.by_date.items()}
+        return order
+
+
+LOT_METHODS = {
+    "fifo": FifoOrder,
+    "lifo": LifoOrder,
+    "hifo": HifoOrder,
+    "lofo": LofoOrder,
+    "specific": SpecificOrder,
+}
@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from typing import Dict, Optional, Tuple
 
+from .lot_methods import LOT_METHODS
+
 NAMESPACE = "hledger-lots"
 KEYS = {"avg_cost", "check", "no_desc"}
 
@@ -10,6 +12,8 @@ class Options:
     avg_cost: bool
     check: bool
     no_desc: str
+    exact: bool = False
+    lot_method: str = "fifo"
 
 
 class OptionError(BaseException):
@@ -103,10 +107,18 @@ def get_options(files: Tuple[str, ...]):
     if vars["check"] not in ["true", "false"]:
         errors += 'check should be "true" or "false"\n'
 
+    exact = vars.get("exact", "false")
+    if exact not in ["true", "false"]:
+        errors += 'exact should be "true" or "false"\n'
+
+    lot_method = vars.get("lot_method", "fifo")
+    if lot_method not in LOT_METHODS:
+        errors += f"lot_method should be one of {sorted(LOT_METHODS)}\n"
+
     if errors != "":
         raise OptionError(errors)
 
     avg_cost = True if vars["avg_cost"] == "true" else False
     check = True if vars["check"] == "true" else False
     no_desc = vars["no_desc"]
-    return Options(avg_cost, check, no_desc)
+    return Options(avg_cost, check, no_desc, exact == "true", lot_method)
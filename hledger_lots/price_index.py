@@ -0,0 +1,146 @@
+import heapq
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .txn_columns import date2ordinal, ordinal2date
+
+# date, commodity, price, quote currency
+PriceRow = Tuple[str, str, float, str]
+
+PRICE_LINE_REGEX = re.compile(r'^P (?P<date>\S+) (?P<comm>"[^"]*"|\S+) (?P<amount>.+)$')
+AMOUNT_REGEX = re.compile(
+    r'^(?P<pre>"[^"]*"|[^-\d\s"]*)\s*(?P<number>-?[\d.,]+)\s*(?P<post>"[^"]*"|\S*)$'
+)
+
+
+@dataclass
+class PriceSeries:
+    """
+    Prices of a pair sorted by date, seqs keeping the order they were read.
+    Arrays when read, memoryviews over the price store when loaded from it.
+    """
+
+    dates: Sequence[int] = field(default_factory=lambda: array("l"))
+    prices: Sequence[float] = field(default_factory=lambda: array("d"))
+    seqs: Sequence[int] = field(default_factory=lambda: array("l"))
+
+
+def parse_price_line(line: str) -> Optional[PriceRow]:
+    """Row of a line of hledger prices, like 'P 2023-01-05 AAPL 25.5 USD'"""
+    line_search = PRICE_LINE_REGEX.search(line.strip())
+    if not line_search:
+        return None
+
+    amount_search = AMOUNT_REGEX.search(line_search.group("amount").strip())
+    if not amount_search:
+        return None
+
+    quote = amount_search.group("pre") or amount_search.group("post")
+    price = float(re.sub(r"[^0-9.]", "", amount_search.group("number")))
+    return (
+        line_search.group("date"),
+        line_search.group("comm").strip('"'),
+        price,
+        quote.strip('"'),
+    )
+
+
+class PriceIndex:
+    """
+    Market prices of each (commodity, quote currency) pair as date ordinal and
+    price arrays sorted by date. Last price, price as of a date and range
+    queries are binary searches. Prices of the same date keep the order they
+    were read in, so the last one read wins.
+    """
+
+    def __init__(self) -> None:
+        self.pairs: Dict[Tuple[str, str], PriceSeries] = {}
+        self.quotes: Dict[str, List[str]] = {}
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[PriceRow]) -> "PriceIndex":
+        index = cls()
+        pair_rows: Dict[Tuple[str, str], List[Tuple[int, int, float]]] = {}
+        for seq, (price_date, commodity, price, quote) in enumerate(rows):
+            pair = (commodity.upper(), quote.upper())
+            pair_rows.setdefault(pair, []).append(
+                (date2ordinal(price_date), seq, price)
+            )
+
+        for pair, pair_prices in pair_rows.items():
+            pair_prices.sort()
+            series = PriceSeries()
+            for ordinal, seq, price in pair_prices:
+                series.dates.append(ordinal)  # type: ignore
+                series.seqs.append(seq)  # type: ignore
+                series.prices.append(price)  # type: ignore
+            index.pairs[pair] = series
+            index.quotes.setdefault(pair[0], []).append(pair[1])
+        return index
+
+    @classmethod
+    def from_hledger(cls, prices_txt: str) -> "PriceIndex":
+        """Index of the output of hledger prices"""
+        rows = (parse_price_line(line) for line in prices_txt.splitlines())
+        return cls.from_rows(row for row in rows if row is not None)
+
+    def get_quotes(self, commodity: str) -> List[str]:
+        return self.quotes.get(commodity.upper(), [])
+
+    def get_series(self, commodity: str, quote: Optional[str]) -> List[PriceSeries]:
+        """Series of commodity in quote, or in all its quote currencies if None"""
+        quotes = [quote.upper()] if quote else self.get_quotes(commodity)
+        pairs = ((commodity.upper(), pair_quote) for pair_quote in quotes)
+        return [self.pairs[pair] for pair in pairs if pair in self.pairs]
+
+    def get_as_of(
+        self, commodity: str, as_of: Optional[int] = None, quote: Optional[str] = None
+    ) -> Tuple[Optional[date], Optional[float]]:
+        """Last date and price on or before the as_of ordinal, or the last ones"""
+        last: Optional[Tuple[int, int, float]] = None
+        for series in self.get_series(commodity, quote):
+            if as_of is None:
+                i = len(series.dates)
+            else:
+                i = bisect_right(series.dates, as_of)
+            if i > 0:
+                found = (series.dates[i - 1], series.seqs[i - 1], series.prices[i - 1])
+                last = max(last, found) if last else found
+
+        if last is None:
+            return (None, None)
+        return (date.fromordinal(last[0]), last[2])
+
+    def get_last(
+        self, commodity: str, quote: Optional[str] = None
+    ) -> Tuple[Optional[date], Optional[float]]:
+        return self.get_as_of(commodity, None, quote)
+
+    def get_range(
+        self,
+        commodity: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        quote: Optional[str] = None,
+    ) -> List[Tuple[str, float]]:
+        """Dates and prices between the start and end ordinals, both included"""
+        ranges = []
+        for series in self.get_series(commodity, quote):
+            dates = series.dates
+            first = bisect_left(dates, start) if start is not None else 0
+            stop = bisect_right(dates, end) if end is not None else len(dates)
+            ranges.append(
+                zip(
+                    series.dates[first:stop],
+                    series.seqs[first:stop],
+                    series.prices[first:stop],
+                )
+            )
+
+        return [
+            (ordinal2date(ordinal), price) for ordinal, _, price in heapq.merge(*ranges)
+        ]
@@ -0,0 +1,222 @@
+import glob
+import hashlib
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+from array import array
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from .cache import (
+    INCLUDE_REGEX,
+    FileFingerprint,
+    get_cache_dir,
+    get_file_fingerprint,
+    read_pickle,
+    write_pickle,
+)
+from .price_index import PriceIndex, PriceSeries
+
+STORE_VERSION = 1
+
+# magic, build id and number of prices, followed by the date, seq and price
+# columns of all pairs as native 8 byte integers and doubles
+HEADER = struct.Struct("<8s16sQ")
+MAGIC = b"HLPRICES"
+
+# rows that can add or change the prices of a journal file
+PRICE_ROW_REGEX = re.compile(r"^(?:P|Y|year|decimal-mark)\s")
+
+
+@dataclass
+class StoreMeta:
+    build_id: bytes
+    byteorder: str
+    files: Tuple[str, ...]
+    fingerprints: Dict[str, FileFingerprint]
+    includes: Dict[str, List[str]]
+    price_files: Set[str]
+    pairs: Dict[Tuple[str, str], Tuple[int, int]] = field(default_factory=dict)
+
+
+def use_price_store() -> bool:
+    return os.getenv("HLEDGER_LOTS_PRICE_STORE", "") not in ("", "0")
+
+
+def get_store_paths(files: Tuple[str, ...], backend_name: str) -> Tuple[Path, Path]:
+    files_abs = tuple(os.path.abspath(os.path.expanduser(file)) for file in files)
+    key_repr = repr((STORE_VERSION, backend_name, files_abs)).encode()
+    name = hashlib.sha256(key_repr).hexdigest()
+    cache_dir = get_cache_dir()
+    return cache_dir / f"prices-{name}.bin", cache_dir / f"prices-{name}.meta"
+
+
+def scan_file(file: str) -> Tuple[bool, List[str]]:
+    """Whether file has rows changing prices, and the glob patterns it includes"""
+    has_prices = False
+    patterns: List[str] = []
+    with open(file, "r") as f:
+        for row in f:
+            if PRICE_ROW_REGEX.match(row):
+                has_prices = True
+            elif row.startswith("include"):
+                search = INCLUDE_REGEX.search(row)
+                if search:
+                    path = os.path.expanduser(search.group(1))
+                    patterns.append(os.path.join(os.path.dirname(file), path))
+    return has_prices, patterns
+
+
+def get_meta(files: Tuple[str, ...]) -> StoreMeta:
+    """Journal files, with their includes, and the ones holding prices"""
+    files_abs = tuple(os.path.abspath(file) for file in files)
+    fingerprints: Dict[str, FileFingerprint] = {}
+    includes: Dict[str, List[str]] = {}
+    price_files: Set[str] = set()
+
+    pending = list(files_abs)
+    while pending:
+        file = pending.pop()
+        if file in fingerprints:
+            continue
+
+        fingerprints[file] = get_file_fingerprint(file)
+        has_prices, includes[file] = scan_file(file)
+        if has_prices:
+            price_files.add(file)
+        for pattern in includes[file]:
+            pending = [*pending, *sorted(glob.glob(pattern, recursive=True))]
+
+    return StoreMeta(
+        os.urandom(16), sys.byteorder, files_abs, fingerprints, includes, price_files
+    )
+
+
+def is_fresh(meta: StoreMeta) -> bool:
+    """
+    Whether the stored prices are still the ones of the journals. Files that
+    changed without price rows or includes, like the ones buy and sell
+    append to, get their new fingerprints in meta instead.
+    """
+    if meta.byteorder != sys.byteorder:
+        return False
+
+    globbed = {
+        file
+        for patterns in meta.includes.values()
+        for pattern in patterns
+        for file in glob.glob(pattern, recursive=True)
+    }
+    if globbed | set(meta.files) != set(meta.fingerprints):
+        return False
+
+    for file, fingerprint in meta.fingerprints.items():
+        try:
+            new_fingerprint = get_file_fingerprint(file)
+            if new_fingerprint == fingerprint:
+                continue
+            if file in meta.price_files:
+                return False
+            has_prices, patterns = scan_file(file)
+        except OSError:
+            return False
+        if has_prices or patterns != meta.includes[file]:
+            return False
+        meta.fingerprints[file] = new_fingerprint
+    return True
+
+
+def write_store(bin_path: Path, meta: StoreMeta, price_index: PriceIndex):
+    """Columns of price_index, each pair's rows next to each other"""
+    start = 0
+    for pair, series in price_index.pairs.items():
+        meta.pairs[pair] = (start, start + len(series.dates))
+        start += len(series.dates)
+
+    bin_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=bin_path.parent, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(HEADER.pack(MAGIC, meta.build_id, start))
+        for series in price_index.pairs.values():
+            array("q", series.dates).tofile(f)
+        for series in price_index.pairs.values():
+            array("q", series.seqs).tofile(f)
+        for series in price_index.pairs.values():
+            array("d", series.prices).tofile(f)
+    os.replace(tmp_path, bin_path)
+
+
+def open_store(bin_path: Path, meta: StoreMeta) -> Optional[PriceIndex]:
+    """
+    Price index over the memory mapped columns of the store. Only the pairs
+    are read, the series are slices of the mapping.
+    """
+    try:
+        with open(bin_path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    view = memoryview(mapped)
+    if len(view) < HEADER.size:
+        return None
+
+    magic, build_id, size = HEADER.unpack_from(view)
+    if (
+        magic != MAGIC
+        or build_id != meta.build_id
+        or len(view) != HEADER.size + 24 * size
+    ):
+        return None
+
+    columns = [
+        view[HEADER.size + 8 * size * i : HEADER.size + 8 * size * (i + 1)]
+        for i in range(3)
+    ]
+    dates, seqs, prices = (
+        columns[0].cast("q"),
+        columns[1].cast("q"),
+        columns[2].cast("d"),
+    )
+
+    price_index = PriceIndex()
+    for (commodity, quote), (start, stop) in meta.pairs.items():
+        price_index.pairs[(commodity, quote)] = PriceSeries(
+            dates[start:stop], prices[start:stop], seqs[start:stop]
+        )
+        price_index.quotes.setdefault(commodity, []).append(quote)
+    return price_index
+
+
+def load_price_index(
+    files: Tuple[str, ...], backend_name: str, read: Callable[[], PriceIndex]
+) -> PriceIndex:
+    """
+    Price index of files from its store in the cache directory, reading it
+    with read and writing the store only when the journal prices changed
+    """
+    bin_path, meta_path = get_store_paths(files, backend_name)
+    meta = read_pickle(meta_path)
+    if isinstance(meta, StoreMeta) and meta.files == tuple(
+        os.path.abspath(file) for file in files
+    ):
+        fingerprints = dict(meta.fingerprints)
+        if is_fresh(meta):
+            price_index = open_store(bin_path, meta)
+            if price_index is not None:
+                if meta.fingerprints != fingerprints:
+                    write_pickle(meta_path, meta)
+                return price_index
+
+    meta = get_meta(files)
+    price_index = read()
+    try:
+        write_store(bin_path, meta, price_index)
+        write_pickle(meta_path, meta)
+    except OSError:
+        pass
+    return price_index
@@ -2,16 +2,16 @@ import sys
 from dataclasses import dataclass
 from datetime import date, datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import yfinance as yf
 from requests.exceptions import HTTPError
-from requests_cache import CachedSession
 
 from .commodity_tag import CommodityDirective, CommodityTag
 from .hl import hledger2txn
-from .info import get_last_price
-from .lib import get_files_comm
+from .info import get_price_index
+from .lib import get_files_comm, parallel_map
+from .rate_limit import CachedRateLimitedSession, RateLimit
 
 
 @dataclass
@@ -25,22 +25,25 @@ class Price:
 class YahooPrices:
     TAG = "yahoo_ticker"
 
-    def __init__(self, files: Tuple[str, ...]) -> None:
+    def __init__(
+        self, files: Tuple[str, ...], rate_limit: Optional[RateLimit] = None
+    ) -> None:
         self.files = files
         self.files_comm = get_files_comm(files)
 
         self.session_path = Path.home() / "yfinance.cache"
-        self.session = CachedSession(str(self.session_path))
+        self.session = CachedRateLimitedSession(str(self.session_path), rate_limit)
         self.today = datetime.today()
         yesterday = self.today - timedelta(days=1)
         self.yesterday_str = yesterday.strftime("%Y-%m-%d")
 
         commodity_directive = CommodityDirective(self.files)
         self.commodities = commodity_directive.get_commodity_tag(self.TAG)
+        self.price_index = get_price_index(files)
 
     def get_start_date(self, commodity: CommodityTag):
         txns = hledger2txn(self.files, commodity["commodity"])
-        qtty = sum(txn.qtty for txn in txns)
+        qtty = txns.get_total_qtty()
         if qtty == 0:
             print(
                 f"; stderr: No transaction for {commodity['commodity']}. Not downloading ",
@@ -48,9 +51,8 @@ class YahooPrices:
             )
             return
 
-        first_date_str = txns[0].date
-        first_date = datetime.strptime(first_date_str, "%Y-%m-%d").date()
-        last_market_date = get_last_price(self.files_comm, commodity["commodity"])[0]
+        first_date = date.fromordinal(txns.dates[0])
+        last_market_date = self.price_index.get_last(commodity["commodity"])[0]
 
         if not last_market_date:
             last_date = first_date
@@ -97,7 +99,7 @@ class YahooPrices:
         prices = [
             Price(
                 commodity["commodity"],
-                row[0].to_pydatetime().date(),  # type:ignore
+                row[0].to_pydatetime().date(),  # type: ignore
                 row[1]["Close"],  # type: ignore
                 info["currency"],
             )
@@ -132,8 +134,8 @@ class YahooPrices:
             )
             return
 
-        for commodity in self.commodities:
-            prices = self.get_commodity_prices(commodity)
+        commodities_prices = parallel_map(self.get_commodity_prices, self.commodities)
+        for prices in commodities_prices:
             if prices:
                 print("\n")
                 hledger_prices = self.prices2hledger(prices)
@@ -8,6 +8,7 @@ from prompt_toolkit.shortcuts import CompleteStyle
 
 from .avg_info import AllAvgInfo
 from .fifo_info import AllFifoInfo
+from .hl import get_backend
 from .info import LotsInfo
 from .lib import get_files_comm
 
@@ -126,55 +127,34 @@ class Prompt:
         avg_cost: bool,
         check: bool,
         no_desc: Optional[str] = None,
+        exact: bool = False,
+        lot_method: str = "fifo",
     ) -> None:
         self.file = file
         self.check = check
         self.no_desc = no_desc
         self.avg_cost = avg_cost
+        self.exact = exact
+        self.lot_method = lot_method
 
         self.files_comm = get_files_comm(file)
         self.infos = self.get_infos()
-        self.commodities = [info["comm"] for info in self.get_infos()]
-
-    def run_hledger(self, *comm: str):
-        command = ["hledger", *self.files_comm, *comm]
-
-        if self.no_desc and self.no_desc != "":
-            command = [*command, f"not:desc:{self.no_desc}"]
-
-        proc = subprocess.run(command, capture_output=True)
-        if proc.returncode != 0:
-            raise subprocess.SubprocessError(proc.stderr.decode("utf8"))
-
-        result = proc.stdout.decode("utf8")
-        return result
-
-    def run_hledger_no_query_desc(self, *comm: str):
-        command = ["hledger", *self.files_comm, *comm]
-        proc = subprocess.run(command, capture_output=True)
-        if proc.returncode != 0:
-            raise subprocess.SubprocessError(proc.stderr.decode("utf8"))
-
-        result = proc.stdout.decode("utf8")
-        return result
+        self.commodities = [info["comm"] for info in self.infos]
 
     def get_infos(self):
         if self.avg_cost:
-            infos = AllAvgInfo(self.file, self.no_desc or "", self.check)
+            infos = AllAvgInfo(self.file, self.no_desc or "", self.check, self.exact)
         else:
-            infos = AllFifoInfo(self.file, self.no_desc or "", self.check)
+            infos = AllFifoInfo(
+                self.file, self.no_desc or "", self.check, self.exact, self.lot_method
+            )
 
         valid_infos = [info for info in infos.infos if float(info["qtty"]) > 0]
         return valid_infos
 
     def get_last_purchase(self, info: LotsInfo):
         commodity = info["comm"]
-        reg = self.run_hledger("reg", f"cur:{commodity}", "amt:>0")
-        rows_list = [row for row in reg.split("\n") if row != ""]
-
-        if len(rows_list) > 0:
-            last_date = rows_list[-1][0:10]
-            return last_date
+        return get_backend().read_last_purchase(self.file, commodity, self.no_desc)
 
     def get_append_file(self):
         default_file = self.file[0]
@@ -201,8 +181,9 @@ class Prompt:
         ).ask()
         return answer
 
-    def ask_sell_qtty(self, info: LotsInfo):
-        available = float(info["qtty"])
+    def ask_sell_qtty(self, info: LotsInfo, available: Optional[float] = None):
+        if available is None:
+            available = float(info["qtty"])
 
         answer_str: str = questionary.text(
             f"Quantity (available {available})",
@@ -233,21 +214,24 @@ class Prompt:
         ).ask()
         return answer_str
 
+    def get_accounts(self, commodity: Optional[str] = None):
+        return get_backend().read_accounts(self.file, commodity, self.no_desc)
+
     def ask_cash_account(self):
-        accts_txt = self.run_hledger("accounts")
-        accts = [acct for acct in accts_txt.split("\n") if acct != ""]
+        accts = self.get_accounts()
         answer: str = custom_autocomplete("Cash Account", accts).ask()
         return answer
 
     def ask_revenue_account(self):
-        accts_txt = self.run_hledger("accounts")
-        accts = [acct for acct in accts_txt.split("\n") if acct != ""]
+        accts = self.get_accounts()
         answer: str = custom_autocomplete("Revenue Account", accts).ask()
         return answer
 
     @property
     def initial_info(self):
-        cost_method_text = "Average Cost" if self.avg_cost else "Fifo"
+        cost_method_text = (
+            "Average Cost" if self.avg_cost else self.lot_method.capitalize()
+        )
         no_desc_text = self.no_desc or "None"
         check_text = "Checking" if self.check else "Not Checking"
 
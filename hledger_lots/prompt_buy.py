@@ -1,11 +1,12 @@
-import subprocess
 from dataclasses import dataclass
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 
 import questionary
 
 from . import prompt
-from .info import LotsInfo
+from .info import LotsInfo, get_commodities
+from .journal import Posting
+from .txn_print import PrintPosting, PrintTxn, format_txn, to_amount
 
 
 @dataclass
@@ -32,12 +33,11 @@ class PromptBuy(prompt.Prompt):
         avg_cost: bool,
         check: bool,
         no_desc: Optional[str] = None,
+        exact: bool = False,
+        lot_method: str = "fifo",
     ) -> None:
-        super().__init__(file, avg_cost, check, no_desc)
-        all_commodities_txt = self.run_hledger_no_query_desc("commodities")
-        self.all_commodities = [
-            com for com in all_commodities_txt.split("\n") if com != ""
-        ]
+        super().__init__(file, avg_cost, check, no_desc, exact, lot_method)
+        self.all_commodities = get_commodities(file)
 
         print(self.initial_info)
         self.info = self.get_info()
@@ -82,8 +82,7 @@ class PromptBuy(prompt.Prompt):
         return answer_str
 
     def ask_commodity_account(self):
-        accts_txt = self.run_hledger("accounts")
-        accts = [acct for acct in accts_txt.split("\n") if acct != ""]
+        accts = self.get_accounts()
         answer: str = prompt.custom_autocomplete("Commodity Account", accts).ask()
         return answer
 
@@ -121,21 +120,14 @@ class PromptBuy(prompt.Prompt):
     def get_hl_txn(self):
         buy = self.prompt()
 
-        txn_raw = f"""
-{buy.date} Buy {buy.commodity}
-    {buy.commodity_account}    {buy.quantity} \"{buy.commodity}\" @ {buy.price} \"{buy.base_cur}\"
-    {buy.cash_account}
-"""
-
-        comm = ["hledger", "-f-", "print", "--explicit"]
-        txn_proc = subprocess.run(
-            comm,
-            input=txn_raw.encode(),
-            capture_output=True,
-        )
-        if txn_proc.returncode != 0:
-            err = txn_proc.stderr.decode("utf8")
-            raise prompt.PromptError(err)
-
-        txn_print: str = txn_proc.stdout.decode("utf8")
-        return txn_print
+        postings: List[Posting] = [
+            PrintPosting(
+                buy.commodity_account,
+                to_amount(buy.quantity, buy.commodity),
+                to_amount(buy.price, buy.base_cur),
+                "UnitPrice",
+            ),
+            PrintPosting(buy.cash_account, None),
+        ]
+        txn = PrintTxn(buy.date, f"Buy {buy.commodity}", postings)
+        return format_txn(txn)
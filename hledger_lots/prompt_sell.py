@@ -5,7 +5,6 @@ import questionary
 
 from . import avg, fifo, prompt
 from .hl import hledger2txn
-from .info import LotsInfo
 
 
 @dataclass
@@ -20,26 +19,31 @@ class PromptSell(prompt.Prompt):
         avg_cost: bool,
         check: bool,
         no_desc: Optional[str] = None,
+        exact: bool = False,
+        lot_method: str = "fifo",
     ) -> None:
-        super().__init__(file, avg_cost, check, no_desc)
+        super().__init__(file, avg_cost, check, no_desc, exact, lot_method)
 
         print(self.initial_info)
         self.info = self.get_info()
         self.last_purchase = self.get_last_purchase(self.info)
+        self.book = self.get_book(self.info["comm"])
 
     def get_info(self):
         commodity = prompt.select_commodities_text(self.commodities)
         info = next(info for info in self.infos if info["comm"] == commodity)
         return info
 
-    def ask_commodity_account(self, info: LotsInfo):
-        commodity = info["comm"]
-        accts_txt = self.run_hledger("accounts", f"cur:{commodity}")
-        accts = [acct for acct in accts_txt.split("\n") if acct != ""]
+    def ask_commodity_account(self):
+        accts = self.book.get_accts_available()
+        choices = [
+            questionary.Choice(f"{acct} (available {float(qtty)})", value=acct)
+            for acct, qtty in accts.items()
+        ]
 
         answer: str = questionary.select(
             "Commodity Account",
-            choices=accts,
+            choices=choices,
             use_shortcuts=True,
         ).ask()
         return answer
@@ -47,7 +51,9 @@ class PromptSell(prompt.Prompt):
     def prompt(self):
         commodity = self.info["comm"]
         sell_date = self.ask_date(self.last_purchase)
-        qtty = float(self.ask_sell_qtty(self.info))
+        commodity_acct = self.ask_commodity_account()
+        available = float(self.book.get_sell_available(commodity_acct))
+        qtty = float(self.ask_sell_qtty(self.info, available))
         price_str = self.ask_price(self.info)
 
         if price_str == "":
@@ -59,12 +65,6 @@ class PromptSell(prompt.Prompt):
             value = qtty * price
 
         cash_acct = self.ask_cash_account()
-
-        if self.avg_cost:
-            commodity_acct = self.ask_commodity_account(self.info)
-        else:
-            commodity_acct = ""
-
         revenue_acct = self.ask_revenue_account()
 
         result = SellInfo(
@@ -80,14 +80,21 @@ class PromptSell(prompt.Prompt):
 
         return result
 
+    def get_book(self, commodity: str):
+        txns = hledger2txn(self.file, commodity, self.no_desc)
+        if self.avg_cost:
+            return avg.AvgBook.from_txns(txns, self.check, self.exact)
+        return fifo.FifoBook.from_txns(
+            txns, self.check, self.exact, method=self.lot_method
+        )
+
     def get_hl_txn(self):
         sell = self.prompt()
-        commodity = sell.commodity
-        adj_txns = hledger2txn(self.file, commodity, self.no_desc)
+        book = self.book
 
         if self.avg_cost:
             txn_print = avg.avg_sell(
-                txns=adj_txns,
+                txns=book.txns,
                 date=sell.date,
                 qtty=sell.quantity,
                 cur=sell.commodity,
@@ -96,13 +103,12 @@ class PromptSell(prompt.Prompt):
                 comm_account=sell.commodity_account,
                 value=sell.value,
                 check=self.check,
+                exact=self.exact,
+                book=book,  # type: ignore
             )
         else:
-            sell_fifo = fifo.get_sell_lots(
-                lots=adj_txns,
-                sell_date=sell.date,
-                sell_qtty=sell.quantity,
-                check=self.check,
+            sell_fifo = book.preview_sell(
+                sell.quantity, sell.date, sell.commodity_account
             )
             txn_print = fifo.txn2hl(
                 txns=sell_fifo,
@@ -111,6 +117,7 @@ class PromptSell(prompt.Prompt):
                 cash_account=sell.cash_account,
                 revenue_account=sell.revenue_account,
                 value=sell.value,
+                method=self.lot_method,
             )
 
         return txn_print
@@ -0,0 +1,158 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional, TypeVar
+
+from requests import PreparedRequest, Response, Session
+from requests_cache import AnyResponse, CachedSession
+
+DEFAULT_RATE = 2.0
+DEFAULT_RETRIES = 5
+DEFAULT_BACKOFF = 1.0
+MAX_DELAY = 60.0
+
+TOO_MANY_REQUESTS = 429
+NOT_CACHED = 504
+
+ResponseT = TypeVar("ResponseT", bound=Response)
+
+
+class TokenBucket:
+    """
+    Allows rate calls a second on average, and bursts of up to capacity calls,
+    to the threads sharing it. A call over the limit sleeps until its turn.
+    The rate halves on throttle and grows back to max_rate on recover.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def refill(self):
+        now = self.clock()
+        tokens = self.tokens + (now - self.updated) * self.rate
+        self.tokens = min(self.capacity, tokens)
+        self.updated = now
+
+    def acquire(self):
+        with self.lock:
+            self.refill()
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+
+        if wait > 0:
+            self.sleep(wait)
+
+    def throttle(self):
+        with self.lock:
+            self.refill()
+            self.rate = max(self.rate / 2, self.max_rate / 16)
+
+    def recover(self):
+        with self.lock:
+            self.refill()
+            self.rate = min(self.rate + self.max_rate / 8, self.max_rate)
+
+
+@dataclass
+class RateLimit:
+    rate: float = DEFAULT_RATE
+    retries: int = DEFAULT_RETRIES
+    backoff: float = DEFAULT_BACKOFF
+    max_delay: float = MAX_DELAY
+    sleep: Callable[[float], None] = time.sleep
+    bucket: TokenBucket = field(init=False)
+
+    def __post_init__(self):
+        self.bucket = TokenBucket(self.rate, sleep=self.sleep)
+
+    def get_delay(self, response: Response, attempt: int) -> float:
+        """Seconds in the Retry-After header, or doubling backoff on each attempt"""
+        retry_after = response.headers.get("Retry-After", "")
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            delay = self.backoff * 2**attempt
+        return min(delay, self.max_delay)
+
+
+def send_limited(
+    rate_limit: RateLimit,
+    send: Callable[..., ResponseT],
+    request: PreparedRequest,
+    **kwargs,
+) -> ResponseT:
+    """
+    Send request within rate_limit, shared by all the threads using it,
+    sending it again while it is answered with 429 Too Many Requests
+    """
+    bucket = rate_limit.bucket
+    attempt = 0
+    while True:
+        bucket.acquire()
+        response = send(request, **kwargs)
+        if response.status_code != TOO_MANY_REQUESTS:
+            bucket.recover()
+            return response
+
+        bucket.throttle()
+        if attempt >= rate_limit.retries:
+            return response
+
+        delay = rate_limit.get_delay(response, attempt)
+        response.close()
+        rate_limit.sleep(delay)
+        attempt += 1
+
+
+class RateLimitedSession(Session):
+    def __init__(self, rate_limit: Optional[RateLimit] = None) -> None:
+        super().__init__()
+        self.rate_limit = rate_limit or RateLimit()
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        return send_limited(self.rate_limit, super().send, request, **kwargs)
+
+
+class CachedRateLimitedSession(CachedSession):
+    """Cached responses are returned without waiting for the rate limit"""
+
+    def __init__(self, cache_name: str, rate_limit: Optional[RateLimit] = None):
+        super().__init__(cache_name)
+        self.rate_limit = rate_limit or RateLimit()
+
+    def send(
+        self,
+        request: PreparedRequest,
+        expire_after=None,
+        only_if_cached: bool = False,
+        refresh: bool = False,
+        force_refresh: bool = False,
+        **kwargs,
+    ) -> AnyResponse:
+        if not (refresh or force_refresh):
+            response = super().send(request.copy(), expire_after, True, **kwargs)
+            if response.status_code != NOT_CACHED or only_if_cached:
+                return response
+
+        return send_limited(
+            self.rate_limit,
+            super().send,
+            request,
+            expire_after=expire_after,
+            refresh=refresh,
+            force_refresh=force_refresh,
+            **kwargs,
+        )
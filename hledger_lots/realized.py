@@ -0,0 +1,82 @@
+import csv
+import json
+from dataclasses import asdict
+from io import StringIO
+from typing import List, Optional, Tuple
+
+from tabulate import tabulate
+
+from .avg import AvgBook
+from .fifo import FifoBook
+from .info import AllInfo
+from .lib import parallel_map
+from .lot_book import RealizedGain
+
+
+def gain2dict(commodity: str, gain: RealizedGain) -> dict:
+    return {"comm": commodity, **asdict(gain)}
+
+
+class AllRealized(AllInfo):
+    """
+    Realized gains and losses of every sale, recorded by each commodity's
+    book while it matches the sales to lots.
+    """
+
+    def __init__(
+        self,
+        journals: Tuple[str, ...],
+        no_desc: str,
+        check: bool,
+        avg_cost: bool,
+        exact: bool = False,
+        method: str = "fifo",
+        commodity: Optional[str] = None,
+    ) -> None:
+        super().__init__(journals, no_desc)
+        self.check = check
+        self.avg_cost = avg_cost
+        self.exact = exact
+        self.method = method
+        if commodity:
+            self.commodities = [commodity.upper()]
+
+    def get_gains(self, commodity: str) -> List[dict]:
+        txns = self.get_txns(commodity)
+        if len(txns.get_base_curs()) > 1 or all(qtty >= 0 for qtty in txns.qttys):
+            return []
+
+        if self.avg_cost:
+            book = AvgBook.from_txns(txns, self.check, self.exact, realized=True)
+        else:
+            book = FifoBook.from_txns(
+                txns, self.check, self.exact, method=self.method, realized=True
+            )
+        return [gain2dict(commodity, gain) for gain in book.realized or []]
+
+    @property
+    def gains(self) -> List[dict]:
+        gains = parallel_map(self.get_gains, self.commodities)
+        return [gain for comm_gains in gains for gain in comm_gains]
+
+    def gains_table(self, output_format: str):
+        return tabulate(
+            self.gains,
+            headers="keys",
+            numalign="decimal",
+            floatfmt=",.4f",
+            tablefmt=output_format,
+        )
+
+    def gains_csv(self):
+        gains = self.gains
+        fieldnames = ["comm", *RealizedGain.__dataclass_fields__]
+        gains_io = StringIO()
+        writer = csv.DictWriter(gains_io, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(gains)
+        gains_io.seek(0)
+        return gains_io
+
+    def gains_json(self):
+        return json.dumps(self.gains, indent=2)
@@ -0,0 +1,226 @@
+import csv
+from datetime import datetime
+from typing import IO, Dict, List, Optional, Sequence, Tuple, Union
+
+from . import avg, checks, fifo
+from .hl import hledger2txns_by_cur, print_txns
+from .lib import CostMethodError, Txn
+from .prompt_sell import SellInfo
+from .txn_columns import TxnColumns, date2ordinal
+
+BATCH_FIELDS = (
+    "commodity",
+    "commodity_account",
+    "cash_account",
+    "revenue_account",
+    "date",
+    "quantity",
+    "price",
+)
+
+Book = Union[avg.AvgBook, fifo.FifoBook]
+
+
+def row2sell(row: Dict[str, str]) -> SellInfo:
+    missing = [field for field in BATCH_FIELDS if not row.get(field)]
+    if missing:
+        raise ValueError(f"Missing {', '.join(missing)}")
+
+    datetime.strptime(row["date"], "%Y-%m-%d")
+    quantity = float(row["quantity"])
+    price = float(row["price"])
+    if quantity <= 0:
+        raise ValueError(f"Quantity {row['quantity']} must be positive")
+
+    return SellInfo(
+        date=row["date"],
+        quantity=quantity,
+        commodity=row["commodity"].upper(),
+        cash_account=row["cash_account"],
+        commodity_account=row["commodity_account"],
+        price=price,
+        value=quantity * price,
+        revenue_account=row["revenue_account"],
+    )
+
+
+def read_sells(csv_file: IO[str]) -> List[SellInfo]:
+    """Sales in a csv file with the columns in BATCH_FIELDS, in file order"""
+    sells: List[SellInfo] = []
+    for row in csv.DictReader(csv_file):
+        try:
+            sells.append(row2sell(row))
+        except ValueError as e:
+            raise ValueError(f"Row {len(sells) + 1}: {e}") from e
+    return sells
+
+
+class SellBatch:
+    """
+    Sales applied by date to in-memory books of each commodity, so a sale
+    takes the lots left by the journal transactions and the batch sales up
+    to its date. A sale dated before the last journal transactions is an
+    error only when those transactions can't be applied after it.
+    """
+
+    def __init__(
+        self,
+        file: Tuple[str, ...],
+        avg_cost: bool,
+        check: bool,
+        no_desc: Optional[str] = None,
+        exact: bool = False,
+        lot_method: str = "fifo",
+    ) -> None:
+        self.file = file
+        self.avg_cost = avg_cost
+        self.check = check
+        self.no_desc = no_desc
+        self.exact = exact
+        self.lot_method = lot_method
+
+        self.txns_by_cur: Optional[Dict[str, TxnColumns]] = None
+        self.books: Dict[str, Book] = {}
+        # Journal rows of each book in the order they are applied, and how
+        # many of them were applied
+        self.orders: Dict[str, Sequence[int]] = {}
+        self.applied: Dict[str, int] = {}
+
+    def get_book(self, commodity: str) -> Book:
+        book = self.books.get(commodity)
+        if book is not None:
+            return book
+
+        if self.txns_by_cur is None:
+            self.txns_by_cur = hledger2txns_by_cur(self.file, self.no_desc)
+        txns = self.txns_by_cur.get(commodity, TxnColumns())
+        checks.check_base_currency(txns)
+
+        if self.avg_cost:
+            book = avg.AvgBook(self.check, self.exact, txns)
+        else:
+            book = fifo.FifoBook(self.check, self.exact, txns, self.lot_method)
+        self.books[commodity] = book
+        self.orders[commodity] = book.get_order(txns)
+        self.applied[commodity] = 0
+        return book
+
+    def apply_until(self, commodity: str, date_ordinal: Optional[int] = None) -> Book:
+        """Book with the journal rows until date_ordinal applied, or all of them"""
+        book = self.get_book(commodity)
+        order = self.orders[commodity]
+        dates = book.txns.dates
+
+        pos = self.applied[commodity]
+        while pos < len(order) and (
+            date_ordinal is None or dates[order[pos]] <= date_ordinal
+        ):
+            book.apply_index(order[pos])
+            pos += 1
+
+        self.applied[commodity] = pos
+        return book
+
+    def get_applied_txns(self, commodity: str) -> TxnColumns:
+        """Journal rows applied to the book, followed by the batch sales"""
+        book = self.books[commodity]
+        order = self.orders[commodity]
+        pos = self.applied[commodity]
+        if pos == len(order):
+            return book.txns
+        return book.txns.take([*order[:pos], *range(len(order), len(book.txns))])
+
+    def check_later(self, commodity: str, sell: SellInfo):
+        """Apply the journal rows after a backdated sale to a copy of the book"""
+        book = self.books[commodity].snapshot()
+        order = self.orders[commodity]
+        try:
+            for index in order[self.applied[commodity] :]:
+                book.apply_index(index)
+        except (ValueError, CostMethodError) as e:
+            raise ValueError(
+                f"Sale of {sell.commodity} on {sell.date} conflicts with the "
+                f"journal transactions after it: {e}"
+            ) from e
+
+    def get_sell_hl(self, sell: SellInfo) -> str:
+        """Journal text of a sale, applied to the commodity's book"""
+        book = self.apply_until(sell.commodity, date2ordinal(sell.date))
+        txns = self.get_applied_txns(sell.commodity)
+        if len(txns) == 0:
+            raise ValueError(f"No transactions available for {sell.commodity}")
+
+        base_cur = txns.base_cur_names.names[txns.base_curs[0]]
+        lots = book.preview_sell(sell.quantity, sell.date, sell.commodity_account)
+
+        if isinstance(book, avg.AvgBook):
+            txn_hl = avg.avg_sell(
+                txns=txns,
+                date=sell.date,
+                qtty=sell.quantity,
+                cur=sell.commodity,
+                cash_account=sell.cash_account,
+                revenue_account=sell.revenue_account,
+                comm_account=sell.commodity_account,
+                value=sell.value,
+                check=self.check,
+                exact=self.exact,
+                book=book,
+            )
+        else:
+            txn_hl = fifo.txn2hl(
+                txns=lots,
+                date=sell.date,
+                cur=sell.commodity,
+                cash_account=sell.cash_account,
+                revenue_account=sell.revenue_account,
+                value=sell.value,
+                method=self.lot_method,
+            )
+
+        # The same postings the book reads back once the sale is in the journal,
+        # FIFO ones with the buy_date tag of their lot
+        for lot in lots:
+            buy_date = None if isinstance(book, avg.AvgBook) else lot.date
+            book.apply(
+                Txn(
+                    sell.date,
+                    lot.price,
+                    base_cur,
+                    -lot.qtty,
+                    lot.acct,
+                    "UnitPrice",
+                    buy_date=buy_date,
+                )
+            )
+
+        if self.applied[sell.commodity] < len(self.orders[sell.commodity]):
+            self.check_later(sell.commodity, sell)
+        return txn_hl
+
+    def get_sells_hl(self, sells: List[SellInfo]) -> List[str]:
+        """
+        Journal text of each sale in the order of sells. They are applied by
+        date, the ones of the same date in file order.
+        """
+        txns_hl: List[str] = [""] * len(sells)
+        by_date = sorted(range(len(sells)), key=lambda i: sells[i].date)
+        for i in by_date:
+            try:
+                txns_hl[i] = self.get_sell_hl(sells[i])
+            except ValueError as e:
+                raise ValueError(f"Row {i + 1}: {e}") from e
+
+        for commodity in self.books:
+            self.apply_until(commodity)
+        return txns_hl
+
+    def get_hl_txns(self, sells: List[SellInfo], validate: bool = True) -> str:
+        """
+        All sales as journal text. With validate, hledger checks and formats
+        them in one call and an invalid sale is an error for all of them.
+        """
+        txns_hl = self.get_sells_hl(sells)
+        if validate:
+            return print_txns(txns_hl)
+        return "".join(txns_hl)
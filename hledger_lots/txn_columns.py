@@ -0,0 +1,451 @@
+from array import array
+from datetime import date
+from decimal import Decimal
+from fractions import Fraction
+from functools import lru_cache
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    overload,
+)
+
+from .lib import AdjustedTxn, ExactAmounts, Txn, TxnLike
+
+IntColumn = Union["array[int]", List[int]]
+
+FIELDS = ("date", "price", "base_cur", "qtty", "acct")
+
+# Exact unit prices and amounts are integer mantissas of 10**-EXACT_PLACES
+EXACT_PLACES = 12
+
+
+def date2ordinal(date_str: str) -> int:
+    return date.fromisoformat(date_str).toordinal()
+
+
+@lru_cache(maxsize=4096)
+def ordinal2date(ordinal: int) -> str:
+    return date.fromordinal(ordinal).isoformat()
+
+
+def float2mantissa(value: float) -> Tuple[int, int]:
+    """Mantissa and decimal places of the shortest repr of value"""
+    _, _, exponent = Decimal(repr(value)).as_tuple()
+    places = max(-exponent, 0) if isinstance(exponent, int) else 0
+    return int(Decimal(repr(value)).scaleb(places)), places
+
+
+def int_column(values: List[int]) -> IntColumn:
+    """int64 array, or a list if some value doesn't fit"""
+    try:
+        return array("q", values)
+    except OverflowError:
+        return values
+
+
+def append_int(column: IntColumn, value: int) -> IntColumn:
+    try:
+        column.append(value)
+        return column
+    except OverflowError:
+        return [*column, value]
+
+
+def div_round(numerator: int, denominator: int) -> int:
+    """numerator / denominator rounded half to even, in integers"""
+    if denominator < 0:
+        numerator, denominator = -numerator, -denominator
+    quotient, remainder = divmod(numerator, denominator)
+    if 2 * remainder > denominator or (
+        2 * remainder == denominator and quotient % 2 == 1
+    ):
+        quotient += 1
+    return quotient
+
+
+def get_unit_mantissa(amount: int, places: int, qtty: int, qtty_places: int) -> int:
+    """Price of a unit of qtty when all of it costs amount, as an exact mantissa"""
+    return div_round(amount * 10 ** (qtty_places + EXACT_PLACES), qtty * 10**places)
+
+
+def to_places(mantissa: int, places: int, new_places: int) -> int:
+    """Mantissa of 10**-places as one of 10**-new_places, rounded if it has fewer"""
+    if new_places >= places:
+        return mantissa * 10 ** (new_places - places)
+    return div_round(mantissa, 10 ** (places - new_places))
+
+
+def from_exact(mantissa: int) -> Union[int, float]:
+    """Price or amount of an exact mantissa"""
+    return as_number(mantissa / 10**EXACT_PLACES)
+
+
+def as_number(value: float) -> Union[int, float]:
+    """Integral values as int, the way hledger JSON numbers are read"""
+    return int(value) if value.is_integer() else value
+
+
+class Interned:
+    """Two way mapping between strings and small integer codes"""
+
+    def __init__(self) -> None:
+        self.names: List[str] = []
+        self.codes: Dict[str, int] = {}
+
+    def get_code(self, name: str) -> int:
+        code = self.codes.get(name)
+        if code is None:
+            code = len(self.names)
+            self.codes[name] = code
+            self.names.append(name)
+        return code
+
+
+class TxnView:
+    """Row of a TxnColumns, read like an AdjustedTxn without copying it"""
+
+    __slots__ = ("columns", "index")
+
+    def __init__(self, columns: "TxnColumns", index: int) -> None:
+        self.columns = columns
+        self.index = index
+
+    @property
+    def date(self) -> str:
+        return ordinal2date(self.columns.dates[self.index])
+
+    @property
+    def date_ordinal(self) -> int:
+        return self.columns.dates[self.index]
+
+    @property
+    def price(self) -> float:
+        return as_number(self.columns.prices[self.index])
+
+    @property
+    def base_cur(self) -> str:
+        return self.columns.base_cur_names.names[self.columns.base_curs[self.index]]
+
+    @property
+    def qtty(self) -> float:
+        return as_number(self.columns.qttys[self.index])
+
+    @property
+    def acct(self) -> str:
+        return self.columns.acct_names.names[self.columns.accts[self.index]]
+
+    def to_txn(self) -> AdjustedTxn:
+        return AdjustedTxn(self.date, self.price, self.base_cur, self.qtty, self.acct)
+
+    def asdict(self) -> dict:
+        return {field: getattr(self, field) for field in FIELDS}
+
+    def __eq__(self, other) -> bool:
+        if not all(hasattr(other, field) for field in FIELDS):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in FIELDS)
+
+    def __repr__(self) -> str:
+        return repr(self.to_txn())
+
+
+TxnsLike = Sequence[TxnLike]
+
+
+class TxnColumns(Sequence[TxnView]):
+    """
+    Transactions stored column by column: date ordinals, float64 prices and
+    quantities, and base currencies and accounts as codes of interned names.
+    """
+
+    def __init__(
+        self,
+        base_cur_names: Optional[Interned] = None,
+        acct_names: Optional[Interned] = None,
+    ) -> None:
+        self.dates = array("i")
+        self.prices = array("d")
+        self.qttys = array("d")
+        self.base_curs = array("I")
+        self.accts = array("I")
+        # Date ordinal of the lot a sale names in its buy_date tag, or 0
+        self.buy_dates = array("i")
+        self.base_cur_names = base_cur_names or Interned()
+        self.acct_names = acct_names or Interned()
+
+        # Exact values: quantities as mantissas of 10**-qtty_scale and prices as
+        # written in the journal, either per unit or for the whole posting
+        self.qtty_scale = 0
+        self.qtty_mantissas: IntColumn = array("q")
+        self.price_mantissas: IntColumn = array("q")
+        self.price_places = array("b")
+        self.price_totals = array("b")
+        # Unit price a sale got, from the cash of its transaction or else its
+        # posting price, as a mantissa of 10**-EXACT_PLACES, and 0 for buys
+        self.sale_prices: IntColumn = array("q")
+
+    @classmethod
+    def from_txns(cls, txns: Iterable[TxnLike]) -> "TxnColumns":
+        if isinstance(txns, TxnColumns):
+            return txns
+
+        columns = cls()
+        for txn in txns:
+            columns.append_txn(txn)
+        return columns
+
+    def append(
+        self,
+        date_str: str,
+        price: float,
+        base_cur: str,
+        qtty: float,
+        acct: str,
+        exact: Optional[ExactAmounts] = None,
+        total_price: bool = False,
+        buy_date: Optional[str] = None,
+        sale_price: Optional[int] = None,
+    ):
+        self.dates.append(date2ordinal(date_str))
+        self.prices.append(price)
+        self.qttys.append(qtty)
+        self.base_curs.append(self.base_cur_names.get_code(base_cur))
+        self.accts.append(self.acct_names.get_code(acct))
+        self.buy_dates.append(date2ordinal(buy_date) if buy_date else 0)
+
+        if exact is None:
+            exact = (*float2mantissa(qtty), *float2mantissa(price))
+        qtty_mantissa, qtty_places, price_mantissa, price_places = exact
+
+        self.set_qtty_scale(qtty_places)
+        qtty_mantissa *= 10 ** (self.qtty_scale - qtty_places)
+        self.qtty_mantissas = append_int(self.qtty_mantissas, qtty_mantissa)
+        self.price_mantissas = append_int(self.price_mantissas, price_mantissa)
+        self.price_places.append(price_places)
+        self.price_totals.append(total_price)
+
+        if sale_price is None:
+            sale_price = self.get_unit_price(len(self) - 1) if qtty < 0 else 0
+        self.sale_prices = append_int(self.sale_prices, sale_price)
+
+    def append_row(self, columns: "TxnColumns", index: int):
+        """Append row index of columns, keeping its exact amounts"""
+        exact = (
+            columns.qtty_mantissas[index],
+            columns.qtty_scale,
+            columns.price_mantissas[index],
+            columns.price_places[index],
+        )
+        self.append(
+            columns.get_date(index),
+            columns.prices[index],
+            columns.base_cur_names.names[columns.base_curs[index]],
+            columns.qttys[index],
+            columns.acct_names.names[columns.accts[index]],
+            exact,
+            bool(columns.price_totals[index]),
+            columns.get_buy_date(index),
+            columns.sale_prices[index],
+        )
+
+    def append_txn(self, txn: TxnLike):
+        if isinstance(txn, TxnView):
+            self.append_row(txn.columns, txn.index)
+        elif isinstance(txn, Txn):
+            total_price = txn.type != "UnitPrice"
+            price = txn.price / txn.qtty if total_price else txn.price
+            sale_price = (
+                get_unit_mantissa(*txn.sale[2:], *txn.sale[:2]) if txn.sale else None
+            )
+            self.append(
+                txn.date,
+                price,
+                txn.base_cur,
+                txn.qtty,
+                txn.acct,
+                txn.exact,
+                total_price and txn.exact is not None,
+                txn.buy_date,
+                sale_price,
+            )
+        else:
+            self.append(txn.date, txn.price, txn.base_cur, txn.qtty, txn.acct)
+
+    def set_qtty_scale(self, places: int):
+        if places > self.qtty_scale:
+            factor = 10 ** (places - self.qtty_scale)
+            self.qtty_mantissas = int_column([m * factor for m in self.qtty_mantissas])
+            self.qtty_scale = places
+
+    def extend(self, other: "TxnColumns"):
+        self.set_qtty_scale(other.qtty_scale)
+        factor = 10 ** (self.qtty_scale - other.qtty_scale)
+
+        self.dates.extend(other.dates)
+        self.prices.extend(other.prices)
+        self.qttys.extend(other.qttys)
+        self.base_curs.extend(
+            self.base_cur_names.get_code(other.base_cur_names.names[code])
+            for code in other.base_curs
+        )
+        self.accts.extend(
+            self.acct_names.get_code(other.acct_names.names[code])
+            for code in other.accts
+        )
+        self.buy_dates.extend(other.buy_dates)
+        self.qtty_mantissas = int_column(
+            [*self.qtty_mantissas, *(m * factor for m in other.qtty_mantissas)]
+        )
+        self.price_mantissas = int_column(
+            [*self.price_mantissas, *other.price_mantissas]
+        )
+        self.price_places.extend(other.price_places)
+        self.price_totals.extend(other.price_totals)
+        self.sale_prices = int_column([*self.sale_prices, *other.sale_prices])
+
+    def take(self, indexes: Iterable[int]) -> "TxnColumns":
+        """Copy the rows at indexes, sharing the interned names"""
+        indexes = list(indexes)
+        columns = TxnColumns(self.base_cur_names, self.acct_names)
+        columns.dates = array("i", [self.dates[i] for i in indexes])
+        columns.prices = array("d", [self.prices[i] for i in indexes])
+        columns.qttys = array("d", [self.qttys[i] for i in indexes])
+        columns.base_curs = array("I", [self.base_curs[i] for i in indexes])
+        columns.accts = array("I", [self.accts[i] for i in indexes])
+        columns.buy_dates = array("i", [self.buy_dates[i] for i in indexes])
+        columns.qtty_scale = self.qtty_scale
+        columns.qtty_mantissas = int_column([self.qtty_mantissas[i] for i in indexes])
+        columns.price_mantissas = int_column([self.price_mantissas[i] for i in indexes])
+        columns.price_places = array("b", [self.price_places[i] for i in indexes])
+        columns.price_totals = array("b", [self.price_totals[i] for i in indexes])
+        columns.sale_prices = int_column([self.sale_prices[i] for i in indexes])
+        return columns
+
+    def copy(self) -> "TxnColumns":
+        return self.take(range(len(self)))
+
+    def get_unit_price(self, index: int) -> int:
+        """Price of a unit as a mantissa of 10**-EXACT_PLACES, rounded"""
+        price = self.price_mantissas[index]
+        places = self.price_places[index]
+        if self.price_totals[index]:
+            return get_unit_mantissa(
+                price, places, self.qtty_mantissas[index], self.qtty_scale
+            )
+        return to_places(price, places, EXACT_PLACES)
+
+    def get_exact_cost(self, index: int) -> int:
+        """Amount paid as a mantissa of 10**-EXACT_PLACES, rounded"""
+        price = self.price_mantissas[index]
+        places = self.price_places[index]
+        if self.price_totals[index]:
+            return to_places(price, places, EXACT_PLACES)
+        qtty = self.qtty_mantissas[index]
+        return to_places(qtty * price, places + self.qtty_scale, EXACT_PLACES)
+
+    def get_costs(self) -> Tuple[List[int], int]:
+        """Amount paid for each row as mantissas of 10**-scale, and the scale"""
+        max_places = max(self.price_places, default=0)
+        scale = self.qtty_scale + max_places
+
+        costs = [
+            (
+                price * 10 ** (scale - places)
+                if total
+                else qtty * price * 10 ** (max_places - places)
+            )
+            for qtty, price, places, total in zip(
+                self.qtty_mantissas,
+                self.price_mantissas,
+                self.price_places,
+                self.price_totals,
+            )
+        ]
+        return costs, scale
+
+    def get_exact_qtty(self) -> Fraction:
+        return Fraction(sum(self.qtty_mantissas), 10**self.qtty_scale)
+
+    def get_exact_acct_qtty(self, acct: str) -> Fraction:
+        code = self.acct_names.codes.get(acct)
+        mantissas = (
+            qtty
+            for qtty, acct_code in zip(self.qtty_mantissas, self.accts)
+            if acct_code == code
+        )
+        return Fraction(sum(mantissas), 10**self.qtty_scale)
+
+    def get_exact_amount(self) -> Fraction:
+        costs, scale = self.get_costs()
+        return Fraction(sum(costs), 10**scale)
+
+    def get_exact_avg_cost(self) -> Fraction:
+        total_qtty = sum(self.qtty_mantissas)
+        if total_qtty == 0:
+            return Fraction(0)
+
+        return self.get_exact_amount() * 10**self.qtty_scale / total_qtty
+
+    def get_date(self, index: int) -> str:
+        return ordinal2date(self.dates[index])
+
+    def get_buy_date(self, index: int) -> Optional[str]:
+        buy_date = self.buy_dates[index]
+        return ordinal2date(buy_date) if buy_date else None
+
+    def get_base_curs(self) -> set:
+        return {self.base_cur_names.names[code] for code in set(self.base_curs)}
+
+    def get_total_qtty(self) -> Union[int, float]:
+        return as_number(float(sum(self.qttys)))
+
+    def get_acct_qtty(self, acct: str) -> float:
+        code = self.acct_names.codes.get(acct)
+        return sum(
+            qtty for qtty, acct_code in zip(self.qttys, self.accts) if acct_code == code
+        )
+
+    def to_txns(self) -> List[AdjustedTxn]:
+        return [view.to_txn() for view in self]
+
+    def to_dicts(self) -> List[dict]:
+        return [view.asdict() for view in self]
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __iter__(self) -> Iterator[TxnView]:
+        return (TxnView(self, i) for i in range(len(self.dates)))
+
+    @overload
+    def __getitem__(self, index: int) -> TxnView: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "TxnColumns": ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[TxnView, "TxnColumns"]:
+        if isinstance(index, slice):
+            return self.take(range(*index.indices(len(self))))
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("TxnColumns index out of range")
+        return TxnView(self, index)
+
+    def __eq__(self, other) -> bool:
+        try:
+            return len(self) == len(other) and all(
+                view == txn for view, txn in zip(self, other)
+            )
+        except TypeError:
+            return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"TxnColumns({self.to_txns()!r})"
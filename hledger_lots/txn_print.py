@@ -0,0 +1,166 @@
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Union
+
+from .journal import Amount, Posting, Transaction
+
+# Characters hledger quotes a commodity symbol for, besides digits
+NONSIMPLE_COMMODITY_CHARS = set('-+.@*;\t\n "{}=')
+MIN_AMOUNT_WIDTH = 12
+
+
+@dataclass
+class PrintPosting(Posting):
+    """Posting written by hledger-lots, printed with its comment"""
+
+
+@dataclass
+class PrintTxn(Transaction):
+    comments: List[str] = field(default_factory=list)
+
+
+def quote_commodity(commodity: str) -> str:
+    if any(c.isdigit() or c in NONSIMPLE_COMMODITY_CHARS for c in commodity):
+        return f'"{commodity}"'
+    return commodity
+
+
+def to_amount(value: Union[str, float], commodity: str) -> Amount:
+    """Amount with the decimal places value is written with"""
+    number = Decimal(value if isinstance(value, str) else repr(value))
+    exponent = number.as_tuple().exponent
+    places = max(-exponent, 0) if isinstance(exponent, int) else 0
+    return Amount(commodity, int(number.scaleb(places)), places)
+
+
+def normalize(amount: Amount) -> Amount:
+    """Amount without trailing zero decimals"""
+    mantissa, places = amount.mantissa, amount.places
+    while places > 0 and mantissa % 10 == 0:
+        mantissa //= 10
+        places -= 1
+    return Amount(amount.commodity, mantissa, places)
+
+
+def get_cost(posting: Posting) -> Optional[Amount]:
+    amount = posting.amount
+    price = posting.price
+    if amount is None or price is None:
+        return amount
+
+    if posting.price_type == "TotalPrice":
+        mantissa = abs(price.mantissa) if amount.mantissa >= 0 else -abs(price.mantissa)
+        return Amount(price.commodity, mantissa, price.places)
+
+    mantissa = amount.mantissa * price.mantissa
+    return Amount(price.commodity, mantissa, amount.places + price.places)
+
+
+def get_balancing(postings: Iterable[Posting]) -> List[Amount]:
+    """Amounts that balance the postings, one per commodity, like hledger infers them"""
+    totals: Dict[str, Amount] = {}
+    for posting in postings:
+        cost = get_cost(posting)
+        if cost is None:
+            continue
+
+        total = totals.get(cost.commodity, Amount(cost.commodity, 0, 0))
+        places = max(total.places, cost.places)
+        mantissa = total.mantissa * 10 ** (
+            places - total.places
+        ) + cost.mantissa * 10 ** (places - cost.places)
+        totals[cost.commodity] = Amount(cost.commodity, mantissa, places)
+
+    balancing = [
+        normalize(Amount(total.commodity, -total.mantissa, total.places))
+        for total in totals.values()
+        if total.mantissa != 0
+    ]
+    return balancing or [Amount("", 0, 0)]
+
+
+def get_styles(postings: Iterable[Posting]) -> Dict[str, int]:
+    """Decimal places of each commodity, the most its posting amounts use"""
+    styles: Dict[str, int] = {}
+    for posting in postings:
+        amount = posting.amount
+        if amount is not None:
+            places = styles.get(amount.commodity, 0)
+            styles[amount.commodity] = max(places, amount.places)
+    return styles
+
+
+def format_amount(amount: Amount, places: Optional[int] = None) -> str:
+    places = amount.places if places is None else max(places, amount.places)
+    mantissa = amount.mantissa * 10 ** (places - amount.places)
+    digits = str(abs(mantissa)).rjust(places + 1, "0")
+    number = f"{digits[:-places]}.{digits[-places:]}" if places else digits
+    sign = "-" if mantissa < 0 else ""
+    if amount.commodity == "":
+        return f"{sign}{number}"
+    return f"{sign}{number} {quote_commodity(amount.commodity)}"
+
+
+def format_posting_amount(posting: Posting, styles: Dict[str, int]) -> str:
+    amount = posting.amount
+    if amount is None:
+        return ""
+
+    amount_str = format_amount(amount, styles.get(amount.commodity, 0))
+    if posting.price is None:
+        return amount_str
+
+    price_sign = "@@" if posting.price_type == "TotalPrice" else "@"
+    return f"{amount_str} {price_sign} {format_amount(posting.price)}"
+
+
+def format_txn(txn: Transaction) -> str:
+    """
+    Transaction as 'hledger print --explicit' shows it: the amount of the
+    posting without one is inferred and amounts are aligned in a column.
+    """
+    comments = txn.comments if isinstance(txn, PrintTxn) else []
+    header = f"{txn.date} {txn.description}".rstrip()
+    if comments:
+        header += f"  ; {comments[0]}"
+    lines = [header, *(f"    ; {comment}" for comment in comments[1:])]
+
+    missing = [posting for posting in txn.postings if posting.amount is None]
+    if len(missing) > 1:
+        raise ValueError(
+            f"Transaction {header} has more than one posting without amount"
+        )
+
+    styles = get_styles(txn.postings)
+    postings: List[Posting] = []
+    for posting in txn.postings:
+        if posting.amount is not None:
+            postings.append(posting)
+            continue
+
+        for amount in get_balancing(txn.postings):
+            balancing = PrintPosting(posting.account, amount)
+            if isinstance(posting, PrintPosting):
+                balancing.comment = posting.comment
+            postings.append(balancing)
+
+    if not missing and get_balancing(postings) != [Amount("", 0, 0)]:
+        raise ValueError(f"Transaction {header} is unbalanced")
+
+    amounts = [format_posting_amount(posting, styles) for posting in postings]
+    acct_width = max((len(posting.account) for posting in postings), default=0)
+    amount_width = max([MIN_AMOUNT_WIDTH, *(len(amount) for amount in amounts)])
+
+    for posting, amount in zip(postings, amounts):
+        # hledger leaves 2 columns after the accounts for posting status marks
+        line = f"    {posting.account:<{acct_width + 2}}  {amount:>{amount_width}}"
+        comment = posting.comment if isinstance(posting, PrintPosting) else ""
+        if comment:
+            line += f"  ; {comment}"
+        lines.append(line.rstrip())
+
+    return "\n".join(lines) + "\n\n"
+
+
+def format_txns(txns: Iterable[Transaction]) -> str:
+    return "".join(format_txn(txn) for txn in txns)
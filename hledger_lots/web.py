@@ -0,0 +1,118 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from .hl import Backend, txns2columns_by_cur, txns_list2txns
+from .price_index import PriceIndex
+from .txn_columns import TxnColumns
+
+DEFAULT_URL = "http://127.0.0.1:5000"
+
+
+def get_quantity(amount: dict) -> float:
+    return amount["aquantity"]["floatingPoint"]
+
+
+class WebBackend(Backend):
+    """Read the journal served by a running hledger-web through its JSON API"""
+
+    name = "web"
+    cacheable = False
+
+    def __init__(
+        self,
+        url: str = DEFAULT_URL,
+        session: Optional[requests.Session] = None,
+        timeout: float = 30,
+    ) -> None:
+        super().__init__()
+        self.url = url.rstrip("/")
+        self.session = session or requests.Session()
+        self.session.headers.update({"Accept": "application/json"})
+        self.timeout = timeout
+        self.responses: Dict[str, Any] = {}
+
+    def get_json(self, path: str) -> Any:
+        if path not in self.responses:
+            response = self.session.get(f"{self.url}/{path}", timeout=self.timeout)
+            response.raise_for_status()
+            self.responses[path] = response.json()
+
+        return self.responses[path]
+
+    def get_txns_list(self, no_desc: Optional[str] = None) -> List[dict]:
+        txns_list = self.get_json("transactions")
+        if not no_desc:
+            return txns_list
+
+        regex = re.compile(no_desc, re.IGNORECASE)
+        return [txn for txn in txns_list if not regex.search(txn["tdescription"])]
+
+    def read_txns(
+        self, file_path: Tuple[str, ...], cur: str, no_desc: Optional[str] = None
+    ) -> TxnColumns:
+        txns_by_cur = self.read_txns_by_cur(file_path, no_desc)
+        return txns_by_cur.get(cur.upper(), TxnColumns())
+
+    def read_txns_by_cur(
+        self, file_path: Tuple[str, ...], no_desc: Optional[str] = None
+    ) -> Dict[str, TxnColumns]:
+        return txns2columns_by_cur(txns_list2txns(self.get_txns_list(no_desc)))
+
+    def read_price_index(self, file_path: Tuple[str, ...]) -> PriceIndex:
+        prices_list = self.get_json("prices")
+
+        prices = [
+            (
+                price["pdate"],
+                price["pcommodity"],
+                get_quantity(price["pamount"]),
+                price["pamount"]["acommodity"],
+            )
+            for price in prices_list
+        ]
+        reverse_prices = [
+            (
+                price["pdate"],
+                price["pamount"]["acommodity"],
+                1 / get_quantity(price["pamount"]),
+                price["pcommodity"],
+            )
+            for price in prices_list
+            if get_quantity(price["pamount"]) != 0
+        ]
+        return PriceIndex.from_rows([*prices, *reverse_prices])
+
+    def read_commodities(self, file_path: Tuple[str, ...]) -> List[str]:
+        return self.get_json("commodities")
+
+    def read_accounts(
+        self,
+        file_path: Tuple[str, ...],
+        cur: Optional[str] = None,
+        no_desc: Optional[str] = None,
+    ) -> List[str]:
+        if not cur and not no_desc:
+            return self.get_json("accountnames")
+
+        accounts = {
+            posting["paccount"]
+            for txn in self.get_txns_list(no_desc)
+            for posting in txn["tpostings"]
+            for amount in posting["pamount"]
+            if not cur or amount["acommodity"].upper() == cur.upper()
+        }
+        return sorted(accounts)
+
+    def read_last_purchase(
+        self, file_path: Tuple[str, ...], cur: str, no_desc: Optional[str] = None
+    ) -> Optional[str]:
+        purchases = sorted(
+            txn["tdate"]
+            for txn in self.get_txns_list(no_desc)
+            for posting in txn["tpostings"]
+            for amount in posting["pamount"]
+            if amount["acommodity"].upper() == cur.upper() and get_quantity(amount) > 0
+        )
+        return purchases[-1] if purchases else None
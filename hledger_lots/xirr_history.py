@@ -0,0 +1,202 @@
+import csv
+import json
+import math
+from dataclasses import asdict, dataclass
+from datetime import date
+from io import StringIO
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple, Union
+
+from pyxirr import DayCount, InvalidPaymentsError, xirr
+from tabulate import tabulate
+
+from .info import AllInfo
+from .lib import EPOCH_ORDINAL, parallel_map
+from .txn_columns import TxnColumns, date2ordinal
+
+if TYPE_CHECKING:
+    import numpy as np
+else:
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+
+HAS_NUMPY = np is not None
+
+PERIODS = ("daily", "monthly")
+
+
+@dataclass
+class XirrPoint:
+    date: str
+    qtty: float
+    mkt_price: float
+    mkt_amount: float
+    xirr: Optional[float]
+    error: str = ""
+
+
+def get_period_prices(
+    prices: Sequence[Tuple[str, float]], period: str = "monthly"
+) -> List[Tuple[str, float]]:
+    """Last price of each day, or of each month, in date order"""
+    key_len = 10 if period == "daily" else 7
+    last_prices = {}
+    for price_date, price in sorted(prices, key=lambda price: price[0]):
+        last_prices[price_date[:key_len]] = (price_date, price)
+    return list(last_prices.values())
+
+
+class FlowBuffer:
+    """
+    Cash flows sorted by date with a spare slot after them, so the flows up
+    to n plus the sale at market price are passed to xirr without copying.
+    """
+
+    def __init__(self, dates: Sequence[int], amounts: Sequence[float]) -> None:
+        self.size = len(dates)
+        self.replaced: Optional[tuple] = None
+        self.dates: Union["np.ndarray", List[date]]
+        self.amounts: Union["np.ndarray", List[float]]
+        if HAS_NUMPY:
+            self.dates = np.empty(self.size + 1, dtype="datetime64[D]")
+            days = np.asarray(dates, dtype=np.int64) - EPOCH_ORDINAL
+            self.dates[: self.size] = days.astype("datetime64[D]")
+            self.amounts = np.empty(self.size + 1, dtype=np.float64)
+            self.amounts[: self.size] = amounts
+        else:
+            self.dates = [*map(date.fromordinal, dates), date.min]
+            self.amounts = [*amounts, 0.0]
+
+    def get_flows(self, n: int, sell_date: int, sell_amount: float):
+        """Flows before n followed by the sale. Valid until the next call."""
+        if isinstance(self.dates, list):
+            return (
+                [*self.dates[:n], date.fromordinal(sell_date)],
+                [*self.amounts[:n], sell_amount],
+            )
+
+        flow_date = np.datetime64(sell_date - EPOCH_ORDINAL, "D")
+        self.restore()
+        self.replaced = (n, self.dates[n], self.amounts[n])
+        self.dates[n], self.amounts[n] = flow_date, sell_amount
+        return self.dates[: n + 1], self.amounts[: n + 1]
+
+    def restore(self):
+        """Put back the flow the last sale took the place of"""
+        if self.replaced is not None:
+            n, self.dates[n], self.amounts[n] = self.replaced
+            self.replaced = None
+
+
+def sweep_xirrs(
+    txns: TxnColumns,
+    prices: Sequence[Tuple[str, float]],
+    warm: bool = True,
+    day_count: DayCount = DayCount.THIRTY_U_360,
+) -> List[XirrPoint]:
+    """
+    Xirr of the cash flows of all transactions up to each price date, buys and
+    sales, followed by selling what is held at that price. These are the flows
+    of Info.get_xirr_flows, so each point is the xirr list shows for a journal
+    ending on that date. Dates are swept forward adding cash flows as they
+    come and, with warm, each solve starts from the rate of the previous date.
+    """
+    order = sorted(range(len(txns)), key=txns.dates.__getitem__)
+    dates = [txns.dates[i] for i in order]
+    qttys = [txns.qttys[i] for i in order]
+    amounts = [txns.prices[i] * txns.qttys[i] for i in order]
+    flows = FlowBuffer(dates, amounts)
+
+    points: List[XirrPoint] = []
+    n, held, rate = 0, 0.0, None
+    for price_date, price in prices:
+        ordinal = date2ordinal(price_date)
+        while n < len(dates) and dates[n] <= ordinal:
+            held += qttys[n]
+            n += 1
+        if n == 0:
+            continue
+
+        mkt_amount = held * price
+        point = XirrPoint(price_date, held, price, mkt_amount, None)
+        flow_dates, flow_amounts = flows.get_flows(n, ordinal, -mkt_amount)
+        try:
+            point.xirr = xirr(
+                flow_dates,
+                flow_amounts,
+                guess=rate if warm else None,
+                day_count=day_count,
+            )
+        except InvalidPaymentsError as e:
+            point.error = str(e)
+
+        if point.xirr is not None and not math.isnan(point.xirr):
+            rate = point.xirr
+        elif not point.error:
+            point.xirr = None
+            point.error = "Xirr did not converge"
+        points.append(point)
+
+    flows.restore()
+    return points
+
+
+def point2dict(commodity: str, point: XirrPoint) -> dict:
+    return {"comm": commodity, **asdict(point)}
+
+
+class AllXirrHistory(AllInfo):
+    """
+    Xirr of each commodity on every date it has a market price, or on the
+    last price date of each month.
+    """
+
+    def __init__(
+        self,
+        journals: Tuple[str, ...],
+        no_desc: str,
+        period: str = "monthly",
+        commodity: Optional[str] = None,
+    ) -> None:
+        super().__init__(journals, no_desc)
+        self.period = period
+        if commodity:
+            self.commodities = [commodity.upper()]
+
+    def get_history(self, commodity: str) -> List[dict]:
+        txns = self.get_txns(commodity)
+        if len(txns) == 0 or len(txns.get_base_curs()) > 1:
+            return []
+
+        prices = self.price_index.get_range(commodity)
+        period_prices = get_period_prices(prices, self.period)
+        return [
+            point2dict(commodity, point) for point in sweep_xirrs(txns, period_prices)
+        ]
+
+    @property
+    def history(self) -> List[dict]:
+        history = parallel_map(self.get_history, self.commodities)
+        return [point for comm_history in history for point in comm_history]
+
+    def history_table(self, output_format: str):
+        return tabulate(
+            self.history,
+            headers="keys",
+            numalign="decimal",
+            floatfmt=",.4f",
+            tablefmt=output_format,
+        )
+
+    def history_csv(self):
+        fieldnames = ["comm", *XirrPoint.__dataclass_fields__]
+        history_io = StringIO()
+        writer = csv.DictWriter(history_io, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(self.history)
+        history_io.seek(0)
+        return history_io
+
+    def history_json(self):
+        return json.dumps(self.history, indent=2)
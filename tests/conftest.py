@@ -0,0 +1,22 @@
+from pathlib import Path
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    cache_path = tmp_path.joinpath("cache")
+    monkeypatch.setenv("HLEDGER_LOTS_CACHE_DIR", str(cache_path))
+    return cache_path
+
+
+@pytest.fixture(autouse=True)
+def backend():
+    from hledger_lots.hl import HledgerBackend, set_backend
+    from hledger_lots.journal import load_journal
+
+    hledger_backend = HledgerBackend()
+    set_backend(hledger_backend)
+    yield hledger_backend
+    set_backend(hledger_backend)
+    load_journal.cache_clear()
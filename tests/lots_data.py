@@ -43,10 +43,10 @@ expected_qtty_never_zero = [
 ]
 
 expected_qtty_never_zero_sell_some = [
-    AdjustedTxn(date='2022-01-06', price=35.0, base_cur='USD', qtty=4.0, acct='Acct1'),
-    AdjustedTxn(date='2022-01-08', price=20.0, base_cur='USD', qtty=2.0, acct='Acct1'),
-    AdjustedTxn(date='2022-01-09', price=30.0, base_cur='USD', qtty=4.0, acct='Acct1'),
-    AdjustedTxn(date='2022-01-11', price=25.0, base_cur='USD', qtty=1.0, acct='Acct1')
+    AdjustedTxn(date="2022-01-06", price=35.0, base_cur="USD", qtty=4.0, acct="Acct1"),
+    AdjustedTxn(date="2022-01-08", price=20.0, base_cur="USD", qtty=2.0, acct="Acct1"),
+    AdjustedTxn(date="2022-01-09", price=30.0, base_cur="USD", qtty=4.0, acct="Acct1"),
+    AdjustedTxn(date="2022-01-11", price=25.0, base_cur="USD", qtty=1.0, acct="Acct1"),
 ]
 
 
@@ -85,3 +85,83 @@ expected_qtty_reaches_zero_sell_all = [
     AdjustedTxn(date="2022-01-12", price=35.0, base_cur="USD", qtty=2.0, acct="Acct1"),
     AdjustedTxn(date="2022-01-14", price=20.0, base_cur="USD", qtty=3.0, acct="Acct1"),
 ]
+
+
+def hl_amount(commodity: str, mantissa: int, places: int, price=None):
+    return {
+        "acommodity": commodity,
+        "aquantity": {
+            "decimalMantissa": mantissa,
+            "decimalPlaces": places,
+            "floatingPoint": mantissa / 10**places,
+        },
+        "aprice": price,
+        "astyle": {
+            "ascommodityside": "R",
+            "ascommodityspaced": True,
+            "asdecimalpoint": ".",
+            "asdigitgroups": None,
+            "asprecision": places,
+        },
+    }
+
+
+def hl_price(tag: str, commodity: str, mantissa: int, places: int):
+    return {"tag": tag, "contents": hl_amount(commodity, mantissa, places)}
+
+
+def hl_txn(date: str, description: str, postings: list):
+    return {
+        "tcode": "",
+        "tcomment": "",
+        "tdate": date,
+        "tdate2": None,
+        "tdescription": description,
+        "tindex": 1,
+        "tpostings": [
+            {
+                "paccount": account,
+                "pamount": amounts,
+                "pbalanceassertion": None,
+                "pcomment": "",
+                "pdate": None,
+                "pdate2": None,
+                "poriginal": None,
+                "pstatus": "Unmarked",
+                "ptags": [],
+                "ptransaction_": "1",
+                "ptype": "RegularPosting",
+            }
+            for account, amounts in postings
+        ],
+        "tprecedingcomment": "",
+        "tsourcepos": [],
+        "tstatus": "Unmarked",
+        "ttags": [],
+    }
+
+
+hledger_print_json = [
+    hl_txn(
+        "2023-01-05",
+        "Buy AAPL",
+        [
+            (
+                "Asset:Stocks",
+                [hl_amount("AAPL", 3, 0, hl_price("UnitPrice", "USD", 52, 1))],
+            ),
+            ("Asset:Bank", [hl_amount("USD", -156, 1)]),
+        ],
+    ),
+    hl_txn(
+        "2023-01-10",
+        'Buy "BRL" {with} [brackets]',
+        [
+            (
+                "Asset:FOREX",
+                [hl_amount("BRL", 55, 0, hl_price("TotalPrice", "USD", 10, 0))],
+            ),
+            ("Asset:Bank", [hl_amount("USD", -10, 0)]),
+        ],
+    ),
+]
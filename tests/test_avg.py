@@ -1,4 +1,12 @@
-from hledger_lots.avg import get_avg_cost, avg_sell, AvgCost
+import random
+from fractions import Fraction
+
+import pytest
+
+from hledger_lots import avg
+from hledger_lots.avg import AvgBook, get_avg_cost, avg_sell, AvgCost
+from hledger_lots.lib import AdjustedTxn, CostMethodError, Txn
+from hledger_lots.txn_columns import TxnColumns
 from datetime import date
 from . import lots_data
 
@@ -147,3 +155,208 @@ class TestAvgSell:
 """
 
         assert test == expected
+
+
+class TestExact:
+    def test_parity(self):
+        for txns in [
+            lots_data.txns_only_buying,
+            lots_data.txns_qtty_never_zero,
+            lots_data.txns_qtty_reaches_zero,
+        ]:
+            expected = get_avg_cost(txns, False)
+            result = get_avg_cost(txns, False, exact=True)
+
+            assert [avg.total_qtty for avg in result] == [
+                avg.total_qtty for avg in expected
+            ]
+            assert [avg.avg_cost for avg in result] == pytest.approx(
+                [avg.avg_cost for avg in expected]
+            )
+
+    def test_sell_check(self):
+        txns = TxnColumns.from_txns(
+            [
+                Txn("2022-01-01", 10, "USD", 3, "Acct1", "UnitPrice", (3, 0, 10, 0)),
+                Txn("2022-01-02", 20, "USD", 3, "Acct1", "UnitPrice", (3, 0, 20, 0)),
+                Txn("2022-01-03", 15, "USD", -1, "Acct1", "UnitPrice", (-1, 0, 15, 0)),
+            ]
+        )
+        assert get_avg_cost(txns, True, exact=True)[-1].avg_cost == 15
+
+        txns.append("2022-01-04", 15.2, "USD", -1, "Acct1", (-1, 0, 152, 1))
+        with pytest.raises(CostMethodError):
+            get_avg_cost(txns, True, exact=True)
+
+
+class TestAvgBook:
+    txns = lots_data.txns_qtty_never_zero
+
+    def test_apply(self):
+        book = AvgBook()
+        for txn in self.txns:
+            book.apply(txn)
+
+        assert book.history == get_avg_cost(self.txns, False)
+
+    def test_preview_sell(self):
+        book = AvgBook.from_txns(self.txns)
+        history = book.history.copy()
+        cost = history[-1].avg_cost
+
+        assert book.preview_sell(5, "2022-02-01") == [
+            AdjustedTxn("2022-02-01", cost, "USD", 5, "")
+        ]
+        assert book.history == history
+
+        with pytest.raises(ValueError):
+            book.preview_sell(100, "2022-02-01")
+
+    def test_snapshot(self):
+        book = AvgBook.from_txns(self.txns)
+        snapshot = book.snapshot()
+        book.apply(AdjustedTxn("2022-02-01", 50.0, "USD", 10.0, "Acct1"))
+
+        assert snapshot.history == get_avg_cost(self.txns, False)
+        assert len(book.history) == len(self.txns) + 1
+        assert book.total_qtty == snapshot.total_qtty + 10
+
+    def test_realized(self):
+        book = AvgBook.from_txns(lots_data.txns_qtty_never_zero[:4], realized=True)
+
+        [gain] = book.realized
+        cost = 3 * 300 / 14
+
+        assert (gain.sell_date, gain.buy_date, gain.days) == ("2022-01-04", None, None)
+        assert (gain.qtty, gain.proceeds) == (3, 45)
+        assert gain.cost == pytest.approx(cost)
+        assert gain.gain == pytest.approx(45 - cost)
+
+    def test_exact_rescale(self):
+        book = AvgBook(exact=True)
+        book.apply(AdjustedTxn("2022-01-01", 10.0, "USD", 3.0, "Acct1"))
+        book.apply(AdjustedTxn("2022-01-02", 20.0, "USD", 0.25, "Acct1"))
+
+        assert book.total_qtty == 325
+        assert book.avg_cost == 10_769_230_769_231
+
+    def test_acct_available(self):
+        book = AvgBook(exact=True)
+        book.apply(AdjustedTxn("2022-01-01", 10.0, "USD", 3.0, "Acct1"))
+        book.apply(AdjustedTxn("2022-01-02", 20.0, "USD", 0.25, "Acct2"))
+
+        assert book.get_acct_available("Acct1") == 3
+        assert book.get_acct_available("Acct2") == Fraction(1, 4)
+        assert book.get_acct_cost("Acct2") == pytest.approx(35 / 13)
+
+        with pytest.raises(ValueError):
+            book.preview_sell(1, "2022-01-03", "Acct2")
+
+
+def get_loop_history(txns):
+    book = AvgBook()
+    for txn in txns:
+        book.apply(txn)
+    return book.history
+
+
+def get_random_txns(size: int, sell_all_every: int = 0):
+    rng = random.Random(size)
+    txns = []
+    qtty = 0.0
+    for i in range(size):
+        if sell_all_every and i % sell_all_every == sell_all_every - 1:
+            sell = -qtty
+        elif qtty > 1 and rng.random() < 0.4:
+            sell = -round(rng.uniform(0.01, qtty / 2), 2)
+        else:
+            sell = 0
+
+        if sell:
+            txns.append(AdjustedTxn("2022-01-01", 1.0, "USD", sell, "Acct1"))
+            qtty += sell
+        else:
+            buy = round(rng.uniform(0.5, 10), 2)
+            price = round(rng.uniform(10, 100), 2)
+            txns.append(AdjustedTxn("2022-01-01", price, "USD", buy, "Acct1"))
+            qtty += buy
+    return txns
+
+
+def assert_same_history(test, expected):
+    assert len(test) == len(expected)
+    for test_cost, expected_cost in zip(test, expected):
+        assert test_cost.date == expected_cost.date
+        assert test_cost.total_qtty == expected_cost.total_qtty
+        assert test_cost.total_amount == pytest.approx(
+            expected_cost.total_amount, abs=1e-6
+        )
+        assert test_cost.avg_cost == pytest.approx(expected_cost.avg_cost, abs=1e-6)
+
+
+class TestScan:
+    @pytest.fixture(autouse=True)
+    def always_scan(self, monkeypatch):
+        pytest.importorskip("numpy")
+        monkeypatch.setattr(avg, "SCAN_THRESHOLD", 0)
+
+    def test_parity(self):
+        for txns in [
+            lots_data.txns_only_buying,
+            lots_data.txns_qtty_never_zero,
+            lots_data.txns_qtty_reaches_zero,
+        ]:
+            book = AvgBook.from_txns(txns)
+            assert book.scan is not None
+            assert_same_history([book.get_last()], get_loop_history(txns)[-1:])
+            assert_same_history(book.history, get_loop_history(txns))
+
+    @pytest.mark.parametrize("sell_all_every", [0, 50])
+    def test_random_parity(self, sell_all_every: int):
+        txns = get_random_txns(5000, sell_all_every)
+        book = AvgBook.from_txns(txns)
+        assert book.scan is not None
+        assert_same_history(book.history, get_loop_history(txns))
+
+    def test_short_sell_uses_loop(self):
+        txns = [
+            AdjustedTxn("2022-01-01", 10.0, "USD", 1.0, "Acct1"),
+            AdjustedTxn("2022-01-02", 10.0, "USD", -2.0, "Acct1"),
+        ]
+        book = AvgBook.from_txns(txns)
+
+        assert book.scan is None
+        assert book.history == get_loop_history(txns)
+
+    def test_check(self):
+        txns = [
+            *lots_data.txns_qtty_never_zero,
+            AdjustedTxn("2022-02-01", 10.0, "USD", -1.0, "Acct1"),
+        ]
+
+        with pytest.raises(CostMethodError):
+            AvgBook.from_txns(txns, check=True)
+
+    def test_balances(self):
+        txns = [
+            AdjustedTxn("2022-01-01", 10.0, "USD", 1.0, "Acct1"),
+            AdjustedTxn("2022-01-02", 10.0, "USD", 2.0, "Acct2"),
+            AdjustedTxn("2022-01-03", 10.0, "USD", -0.5, "Acct2"),
+        ]
+        book = AvgBook.from_txns(txns)
+
+        assert book.get_accts_available() == {"Acct1": 1, "Acct2": 1.5}
+
+    def test_apply_after_scan(self):
+        book = AvgBook.from_txns(lots_data.txns_qtty_never_zero)
+        snapshot = book.snapshot()
+        book.apply(AdjustedTxn("2022-02-01", 50.0, "USD", 10.0, "Acct1"))
+
+        txns = [
+            *lots_data.txns_qtty_never_zero,
+            AdjustedTxn("2022-02-01", 50.0, "USD", 10.0, "Acct1"),
+        ]
+        assert_same_history(book.history, get_loop_history(txns))
+        assert_same_history(
+            snapshot.history, get_loop_history(lots_data.txns_qtty_never_zero)
+        )
@@ -0,0 +1,101 @@
+from pathlib import Path
+from typing import Tuple
+
+import pytest
+
+from hledger_lots.cache import TxnCache, get_includes
+from hledger_lots.lib import AdjustedTxn
+
+from . import lots_data
+
+
+@pytest.fixture()
+def journals(tmp_path: Path) -> Tuple[str, ...]:
+    main = tmp_path.joinpath("main.journal")
+    main.write_text("include 2023.journal\ninclude other/*.journal  ; comment\n")
+
+    tmp_path.joinpath("2023.journal").write_text("2023-01-01 Buy\n")
+    tmp_path.joinpath("other").mkdir()
+    tmp_path.joinpath("other", "a.journal").write_text("P 2023-01-01 AAPL 10 USD\n")
+    return (str(main),)
+
+
+class TestGetIncludes:
+    def test_includes(self, journals: Tuple[str, ...], tmp_path: Path):
+        files, patterns = get_includes(journals[0])
+
+        assert sorted(files) == [
+            str(tmp_path.joinpath("2023.journal")),
+            str(tmp_path.joinpath("other", "a.journal")),
+        ]
+        assert len(patterns) == 2
+
+
+class TestTxnCache:
+    txns = lots_data.txns_only_buying
+
+    def test_round_trip(self, journals: Tuple[str, ...], cache_dir: Path):
+        TxnCache(journals).put(self.txns, "txns", "AAPL")
+
+        assert TxnCache(journals).get("txns", "AAPL") == self.txns
+        assert TxnCache(journals).get("txns", "GOOG") is None
+
+    def test_journal_changed(self, journals: Tuple[str, ...]):
+        TxnCache(journals).put(self.txns, "txns", "AAPL")
+
+        with open(journals[0], "a") as f:
+            f.write("\n")
+
+        assert TxnCache(journals).get("txns", "AAPL") is None
+
+    def test_include_changed(self, journals: Tuple[str, ...], tmp_path: Path):
+        TxnCache(journals).put(self.txns, "txns", "AAPL")
+
+        with open(tmp_path.joinpath("2023.journal"), "a") as f:
+            f.write("    Asset:Stocks  1 AAPL @ 10 USD\n")
+
+        assert TxnCache(journals).get("txns", "AAPL") is None
+
+    def test_include_glob_new_file(self, journals: Tuple[str, ...], tmp_path: Path):
+        TxnCache(journals).put(self.txns, "txns", "AAPL")
+        tmp_path.joinpath("other", "b.journal").write_text("")
+
+        assert TxnCache(journals).get("txns", "AAPL") is None
+
+    def test_eviction(self, journals: Tuple[str, ...], cache_dir: Path):
+        cache = TxnCache(journals)
+        cache.put(self.txns, "txns", "AAPL")
+        entry_size = cache.get_path("txns", "AAPL").stat().st_size
+
+        small_cache = TxnCache(journals, max_size=entry_size * 2)
+        for cur in ["GOOG", "MSFT", "TSLA"]:
+            small_cache.put(self.txns, "txns", cur)
+
+        entries = list(cache_dir.glob("*.pickle"))
+        assert len(entries) == 2
+        assert small_cache.get("txns", "AAPL") is None
+        assert small_cache.get("txns", "TSLA") == self.txns
+
+    def test_disabled(self, journals: Tuple[str, ...], cache_dir: Path):
+        cache = TxnCache(journals, max_size=0)
+        cache.put(self.txns, "txns", "AAPL")
+
+        assert not cache_dir.exists()
+        assert cache.get("txns", "AAPL") is None
+
+    def test_missing_file(self, tmp_path: Path):
+        cache = TxnCache((str(tmp_path.joinpath("missing.journal")),))
+        assert not cache.enabled
+
+    def test_get_or_set(self, journals: Tuple[str, ...]):
+        calls = []
+
+        def read():
+            calls.append(1)
+            return [AdjustedTxn("2023-01-01", 1.0, "USD", 1.0, "Acct")]
+
+        first = TxnCache(journals).get_or_set(read, "txns", "AAPL")
+        second = TxnCache(journals).get_or_set(read, "txns", "AAPL")
+
+        assert first == second
+        assert len(calls) == 1
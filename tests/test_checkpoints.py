@@ -0,0 +1,63 @@
+import pytest
+
+from hledger_lots.avg import AvgBook, get_avg_cost
+from hledger_lots.checkpoints import Checkpoints, get_every
+from hledger_lots.fifo import FifoBook
+from hledger_lots.lib import AdjustedTxn
+from hledger_lots.txn_columns import TxnColumns
+
+from . import lots_data
+
+
+def get_until(txns, date_str: str) -> TxnColumns:
+    columns = TxnColumns.from_txns(txns)
+    return columns.take(i for i, txn in enumerate(columns) if txn.date <= date_str)
+
+
+class TestCheckpoints:
+    txns = lots_data.txns_qtty_reaches_zero
+    dates = ["2021-12-31", "2022-01-01", "2022-01-04", "2022-01-08", "2022-02-01"]
+
+    @pytest.mark.parametrize("every", [1, 2, 3, 100])
+    def test_fifo_as_of(self, every: int):
+        points = Checkpoints(FifoBook, self.txns, every=every)
+
+        for date_str in self.dates:
+            expected = FifoBook.from_txns(get_until(self.txns, date_str)).get_lots()
+            assert points.as_of(date_str).get_lots() == expected
+
+    @pytest.mark.parametrize("every", [1, 3])
+    def test_avg_as_of(self, every: int):
+        points = Checkpoints(AvgBook, self.txns, every=every)
+
+        for date_str in self.dates:
+            expected = get_avg_cost(get_until(self.txns, date_str), False)
+            assert points.as_of(date_str).history == expected
+
+    def test_checkpoints(self):
+        points = Checkpoints(FifoBook, self.txns, every=4)
+
+        assert points.positions == [0, 4, 8, 12, 15]
+        assert len(points.books) == len(points.dates)
+
+    def test_as_of_doesnt_change_checkpoint(self):
+        points = Checkpoints(FifoBook, self.txns, every=4)
+        lots = points.books[1].get_lots()
+        points.as_of("2022-02-01")
+
+        assert points.books[1].get_lots() == lots
+
+    def test_unsorted(self):
+        txns = [
+            AdjustedTxn("2022-01-02", 10.0, "USD", 1.0, "Acct1"),
+            AdjustedTxn("2022-01-01", 20.0, "USD", 2.0, "Acct1"),
+            AdjustedTxn("2022-01-03", 30.0, "USD", 1.0, "Acct1"),
+        ]
+        points = Checkpoints(AvgBook, txns, every=1)
+
+        assert not points.is_sorted
+        assert points.as_of("2022-01-01").get_available() == 2
+
+    def test_every(self):
+        assert get_every(10) == 256
+        assert get_every(100_000) == 1563
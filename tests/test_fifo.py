@@ -1,4 +1,19 @@
+import tracemalloc
+from datetime import date
+from fractions import Fraction
+from pathlib import Path
+
+import pytest
+
 from hledger_lots import fifo
+from hledger_lots.fifo_info import FifoInfo
+from hledger_lots.hl import set_backend
+from hledger_lots.journal import NativeBackend, load_journal
+from hledger_lots.lib import AdjustedTxn, CostMethodError, Txn
+from hledger_lots.lot_book import RealizedGain
+from hledger_lots.lot_methods import COMPACT_MIN
+from hledger_lots.realized import AllRealized
+from hledger_lots.txn_columns import TxnColumns
 
 from . import lots_data
 
@@ -23,6 +38,78 @@ class TestGetLots:
         )
 
 
+class TestFifoBook:
+    def test_same_date_buy_listed_after_sell(self):
+        txns = [
+            AdjustedTxn("2022-01-01", 10.0, "USD", 1.0, "Acct1"),
+            AdjustedTxn("2022-01-02", 10.0, "USD", -2.0, "Acct1"),
+            AdjustedTxn("2022-01-02", 20.0, "USD", 3.0, "Acct1"),
+        ]
+
+        assert fifo.get_lots(txns, False) == [
+            AdjustedTxn("2022-01-01", 10.0, "USD", 0, "Acct1"),
+            AdjustedTxn("2022-01-02", 20.0, "USD", 2.0, "Acct1"),
+        ]
+
+    def test_short_sell(self):
+        txns = [
+            AdjustedTxn("2022-01-01", 10.0, "USD", 1.0, "Acct1"),
+            AdjustedTxn("2022-01-02", 10.0, "USD", -2.0, "Acct1"),
+            AdjustedTxn("2022-01-03", 20.0, "USD", 3.0, "Acct1"),
+        ]
+
+        with pytest.raises(ValueError):
+            fifo.get_lots(txns, False)
+
+    def test_depleted_lots_leave_queue(self):
+        book = fifo.FifoBook.from_txns(lots_data.txns_qtty_reaches_zero)
+
+        order = book.acct_orders[0]
+        assert list(order.queue[order.head :]) == [6, 7]
+        assert len(book.buys) == 8
+        assert book.remaining == 5
+
+    def test_apply(self):
+        txns = lots_data.txns_qtty_never_zero
+        book = fifo.FifoBook()
+        for txn in txns:
+            book.apply(txn)
+
+        assert book.get_lots() == fifo.get_lots(txns, False)
+
+    def test_apply_older(self):
+        book = fifo.FifoBook.from_txns(lots_data.txns_qtty_never_zero)
+
+        with pytest.raises(ValueError):
+            book.apply(AdjustedTxn("2022-01-01", 10.0, "USD", 1.0, "Acct1"))
+
+    def test_apply_doesnt_change_input(self):
+        columns = TxnColumns.from_txns(lots_data.txns_qtty_never_zero)
+        book = fifo.FifoBook.from_txns(columns)
+        book.apply(AdjustedTxn("2022-02-01", 10.0, "USD", 1.0, "Acct1"))
+
+        assert columns == lots_data.txns_qtty_never_zero
+        assert len(book.get_lots()) == len(lots_data.expected_qtty_never_zero) + 1
+
+    def test_snapshot(self):
+        book = fifo.FifoBook.from_txns(lots_data.txns_qtty_never_zero)
+        snapshot = book.snapshot()
+        book.apply(AdjustedTxn("2022-02-01", 10.0, "USD", -5.0, "Acct1"))
+
+        assert snapshot.get_lots() == lots_data.expected_qtty_never_zero
+        assert book.get_lots().get_total_qtty() == 17
+
+    def test_sell_lots_skip_later_buys(self):
+        book = fifo.FifoBook.from_txns(lots_data.txns_qtty_never_zero)
+
+        assert book.preview_sell(7, "2022-01-10") == [
+            AdjustedTxn("2022-01-06", 35.0, "USD", 4.0, "Acct1"),
+            AdjustedTxn("2022-01-08", 20.0, "USD", 2.0, "Acct1"),
+            AdjustedTxn("2022-01-09", 30.0, "USD", 1.0, "Acct1"),
+        ]
+        assert book.get_lots().get_total_qtty() == 22
+
+
 class TestGetSellLots:
     def test_sell_all(self):
         sell_lots = fifo.get_sell_lots(
@@ -52,7 +139,8 @@ class TestTxn2Hl:
     def test_txn2hl_profit(self):
         cur = "USD"
         test = fifo.txn2hl(
-            self.txns, self.date, cur, self.cash_account, self.revenue_account, 160)
+            self.txns, self.date, cur, self.cash_account, self.revenue_account, 160
+        )
 
         expected = """2022-02-01 Sold USD  ; cost_method:fifo
     ; commodity:USD, qtty:5.00, price:32.00
@@ -83,3 +171,421 @@ class TestTxn2Hl:
 """
 
         assert test == expected
+
+
+class TestExact:
+    def test_parity(self):
+        for txns in [
+            lots_data.txns_only_buying,
+            lots_data.txns_qtty_never_zero,
+            lots_data.txns_qtty_reaches_zero,
+        ]:
+            assert fifo.get_lots(txns, False, exact=True) == fifo.get_lots(txns, False)
+
+    def test_partial_sells(self):
+        txns = [
+            AdjustedTxn("2022-01-01", 10.0, "USD", 1.0, "Acct1"),
+            *[AdjustedTxn("2022-01-02", 10.0, "USD", -0.1, "Acct1")] * 10,
+        ]
+
+        assert fifo.get_lots(txns, False).qttys[0] != 0
+
+        lots = fifo.get_lots(txns, False, exact=True)
+        assert lots.qttys[0] == 0
+        assert lots.qtty_mantissas[0] == 0
+
+    def test_total_price_check(self):
+        buy = Txn("2022-01-01", 100, "USD", 3, "Acct1", "TotalPrice", (3, 0, 100, 0))
+        sell = Txn(
+            "2022-01-02", 33.33, "USD", -1, "Acct1", "UnitPrice", (-1, 0, 3333, 2)
+        )
+        wrong = Txn(
+            "2022-01-02", 33.4, "USD", -1, "Acct1", "UnitPrice", (-1, 0, 334, 1)
+        )
+
+        lots = fifo.get_lots(TxnColumns.from_txns([buy, sell]), True, exact=True)
+        assert lots.get_exact_qtty() == 2
+
+        with pytest.raises(CostMethodError):
+            fifo.get_lots(TxnColumns.from_txns([buy, sell, wrong]), True, exact=True)
+
+    def test_sell_lots(self):
+        sell_lots = fifo.get_sell_lots(
+            lots_data.txns_qtty_never_zero, "2022-02-01", 11, False, exact=True
+        )
+        assert sell_lots == lots_data.expected_qtty_never_zero_sell_some
+
+
+class TestLotMethods:
+    txns = [
+        AdjustedTxn("2022-01-01", 10.0, "USD", 1.0, "Acct1"),
+        AdjustedTxn("2022-01-02", 30.0, "USD", 1.0, "Acct1"),
+        AdjustedTxn("2022-01-03", 20.0, "USD", 1.0, "Acct1"),
+        AdjustedTxn("2022-01-04", 20.0, "USD", -1.5, "Acct1"),
+    ]
+
+    def get_prices(self, method: str):
+        lots = fifo.get_lots(self.txns, False, method=method)
+        return [(lot.price, lot.qtty) for lot in lots]
+
+    def test_lifo(self):
+        assert self.get_prices("lifo") == [(10, 1), (30, 0.5), (20, 0)]
+
+    def test_hifo(self):
+        assert self.get_prices("hifo") == [(10, 1), (30, 0), (20, 0.5)]
+
+    def test_lofo(self):
+        assert self.get_prices("lofo") == [(10, 0), (30, 1), (20, 0.5)]
+
+    # The sale names each lot it takes in the buy_date tag of its postings
+    specific_txns = [
+        *txns[:3],
+        Txn("2022-01-04", 20.0, "USD", -1.0, "Acct1", "UnitPrice", None, "2022-01-03"),
+        Txn("2022-01-04", 10.0, "USD", -0.5, "Acct1", "UnitPrice", None, "2022-01-01"),
+    ]
+
+    def test_specific(self):
+        lots = fifo.get_lots(self.specific_txns, True, method="specific")
+        assert [(lot.price, lot.qtty) for lot in lots] == [(10, 0.5), (30, 1), (20, 0)]
+
+    def test_specific_check(self):
+        sell = Txn(
+            "2022-01-05", 25.0, "USD", -1.0, "Acct1", "UnitPrice", None, "2022-01-02"
+        )
+
+        with pytest.raises(CostMethodError):
+            fifo.get_lots([*self.txns[:3], sell], True, method="specific")
+
+    @pytest.mark.parametrize(
+        "buy_date,match",
+        [("2022-01-05", "No open lot bought on 2022-01-05"), (None, "buy_date tag")],
+    )
+    def test_specific_missing_lot(self, buy_date, match: str):
+        sell = Txn(
+            "2022-01-05", 10.0, "USD", -1.0, "Acct1", "UnitPrice", None, buy_date
+        )
+
+        with pytest.raises(ValueError, match=match):
+            fifo.get_lots([*self.txns[:3], sell], False, method="specific")
+
+    def test_specific_depleted_lot(self):
+        sell = self.specific_txns[-1]
+
+        with pytest.raises(ValueError, match="No open lot bought on 2022-01-01"):
+            fifo.get_lots([*self.specific_txns, sell, sell], False, method="specific")
+
+    def test_specific_journal(self, tmp_path: Path):
+        set_backend(NativeBackend())
+        lots = [AdjustedTxn("2022-01-02", 30.0, "USD", 1.0, "Acct1")]
+        sell_hl = fifo.txn2hl(lots, "2022-01-04", "AAPL", "Bank", "Revenue", 40)
+        file_path = tmp_path.joinpath("data.journal")
+        file_path.write_text(
+            "".join(
+                f"{txn.date} Buy AAPL\n    Acct1    {txn.qtty} AAPL @ {txn.price} USD\n"
+                f"    Bank\n\n"
+                for txn in self.txns[:3]
+            )
+            + sell_hl
+        )
+        fifo_info = FifoInfo((str(file_path),), "AAPL", True, method="specific")
+
+        assert [(lot.price, lot.qtty) for lot in fifo_info.lots] == [
+            (10, 1),
+            (30, 0),
+            (20, 1),
+        ]
+
+    def test_method_check(self):
+        txns = [*self.txns[:3], AdjustedTxn("2022-01-04", 30.0, "USD", -1.0, "Acct1")]
+
+        assert fifo.get_lots(txns, True, method="hifo").get_total_qtty() == 2
+        with pytest.raises(CostMethodError):
+            fifo.get_lots(txns, True, method="lofo")
+
+    def test_preview_sell(self):
+        book = fifo.FifoBook.from_txns(self.txns[:3], method="hifo")
+
+        assert book.preview_sell(1.5, "2022-01-02") == [
+            AdjustedTxn("2022-01-02", 30.0, "USD", 1.0, "Acct1"),
+            AdjustedTxn("2022-01-01", 10.0, "USD", 0.5, "Acct1"),
+        ]
+
+    def test_snapshot(self):
+        book = fifo.FifoBook.from_txns(self.txns[:3], method="lifo")
+        snapshot = book.snapshot()
+        book.apply(self.txns[3])
+
+        assert snapshot.preview_sell(1, "2022-01-04")[0].price == 20
+        assert book.preview_sell(1, "2022-01-04")[0].price == 30
+
+    def test_exact_parity(self):
+        for method in ["lifo", "hifo", "lofo", "specific"]:
+            txns = self.specific_txns if method == "specific" else self.txns
+            assert fifo.get_lots(txns, False, True, method) == fifo.get_lots(
+                txns, False, method=method
+            )
+
+
+class TestAccounts:
+    txns = [
+        AdjustedTxn("2022-01-01", 10.0, "USD", 2.0, "Acct1"),
+        AdjustedTxn("2022-01-02", 20.0, "USD", 2.0, "Acct2"),
+        AdjustedTxn("2022-01-03", 30.0, "USD", 2.0, "Acct1"),
+        AdjustedTxn("2022-01-04", 20.0, "USD", -1.0, "Acct2"),
+    ]
+
+    def test_sell_takes_own_account(self):
+        assert fifo.get_lots(self.txns, True) == [
+            AdjustedTxn("2022-01-01", 10.0, "USD", 2.0, "Acct1"),
+            AdjustedTxn("2022-01-02", 20.0, "USD", 1.0, "Acct2"),
+            AdjustedTxn("2022-01-03", 30.0, "USD", 2.0, "Acct1"),
+        ]
+
+    def test_short_sell(self):
+        txns = [*self.txns, AdjustedTxn("2022-01-05", 20.0, "USD", -6.0, "Acct2")]
+
+        with pytest.raises(ValueError):
+            fifo.get_lots(txns, False)
+
+    def test_sell_transferred_lots(self):
+        # 2 Acct1 lots were transferred to Acct3 without price, so the journal
+        # only shows the sale in Acct3
+        txns = [
+            *self.txns,
+            AdjustedTxn("2022-01-05", 10.0, "USD", -1.0, "Acct3"),
+            AdjustedTxn("2022-01-06", 20.0, "USD", -1.0, "Acct2"),
+            AdjustedTxn("2022-01-06", 10.0, "USD", -1.0, "Acct3"),
+        ]
+        book = fifo.FifoBook.from_txns(txns, True)
+
+        assert book.get_lots() == [
+            AdjustedTxn("2022-01-01", 10.0, "USD", 0.0, "Acct1"),
+            AdjustedTxn("2022-01-02", 20.0, "USD", 0.0, "Acct2"),
+            AdjustedTxn("2022-01-03", 30.0, "USD", 2.0, "Acct1"),
+        ]
+        assert book.get_accts_available() == {"Acct1": 2}
+        assert book.get_acct_cost("Acct1") == 60
+        assert book.get_total_cost() == 60
+
+    def test_available_and_cost(self):
+        book = fifo.FifoBook.from_txns(self.txns)
+        book.apply(AdjustedTxn("2022-01-05", 10.0, "USD", -3.0, "Acct1"))
+
+        assert book.get_accts_available() == {"Acct1": 1, "Acct2": 1}
+        assert book.get_acct_cost("Acct1") == 30
+        assert book.get_acct_cost("Acct2") == 20
+        assert book.get_acct_cost("Acct3") == 0
+
+    def test_preview_sell_account(self):
+        book = fifo.FifoBook.from_txns(self.txns)
+
+        assert book.preview_sell(2, "2022-01-05", "Acct1") == [
+            AdjustedTxn("2022-01-01", 10.0, "USD", 2.0, "Acct1"),
+        ]
+        assert book.preview_sell(3, "2022-01-05")[1].acct == "Acct2"
+
+        # As sell does, the lots short in Acct2 are taken from the other accounts
+        assert book.preview_sell(2, "2022-01-05", "Acct2") == [
+            AdjustedTxn("2022-01-02", 20.0, "USD", 1.0, "Acct2"),
+            AdjustedTxn("2022-01-01", 10.0, "USD", 1.0, "Acct1"),
+        ]
+        with pytest.raises(ValueError):
+            book.preview_sell(6, "2022-01-05", "Acct2")
+
+    def test_exact_cost(self):
+        book = fifo.FifoBook.from_txns(self.txns, exact=True)
+        book.apply(AdjustedTxn("2022-01-05", 10.0, "USD", -0.5, "Acct1"))
+
+        assert book.get_acct_available("Acct1") == Fraction(7, 2)
+        assert book.get_acct_cost("Acct1") == 75
+
+
+class TestTransfers:
+    journal = """2023-01-05 Buy AAPL
+    Broker:A    3 AAPL @ 5 USD
+    Asset:Bank
+
+2023-02-01 Transfer AAPL
+    Broker:A    -2 AAPL
+    Broker:B    2 AAPL
+
+2023-03-01 Sell AAPL
+    Broker:B    -2 AAPL @ 5 USD
+    Asset:Bank    12 USD
+    Revenue:Gains
+"""
+
+    def test_sell_after_transfer(self, tmp_path: Path):
+        set_backend(NativeBackend())
+        file_path = tmp_path.joinpath("data.journal")
+        file_path.write_text(self.journal)
+        fifo_info = FifoInfo((str(file_path),), "AAPL", True)
+
+        assert fifo_info.lots == [AdjustedTxn("2023-01-05", 5, "USD", 1, "Broker:A")]
+        assert fifo_info.book.get_accts_available() == {"Broker:A": 1}
+
+    def test_preview_after_transfer(self, tmp_path: Path):
+        set_backend(NativeBackend())
+        file_path = tmp_path.joinpath("data.journal")
+        file_path.write_text(self.journal.split("2023-03-01")[0])
+        book = FifoInfo((str(file_path),), "AAPL", True).book
+
+        assert book.get_sell_available("Broker:B") == 3
+        assert book.preview_sell(2, "2023-03-01", "Broker:B") == [
+            AdjustedTxn("2023-01-05", 5, "USD", 2, "Broker:A")
+        ]
+
+
+class TestRealized:
+    txns = [
+        *TestAccounts.txns,
+        AdjustedTxn("2022-01-05", 25.0, "USD", -3.0, "Acct1"),
+    ]
+
+    def test_gain_per_lot(self):
+        book = fifo.FifoBook.from_txns(self.txns, realized=True)
+
+        assert book.realized == [
+            RealizedGain("2022-01-04", "2022-01-02", "Acct2", 1, 20, 20, 0, 2, "USD"),
+            RealizedGain("2022-01-05", "2022-01-01", "Acct1", 2, 20, 50, 30, 4, "USD"),
+            RealizedGain("2022-01-05", "2022-01-03", "Acct1", 1, 30, 25, -5, 2, "USD"),
+        ]
+
+    def test_off_by_default(self):
+        assert fifo.FifoBook.from_txns(self.txns).realized is None
+
+    def test_matches_lot_method(self):
+        book = fifo.FifoBook.from_txns(self.txns, method="hifo", realized=True)
+
+        assert [gain.buy_date for gain in book.realized] == [
+            "2022-01-02",
+            "2022-01-03",
+            "2022-01-01",
+        ]
+
+    def test_exact(self):
+        txns = [*self.txns, AdjustedTxn("2022-01-06", 10.0, "USD", -0.5, "Acct1")]
+        book = fifo.FifoBook.from_txns(txns, exact=True, realized=True)
+
+        assert book.realized[-1] == RealizedGain(
+            "2022-01-06", "2022-01-03", "Acct1", 0.5, 15, 5, -10, 3, "USD"
+        )
+
+    def test_snapshot(self):
+        book = fifo.FifoBook.from_txns(self.txns[:4], realized=True)
+        snapshot = book.snapshot()
+        book.apply(self.txns[4])
+
+        assert len(snapshot.realized) == 1
+        assert len(book.realized) == 3
+
+    journal = """2023-01-05 Buy AAPL
+    Broker    2 AAPL @ 5 USD
+    Asset:Bank
+
+2023-01-20 Buy AAPL
+    Broker    2 AAPL @ 8 USD
+    Asset:Bank
+"""
+
+    @pytest.mark.parametrize("exact", [False, True])
+    @pytest.mark.parametrize("value,proceeds", [(30, [20, 10]), (12, [8, 4])])
+    def test_sell_output(
+        self, tmp_path: Path, exact: bool, value: float, proceeds: list
+    ):
+        set_backend(NativeBackend())
+        file_path = tmp_path.joinpath("data.journal")
+        file_path.write_text(self.journal)
+        journals = (str(file_path),)
+        lots = FifoInfo(journals, "AAPL", True).book.preview_sell(3, "2023-03-01")
+        sell_txn = fifo.txn2hl(
+            lots, "2023-03-01", "AAPL", "Asset:Bank", "Revenue:Gains", value
+        )
+        with open(file_path, "a") as f:
+            f.write(f"\n{sell_txn}")
+        load_journal.cache_clear()
+
+        gains = AllRealized(journals, "", True, False, exact).gains
+
+        assert [gain["cost"] for gain in gains] == [10, 8]
+        assert [gain["proceeds"] for gain in gains] == proceeds
+        assert [gain["gain"] for gain in gains] == [proceeds[0] - 10, proceeds[1] - 8]
+        assert [gain["days"] for gain in gains] == [55, 40]
+
+    def test_revenue_type(self, tmp_path: Path):
+        set_backend(NativeBackend())
+        file_path = tmp_path.joinpath("data.journal")
+        file_path.write_text(f"account Equity:Gains  ; type: R\n\n{self.journal}")
+        journals = (str(file_path),)
+        lots = FifoInfo(journals, "AAPL", True).book.preview_sell(3, "2023-03-01")
+        sell_txn = fifo.txn2hl(
+            lots, "2023-03-01", "AAPL", "Asset:Bank", "Equity:Gains:AAPL", 12
+        )
+        with open(file_path, "a") as f:
+            f.write(f"\n{sell_txn}")
+        load_journal.cache_clear()
+
+        gains = AllRealized(journals, "", True, False).gains
+
+        assert [gain["proceeds"] for gain in gains] == [8, 4]
+
+
+def get_long_txns(size: int) -> TxnColumns:
+    """Two accounts buying 3 and selling 1 every day"""
+    columns = TxnColumns()
+    start = date(2000, 1, 1).toordinal()
+    for i in range(size):
+        txn_date = date.fromordinal(start + i // 4).isoformat()
+        qtty = 3.0 if i % 4 < 2 else -1.0
+        columns.append_txn(
+            AdjustedTxn(txn_date, 10.0 + i % 7, "USD", qtty, f"Acct{i % 2}")
+        )
+    return columns
+
+
+class TestViews:
+    def test_lots_read_book(self):
+        book = fifo.FifoBook.from_txns(lots_data.txns_qtty_never_zero)
+        lots = book.get_lots()
+        book.apply(AdjustedTxn("2022-02-01", 10.0, "USD", -5.0, "Acct1"))
+
+        assert lots.get_total_qtty() == 17
+        assert lots[-1].qtty == 2
+        assert lots.dates[-1] == date(2022, 1, 15).toordinal()
+
+    def test_sell_lots_are_views(self):
+        book = fifo.FifoBook.from_txns(lots_data.txns_qtty_never_zero)
+        sell_lots = book.preview_sell(5, "2022-02-01")
+
+        assert all(isinstance(lot, fifo.LotView) for lot in sell_lots)
+        assert [lot.qtty for lot in sell_lots] == [4, 1]
+
+    def test_queue_drops_depleted_lots(self):
+        book = fifo.FifoBook()
+        start = date(2000, 1, 1).toordinal()
+        for day in range(500):
+            txn_date = date.fromordinal(start + day).isoformat()
+            book.apply(AdjustedTxn(txn_date, 10.0, "USD", 1.0, "Acct1"))
+            book.apply(AdjustedTxn(txn_date, 10.0, "USD", -1.0, "Acct1"))
+
+        assert len(book.acct_orders[0].queue) <= 2 * COMPACT_MIN + 2
+        assert book.get_lots().get_total_qtty() == 0
+
+
+class TestAllocations:
+    size = 20_000
+
+    @pytest.mark.parametrize("exact", [False, True])
+    @pytest.mark.parametrize("method", ["fifo", "lifo"])
+    def test_bytes_per_txn(self, exact: bool, method: str):
+        columns = get_long_txns(self.size)
+
+        tracemalloc.start()
+        try:
+            book = fifo.FifoBook.from_txns(columns, exact=exact, method=method)
+            book.get_lots().get_total_qtty()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        assert peak / self.size < 32
@@ -0,0 +1,169 @@
+import json
+import tracemalloc
+from datetime import date
+from io import StringIO
+from pathlib import Path
+from typing import Tuple
+
+import pytest
+
+from hledger_lots.avg import AvgBook
+from hledger_lots.fifo import FifoBook
+from hledger_lots.history import (
+    AllHistory,
+    HistoryRow,
+    get_period_end,
+    sweep_history,
+    write_csv,
+    write_json,
+    write_plain,
+)
+from hledger_lots.hl import set_backend
+from hledger_lots.journal import NativeBackend
+from hledger_lots.lib import AdjustedTxn
+from hledger_lots.txn_columns import TxnColumns, date2ordinal
+
+txns = [
+    AdjustedTxn("2023-01-05", 5.2, "USD", 3, "Asset:Stocks"),
+    AdjustedTxn("2023-03-05", 6, "USD", 2, "Asset:Stocks"),
+    AdjustedTxn("2023-04-05", 7, "USD", -1, "Asset:Stocks"),
+]
+
+prices = [
+    ("2023-01-20", 5.5),
+    ("2023-02-01", 6),
+    ("2023-02-15", 5.8),
+    ("2023-04-10", 7.2),
+]
+
+journal = """2023-01-05 Buy AAPL
+    Asset:Stocks    3 AAPL @ 5.2 USD
+    Asset:Bank
+
+2023-02-10 Buy BRL
+    Asset:FOREX    55 BRL @@ 10 USD
+    Asset:Bank
+
+P 2023-01-20 AAPL 5.5 USD
+P 2023-02-15 AAPL 5.8 USD
+"""
+
+
+@pytest.fixture()
+def journals(tmp_path: Path) -> Tuple[str, ...]:
+    set_backend(NativeBackend())
+    file_path = tmp_path.joinpath("data.journal")
+    file_path.write_text(journal)
+    return (str(file_path),)
+
+
+def get_rows(book_cls=FifoBook, period="monthly", end="2023-04-30"):
+    book = book_cls(txns=TxnColumns.from_txns(txns))
+    return list(sweep_history("AAPL", book, prices, period, date2ordinal(end)))
+
+
+class TestPeriodEnd:
+    @pytest.mark.parametrize(
+        "day,period,expected",
+        [
+            (date(2023, 1, 5), "daily", date(2023, 1, 5)),
+            (date(2023, 1, 5), "weekly", date(2023, 1, 8)),
+            (date(2023, 1, 8), "weekly", date(2023, 1, 8)),
+            (date(2024, 2, 10), "monthly", date(2024, 2, 29)),
+            (date(2023, 12, 31), "monthly", date(2023, 12, 31)),
+        ],
+    )
+    def test_period_end(self, day: date, period: str, expected: date):
+        assert get_period_end(day.toordinal(), period) == expected.toordinal()
+
+
+class TestSweepHistory:
+    def test_monthly(self):
+        rows = get_rows()
+
+        assert [row.date for row in rows] == [
+            "2023-01-31",
+            "2023-02-28",
+            "2023-03-31",
+            "2023-04-30",
+        ]
+        assert [row.qtty for row in rows] == [3, 3, 5, 4]
+        assert [row.mkt_price for row in rows] == [5.5, 5.8, 5.8, 7.2]
+        assert rows[-1].cost == pytest.approx(2 * 5.2 + 2 * 6)
+        assert rows[-1].unrealized == pytest.approx(4 * 7.2 - 22.4)
+
+    def test_avg_cost(self):
+        rows = get_rows(AvgBook)
+        assert rows[-1].cost == pytest.approx(4 * 27.6 / 5)
+
+    def test_no_price_yet(self):
+        rows = get_rows(period="weekly")
+
+        assert rows[0] == HistoryRow(
+            "2023-01-08", "AAPL", "USD", 3, pytest.approx(15.6), None, None, None
+        )
+        assert rows[2].mkt_price == 5.5
+
+    def test_nothing_held(self):
+        sold = [*txns, AdjustedTxn("2023-04-06", 7, "USD", -4, "Asset:Stocks")]
+        book = FifoBook(txns=TxnColumns.from_txns(sold))
+        rows = sweep_history("AAPL", book, prices, "daily", date2ordinal("2023-04-30"))
+
+        assert [row.date for row in rows][-1] == "2023-04-05"
+
+    def test_streams(self):
+        book = FifoBook(txns=TxnColumns.from_txns(txns))
+        rows = sweep_history("AAPL", book, prices, "daily", date2ordinal("2023-04-30"))
+
+        assert next(rows).date == "2023-01-05"
+        assert book.get_available() == 3
+
+    def test_memory_bounded(self):
+        columns = TxnColumns.from_txns(txns[:1])
+        end = date2ordinal("2073-01-01")
+
+        tracemalloc.start()
+        for _ in sweep_history("AAPL", FifoBook(txns=columns), prices, "daily", end):
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        assert peak < 64 * 1024
+
+
+class TestAllHistory:
+    def test_totals(self, journals: Tuple[str, ...]):
+        rows = list(AllHistory(journals, "", False, False).iter_rows())
+
+        assert [(row.date, row.comm) for row in rows] == [
+            ("2023-01-31", "AAPL"),
+            ("2023-01-31", "Total"),
+            ("2023-02-28", "AAPL"),
+            ("2023-02-28", "BRL"),
+            ("2023-02-28", "Total"),
+        ]
+        total = rows[-1]
+        assert total.qtty is None
+        assert total.cost == pytest.approx(25.6)
+        assert total.mkt_value == pytest.approx(3 * 5.8 + 10)
+        assert total.unrealized == pytest.approx(3 * 5.8 - 15.6)
+
+    def test_commodity(self, journals: Tuple[str, ...]):
+        history = AllHistory(journals, "", False, False, commodity="brl")
+        rows = list(history.iter_rows())
+
+        assert [(row.date, row.comm) for row in rows] == [("2023-02-28", "BRL")]
+
+    def test_writers(self, journals: Tuple[str, ...]):
+        history = AllHistory(journals, "", False, False)
+
+        csv_io, json_io, plain_io = StringIO(), StringIO(), StringIO()
+        write_csv(history.iter_rows(), csv_io)
+        write_json(history.iter_rows(), json_io)
+        write_plain(history.iter_rows(), plain_io)
+
+        csv_rows = csv_io.getvalue().splitlines()
+        assert csv_rows[0] == "date,comm,cur,qtty,cost,mkt_price,mkt_value,unrealized"
+        assert csv_rows[-1].startswith("2023-02-28,Total,USD,,25.6")
+        assert json.loads(json_io.getvalue())[3]["comm"] == "BRL"
+        assert len(plain_io.getvalue().splitlines()) == 6
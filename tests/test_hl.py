@@ -1,9 +1,18 @@
+import io
+import json
 from pathlib import Path
+from typing import Optional
 
 import pytest
 
 from hledger_lots.lib import AdjustedTxn, Txn
-from hledger_lots.hl import adjust_txn, hledger2txn
+from hledger_lots.hl import (
+    adjust_txn,
+    hledger2txn,
+    hledger2txns_by_cur,
+    iter_json_array,
+    txns_list2txns,
+)
 
 from . import lots_data
 
@@ -111,3 +120,71 @@ class TestHledger2Txn:
         file_tup = (str(file_path),)
 
         assert hledger2txn(file_tup, "BRL") == expected
+
+
+class TestHledger2TxnsByCur:
+    def test_partition(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr("sys.stdin", None)
+
+        file_path = tmp_path.joinpath("data.journal")
+        file_path.write_text(TestHledger2Txn.hl_txns)
+        file_tup = (str(file_path),)
+
+        txns_by_cur = hledger2txns_by_cur(file_tup)
+
+        assert set(txns_by_cur.keys()) == {"AAPL", "BRL"}
+        assert txns_by_cur["AAPL"] == hledger2txn(file_tup, "AAPL")
+        assert txns_by_cur["BRL"] == hledger2txn(file_tup, "BRL")
+
+    def test_no_desc(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr("sys.stdin", None)
+
+        file_path = tmp_path.joinpath("data.journal")
+        file_path.write_text(TestHledger2Txn.hl_txns)
+        file_tup = (str(file_path),)
+
+        txns_by_cur = hledger2txns_by_cur(file_tup, "Sell")
+
+        assert txns_by_cur["AAPL"] == hledger2txn(file_tup, "AAPL", "Sell")
+        assert len(txns_by_cur["AAPL"]) == 1
+
+
+class TestIterJsonArray:
+    @pytest.mark.parametrize("indent", [None, 4])
+    @pytest.mark.parametrize("chunk_size", [1, 3, 64, 1 << 16])
+    def test_elements(self, chunk_size: int, indent: Optional[int]):
+        raw = json.dumps(lots_data.hledger_print_json, indent=indent).encode()
+        elements = iter_json_array(io.BytesIO(raw), chunk_size)
+
+        assert [json.loads(element) for element in elements] == (
+            lots_data.hledger_print_json
+        )
+
+    def test_escaped_strings(self):
+        raw = '[{"a": "\\\\\\"}]"}, {"b": "é{"}]'.encode("utf8")
+        elements = list(iter_json_array(io.BytesIO(raw), 2))
+
+        assert [json.loads(element) for element in elements] == [
+            {"a": '\\"}]'},
+            {"b": "é{"},
+        ]
+
+    @pytest.mark.parametrize("raw", [b"[]", b"[\n]\n", b"  [ ]"])
+    def test_empty(self, raw: bytes):
+        assert list(iter_json_array(io.BytesIO(raw))) == []
+
+    def test_empty_elements(self):
+        raw = b"[\n    {},\n    {\n        \"a\": {}\n    }\n]"
+        elements = list(iter_json_array(io.BytesIO(raw), 5))
+
+        assert elements == [b"{}", b'{\n        "a": {}\n    }']
+
+
+class TestTxnsList2Txns:
+    def test_priced_postings(self):
+        txns = list(txns_list2txns(iter(lots_data.hledger_print_json)))
+
+        assert txns == [
+            ("AAPL", Txn("2023-01-05", 5.2, "USD", 3, "Asset:Stocks", "UnitPrice")),
+            ("BRL", Txn("2023-01-10", 10, "USD", 55, "Asset:FOREX", "TotalPrice")),
+        ]
@@ -4,8 +4,12 @@ from typing import Tuple
 
 import pytest
 
-from hledger_lots.fifo_info import FifoInfo
-from hledger_lots.avg_info import AvgInfo
+from hledger_lots import info
+from hledger_lots.fifo_info import AllFifoInfo, FifoInfo
+from hledger_lots.avg_info import AllAvgInfo, AvgInfo
+from hledger_lots.hl import set_backend
+from hledger_lots.journal import NativeBackend
+from hledger_lots.lib import get_xirrs
 import sys
 
 
@@ -114,4 +118,24 @@ class TestLotInfo:
     def test_avg_info(self, avg_info: AvgInfo):
         assert avg_info.get_info() == self.expected
 
-    
+
+class TestAllInfoXirr:
+    @pytest.fixture()
+    def xirr_calls(self, monkeypatch: pytest.MonkeyPatch):
+        set_backend(NativeBackend())
+        calls = []
+
+        def counted_xirrs(*args):
+            calls.append(args)
+            return get_xirrs(*args)
+
+        monkeypatch.setattr(info, "get_xirrs", counted_xirrs)
+        return calls
+
+    @pytest.mark.parametrize("all_info_cls", [AllFifoInfo, AllAvgInfo])
+    def test_one_batch(self, journals: Tuple[str, ...], xirr_calls, all_info_cls):
+        infos = all_info_cls(journals, "", False).infos
+        xirrs = {lots_info["comm"]: lots_info["xirr"] for lots_info in infos}
+
+        assert xirrs == {"AAPL": "6.2529%", "BRL": ""}
+        assert len(xirr_calls) == 1
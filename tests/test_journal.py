@@ -0,0 +1,348 @@
+import shutil
+from datetime import date
+from fractions import Fraction
+from pathlib import Path
+from typing import Tuple
+
+import pytest
+
+from hledger_lots.hl import (
+    HledgerBackend,
+    hledger2txn,
+    hledger2txns_by_cur,
+    set_backend,
+)
+from hledger_lots.journal import (
+    Journal,
+    JournalError,
+    NativeBackend,
+    load_journal,
+    parse_number,
+)
+from hledger_lots.lib import AdjustedTxn
+
+EXAMPLE_JOURNAL = Path(__file__).parent.parent.joinpath(
+    "docs", "examples", "data.journal"
+)
+
+hl_txns = """commodity 1.000,00 EUR
+commodity "PETR4.SA"  ; yahoo_ticker:PETR4.SA
+account Expenses:Unused
+
+2023-01-05 * (12) Buy AAPL  ; note
+    ; transaction comment
+    Asset:Stocks                                   3 AAPL @ 5.2 USD
+    Asset:Bank
+
+2023/01/10 Buy BRL
+    Asset:FOREX                                  55 BRL @@ 10 USD
+    Asset:Bank
+
+2023-01-05 Sell AAPL
+    Asset:Bank                                    20 BRL
+    * Asset:Stocks                                -1 AAPL @ $5.2  ; lot
+    Revenue:Capital Gain
+
+2023-01-12 opening balances
+    Asset:Stocks                    1.000,5 "PETR4.SA" @ 2,5 EUR = 1.000,5 "PETR4.SA"
+    Equity:Opening
+
+P 2023-01-20 AAPL 25 USD
+P 2023-01-05 AAPL 6 USD
+P 2023-01-21 USD 0.1 AAPL
+"""
+
+
+@pytest.fixture()
+def journals(tmp_path: Path) -> Tuple[str, ...]:
+    file_path = tmp_path.joinpath("data.journal")
+    file_path.write_text(hl_txns)
+    return (str(file_path),)
+
+
+class TestParseNumber:
+    @pytest.mark.parametrize(
+        "number,decimal_mark,expected",
+        [
+            ("10", None, (10, 0)),
+            ("5.2", None, (52, 1)),
+            ("1,000.25", None, (100025, 2)),
+            ("1.000,25", None, (100025, 2)),
+            ("1,000", None, (1000, 3)),
+            ("1,000", ".", (1000, 0)),
+            ("1.000.000", None, (1000000, 0)),
+            ("2,5", ",", (25, 1)),
+        ],
+    )
+    def test_parse_number(self, number: str, decimal_mark, expected):
+        assert parse_number(number, decimal_mark) == expected
+
+
+class TestJournal:
+    def test_txns_by_cur(self, journals: Tuple[str, ...]):
+        txns_by_cur = Journal(journals).get_txns_by_cur()
+
+        assert txns_by_cur == {
+            "AAPL": [
+                AdjustedTxn("2023-01-05", 5.2, "USD", 3, "Asset:Stocks"),
+                AdjustedTxn("2023-01-05", 5.2, "$", -1, "Asset:Stocks"),
+            ],
+            "BRL": [AdjustedTxn("2023-01-10", 10 / 55, "USD", 55, "Asset:FOREX")],
+            "PETR4.SA": [AdjustedTxn("2023-01-12", 2.5, "EUR", 1000.5, "Asset:Stocks")],
+        }
+
+    def test_exact_amounts(self, journals: Tuple[str, ...]):
+        txns_by_cur = Journal(journals).get_txns_by_cur()
+
+        assert txns_by_cur["BRL"].get_unit_price(0) == 181_818_181_818
+        assert txns_by_cur["PETR4.SA"].get_exact_qtty() == Fraction("1000.5")
+        assert txns_by_cur["PETR4.SA"].get_unit_price(0) == 2_500_000_000_000
+
+    def test_buy_date_tag(self, tmp_path: Path):
+        file_path = tmp_path.joinpath("data.journal")
+        file_path.write_text(hl_txns + """
+2023-02-01 Sold AAPL
+    Asset:Stocks    -1 AAPL @ 5.2 USD  ; buy_date:2023-01-05, base_cur:USD
+    Asset:Stocks    -1 AAPL @ 5.2 USD
+    ; buy_date:2023-01-06
+    Asset:Bank
+""")
+        aapl = Journal((str(file_path),)).get_txns_by_cur()["AAPL"]
+
+        assert [aapl.get_buy_date(i) for i in range(len(aapl))] == [
+            None,
+            None,
+            "2023-01-05",
+            "2023-01-06",
+        ]
+
+    def test_no_desc(self, journals: Tuple[str, ...]):
+        txns_by_cur = Journal(journals).get_txns_by_cur("sell|opening")
+
+        assert txns_by_cur["AAPL"] == [
+            AdjustedTxn("2023-01-05", 5.2, "USD", 3, "Asset:Stocks")
+        ]
+        assert "PETR4.SA" not in txns_by_cur
+
+    def test_description(self, journals: Tuple[str, ...]):
+        assert Journal(journals).txns[0].description == "Buy AAPL"
+
+    def test_commodities(self, journals: Tuple[str, ...]):
+        assert Journal(journals).get_commodities() == [
+            "$",
+            "AAPL",
+            "BRL",
+            "EUR",
+            "PETR4.SA",
+            "USD",
+        ]
+
+    def test_accounts(self, journals: Tuple[str, ...]):
+        journal = Journal(journals)
+
+        assert journal.get_accounts("AAPL") == ["Asset:Stocks"]
+        assert "Expenses:Unused" in journal.get_accounts()
+        assert "Equity:Opening" not in journal.get_accounts(no_desc="opening")
+
+    def test_last_purchase(self, journals: Tuple[str, ...]):
+        journal = Journal(journals)
+
+        assert journal.get_last_purchase("AAPL") == "2023-01-05"
+        assert journal.get_last_purchase("GOOG") is None
+
+    def test_include(self, journals: Tuple[str, ...], tmp_path: Path):
+        main = tmp_path.joinpath("main.journal")
+        main.write_text("include data.journal\n\nP 2023-02-01 AAPL 30 USD\n")
+
+        journal = Journal((str(main),))
+
+        assert len(journal.get_txns_by_cur()["AAPL"]) == 2
+        assert ("2023-02-01", "AAPL", 30, "USD") in journal.get_price_rows()
+        assert journal.files_read == [str(main), journals[0]]
+
+    def test_invalid_amount(self, tmp_path: Path):
+        file_path = tmp_path.joinpath("bad.journal")
+        file_path.write_text("2023-01-01 Bad\n    Asset:Stocks  3 AAPL @ five USD\n")
+
+        with pytest.raises(JournalError, match="bad.journal:2"):
+            Journal((str(file_path),))
+
+
+class TestNativeBackend:
+    @pytest.mark.parametrize(
+        "price", ["35 USD", "35USD", "USD 35", "USD35", "$35", "35.00 USD"]
+    )
+    def test_last_price(self, tmp_path: Path, price: str):
+        file_path = tmp_path.joinpath("prices.journal")
+        file_path.write_text(f"P 2023-01-05 AAPL 25 USD\nP 2023-02-01 AAPL {price}\n")
+
+        last_price = NativeBackend().read_last_price((str(file_path),), "AAPL")
+        assert last_price == (date(2023, 2, 1), 35)
+
+    def test_no_price(self, journals: Tuple[str, ...]):
+        assert NativeBackend().read_last_price(journals, "GOOG") == (None, None)
+
+
+new_txn = """
+2023-02-01 Buy AAPL again
+    Asset:Stocks       2 AAPL @ 7 USD
+    Asset:Bank
+"""
+
+
+class TestIncremental:
+    @pytest.fixture()
+    def builds(self, monkeypatch: pytest.MonkeyPatch):
+        counter = {"count": 0}
+        init = Journal.__init__
+
+        def counted_init(self, files):
+            counter["count"] += 1
+            init(self, files)
+
+        monkeypatch.setattr(Journal, "__init__", counted_init)
+        return counter
+
+    def load(self, files: Tuple[str, ...]) -> Journal:
+        load_journal.cache_clear()
+        return load_journal(files)
+
+    def assert_same_as_full(self, journal: Journal):
+        full = Journal(journal.files)
+        assert journal.get_txns_by_cur() == full.get_txns_by_cur()
+        assert journal.get_txns_by_cur("sell") == full.get_txns_by_cur("sell")
+        assert journal.get_price_rows() == full.get_price_rows()
+
+    def test_append(self, journals: Tuple[str, ...], builds: dict):
+        self.load(journals).get_txns_by_cur()
+        with open(journals[0], "a") as f:
+            f.write(new_txn + "\nP 2023-02-02 AAPL 8 USD\n")
+
+        journal = self.load(journals)
+
+        assert builds["count"] == 1
+        assert journal.get_txns_by_cur()["AAPL"][-1] == AdjustedTxn(
+            "2023-02-01", 7, "USD", 2, "Asset:Stocks"
+        )
+        assert journal.file_states[journals[0]].line == len(
+            Path(journals[0]).read_text().splitlines()
+        )
+        self.assert_same_as_full(journal)
+
+    def test_one_cache(self, journals: Tuple[str, ...], cache_dir: Path):
+        set_backend(NativeBackend())
+        hledger2txns_by_cur(journals)
+        hledger2txn(journals, "AAPL")
+
+        assert [path.name[:8] for path in cache_dir.glob("*.pickle")] == ["journal-"]
+
+    def test_unchanged(self, journals: Tuple[str, ...], builds: dict):
+        self.load(journals)
+        self.load(journals)
+
+        assert builds["count"] == 1
+
+    def test_append_older_date(self, journals: Tuple[str, ...], builds: dict):
+        self.load(journals).get_txns_by_cur()
+        with open(journals[0], "a") as f:
+            f.write(new_txn.replace("2023-02-01", "2023-01-05"))
+
+        journal = self.load(journals)
+
+        assert builds["count"] == 1
+        self.assert_same_as_full(journal)
+
+    def test_append_included_older_date(self, journals: Tuple[str, ...], builds: dict):
+        main = Path(journals[0]).parent.joinpath("main.journal")
+        main.write_text("include data.journal\n")
+        files = (str(main),)
+
+        self.load(files)
+        with open(journals[0], "a") as f:
+            f.write(new_txn.replace("2023-02-01", "2023-01-05"))
+
+        journal = self.load(files)
+
+        assert builds["count"] == 2
+        self.assert_same_as_full(journal)
+
+    def test_rewritten(self, journals: Tuple[str, ...], builds: dict):
+        self.load(journals)
+        text = Path(journals[0]).read_text()
+        Path(journals[0]).write_text(text.replace("3 AAPL", "30 AAPL"))
+
+        journal = self.load(journals)
+
+        assert builds["count"] == 2
+        assert journal.get_txns_by_cur()["AAPL"][0].qtty == 30
+
+    def test_continued_entry(self, journals: Tuple[str, ...], builds: dict):
+        self.load(journals)
+        with open(journals[0], "a") as f:
+            f.write("    Asset:Stocks   1 AAPL @ 5 USD\n")
+
+        self.load(journals)
+
+        assert builds["count"] == 2
+
+    def test_new_included_file(self, tmp_path: Path, builds: dict):
+        tmp_path.joinpath("2023.journal").write_text(new_txn)
+        main = tmp_path.joinpath("main.journal")
+        main.write_text("include 20*.journal\n")
+        files = (str(main),)
+
+        self.load(files)
+        tmp_path.joinpath("2024.journal").write_text(
+            new_txn.replace("2023-02-01", "2024-02-01")
+        )
+        journal = self.load(files)
+
+        assert builds["count"] == 2
+        assert len(journal.get_txns_by_cur()["AAPL"]) == 2
+
+
+@pytest.mark.skipif(shutil.which("hledger") is None, reason="hledger not installed")
+class TestDifferential:
+    @pytest.fixture(params=["example", "test"])
+    def diff_journals(self, request, journals: Tuple[str, ...]):
+        if request.param == "example":
+            return (str(EXAMPLE_JOURNAL),)
+        return journals
+
+    def test_txns(self, diff_journals: Tuple[str, ...]):
+        hledger = HledgerBackend()
+        native = NativeBackend()
+
+        for no_desc in [None, "sell"]:
+            native_txns = native.read_txns_by_cur(diff_journals, no_desc)
+            assert hledger.read_txns_by_cur(diff_journals, no_desc) == native_txns
+
+            for cur in native_txns:
+                assert hledger.read_txns(diff_journals, cur, no_desc) == (
+                    native.read_txns(diff_journals, cur, no_desc)
+                )
+
+    def test_prices(self, diff_journals: Tuple[str, ...]):
+        hledger = HledgerBackend()
+        native = NativeBackend()
+
+        for commodity in native.read_commodities(diff_journals):
+            assert hledger.read_last_price(diff_journals, commodity) == (
+                native.read_last_price(diff_journals, commodity)
+            )
+
+    def test_commodities(self, diff_journals: Tuple[str, ...]):
+        hledger = HledgerBackend().read_commodities(diff_journals)
+        native = NativeBackend().read_commodities(diff_journals)
+        assert set(native).issubset(hledger)
+
+    def test_accounts(self, diff_journals: Tuple[str, ...]):
+        hledger = HledgerBackend()
+        native = NativeBackend()
+
+        assert hledger.read_accounts(diff_journals, "AAPL") == (
+            native.read_accounts(diff_journals, "AAPL")
+        )
+        assert hledger.read_last_purchase(diff_journals, "AAPL") == (
+            native.read_last_purchase(diff_journals, "AAPL")
+        )
@@ -1,6 +1,7 @@
 from hledger_lots import lib
 from hledger_lots.lib import AdjustedTxn
 import pytest
+import threading
 from datetime import date
 import pyxirr
 
@@ -45,6 +46,32 @@ class TestGetAvg:
 
 
 
+class TestParallelMap:
+    @pytest.fixture(autouse=True)
+    def workers(self):
+        yield
+        lib.set_workers(lib.DEFAULT_WORKERS)
+
+    def test_order(self):
+        lib.set_workers(8)
+        items = list(range(100))
+        assert lib.parallel_map(lambda item: item * 2, items) == [
+            item * 2 for item in items
+        ]
+
+    def test_concurrent(self):
+        lib.set_workers(4)
+        barrier = threading.Barrier(4, timeout=5)
+        assert lib.parallel_map(lambda item: barrier.wait() >= 0, range(4)) == [
+            True
+        ] * 4
+
+    def test_single_worker(self):
+        lib.set_workers(1)
+        threads = lib.parallel_map(lambda _: threading.get_ident(), range(3))
+        assert threads == [threading.get_ident()] * 3
+
+
 class TestGetXirr:
     txns = [
             AdjustedTxn("2023-01-23", 100, "USD", -1, "acct"),
@@ -68,3 +95,71 @@ class TestGetXirr:
 
         
         
+
+
+class TestGetXirrs:
+    dates = [
+        date(2023, 1, 23).toordinal(),
+        date(2023, 1, 23).toordinal(),
+        date(2023, 2, 23).toordinal(),
+        date(2023, 3, 23).toordinal(),
+        date(2023, 3, 23).toordinal(),
+    ]
+    amounts = [-100, -50, -100, 202, 49]
+    groups = [0, 1, 0, 0, 1]
+
+    def test_groups(self):
+        results = lib.get_xirrs(self.dates, self.amounts, self.groups)
+
+        assert results.rates[0] == pytest.approx(0.0828, abs=1e-4)
+        assert results.rates[1] < 0
+        assert results.errors == {}
+
+    def test_same_as_get_xirr(self):
+        results = lib.get_xirrs(self.dates, self.amounts, self.groups)
+
+        assert results.rates[0] == lib.get_xirr(101, date(2023, 3, 23), TestGetXirr.txns)
+
+    def test_without_numpy(self, monkeypatch: pytest.MonkeyPatch):
+        expected = lib.get_xirrs(self.dates, self.amounts, self.groups)
+        monkeypatch.setattr(lib, "HAS_NUMPY", False)
+
+        results = lib.get_xirrs(self.dates, self.amounts, self.groups)
+        assert results.rates == pytest.approx(expected.rates)
+
+    def test_invalid_payments(self):
+        results = lib.get_xirrs(self.dates, [-100, -50, -100, 0, 49], self.groups)
+
+        assert isinstance(results.errors[0], pyxirr.InvalidPaymentsError)
+        assert list(results.rates) == [1]
+
+    def test_no_convergence(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(lib, "xirr", lambda *args, **kwargs: None)
+        results = lib.get_xirrs(self.dates, self.amounts, self.groups)
+
+        assert results.rates == {}
+        assert isinstance(results.errors[1], lib.XirrConvergenceError)
+
+    def test_empty(self):
+        assert lib.get_xirrs([], [], []) == lib.XirrResults()
+
+
+class TestGetSales:
+    priced = [("AAPL", "USD", -20, 1), ("AAPL", "USD", -5, 0)]
+
+    def test_cash(self):
+        priceless = [("Asset:Bank", "USD", 3000, 2), ("Revenue:Gains", "USD", -5, 0)]
+
+        assert lib.get_sales(self.priced, priceless) == {"AAPL": (70, 1, 3000, 2)}
+
+    def test_loss(self):
+        priceless = [("Asset:Bank", "USD", 10, 0), ("Income:Gains", "USD", 25, 0)]
+
+        assert lib.get_sales(self.priced, priceless) == {"AAPL": (70, 1, 10, 0)}
+
+    def test_not_sale(self):
+        priceless = [("Asset:Bank", "USD", -10, 0)]
+
+        assert lib.get_sales([("AAPL", "USD", 2, 0)], priceless) == {}
+        assert lib.get_sales(self.priced, []) == {}
+        assert lib.get_sales([*self.priced, ("GOOG", "USD", -1, 0)], priceless) == {}
@@ -0,0 +1,149 @@
+from datetime import date
+from pathlib import Path
+from typing import List, Tuple
+
+import pytest
+
+from hledger_lots import hl
+from hledger_lots.fifo_info import AllFifoInfo, FifoInfo
+from hledger_lots.hl import HledgerBackend, set_backend
+from hledger_lots.journal import NativeBackend
+from hledger_lots.price_index import PriceIndex, parse_price_line
+from hledger_lots.txn_columns import date2ordinal
+
+prices_txt = """P 2023-01-05 AAPL 25 USD
+P 2023-01-05 USD 0.04 AAPL
+P 2023-01-20 AAPL USD 26
+P 2023-01-20 USD 0.0384615 AAPL
+P 2023-02-01 AAPL 30 USD
+P 2023-02-01 AAPL 31 USD
+P 2023-02-01 USD 0.0333333 AAPL
+P 2023-02-01 USD 0.0322581 AAPL
+P 2023-02-10 AAPL 150 BRL
+P 2023-02-10 BRL 0.0066667 AAPL
+"""
+
+journal = """2023-01-05 Buy AAPL
+    Asset:Stocks    3 AAPL @ 5.2 USD
+    Asset:Bank
+
+P 2023-01-10 AAPL 5.5 USD
+P 2023-02-01 AAPL 6 USD
+"""
+
+
+@pytest.fixture()
+def price_index() -> PriceIndex:
+    return PriceIndex.from_hledger(prices_txt)
+
+
+@pytest.fixture()
+def journals(tmp_path: Path) -> Tuple[str, ...]:
+    file_path = tmp_path.joinpath("data.journal")
+    file_path.write_text(journal)
+    return (str(file_path),)
+
+
+class TestParsePriceLine:
+    @pytest.mark.parametrize(
+        "line,expected",
+        [
+            ("P 2023-02-01 AAPL 35 USD", ("2023-02-01", "AAPL", 35, "USD")),
+            ("P 2023-02-01 AAPL 35USD", ("2023-02-01", "AAPL", 35, "USD")),
+            ("P 2023-02-01 AAPL USD 35", ("2023-02-01", "AAPL", 35, "USD")),
+            ("P 2023-02-01 AAPL $1,035.5", ("2023-02-01", "AAPL", 1035.5, "$")),
+            (
+                'P 2023-02-01 "PETR4" 35.2 "BR L"',
+                ("2023-02-01", "PETR4", 35.2, "BR L"),
+            ),
+        ],
+    )
+    def test_line(self, line: str, expected: tuple):
+        assert parse_price_line(line) == expected
+
+    def test_not_price(self):
+        assert parse_price_line("") is None
+
+
+class TestPriceIndex:
+    def test_last(self, price_index: PriceIndex):
+        assert price_index.get_last("aapl") == (date(2023, 2, 10), 150)
+        assert price_index.get_last("AAPL", "usd") == (date(2023, 2, 1), 31)
+        assert price_index.get_last("GOOG") == (None, None)
+
+    def test_as_of(self, price_index: PriceIndex):
+        as_of = date2ordinal("2023-01-31")
+        assert price_index.get_as_of("AAPL", as_of) == (date(2023, 1, 20), 26)
+        assert price_index.get_as_of("AAPL", date2ordinal("2023-01-04")) == (
+            None,
+            None,
+        )
+
+    def test_reverse(self, price_index: PriceIndex):
+        assert price_index.get_quotes("USD") == ["AAPL"]
+        assert price_index.get_last("USD") == (date(2023, 2, 1), 0.0322581)
+
+    def test_range(self, price_index: PriceIndex):
+        start, end = date2ordinal("2023-01-20"), date2ordinal("2023-02-01")
+
+        assert price_index.get_range("AAPL", start, end) == [
+            ("2023-01-20", 26),
+            ("2023-02-01", 30),
+            ("2023-02-01", 31),
+        ]
+        assert price_index.get_range("AAPL", start=date2ordinal("2023-02-02")) == [
+            ("2023-02-10", 150)
+        ]
+        assert len(price_index.get_range("AAPL", quote="USD")) == 4
+
+    def test_unsorted_rows(self):
+        price_index = PriceIndex.from_rows(
+            [
+                ("2023-02-01", "AAPL", 30, "USD"),
+                ("2023-01-05", "AAPL", 25, "USD"),
+            ]
+        )
+        assert price_index.get_range("AAPL") == [
+            ("2023-01-05", 25),
+            ("2023-02-01", 30),
+        ]
+
+
+class TestSharedIndex:
+    def test_hledger_runs_once(self, monkeypatch: pytest.MonkeyPatch):
+        calls: List[tuple] = []
+
+        def run_hledger(file_path, *comm):
+            calls.append(comm)
+            return prices_txt
+
+        monkeypatch.setattr(hl, "run_hledger", run_hledger)
+        backend = HledgerBackend()
+
+        assert backend.read_last_price(("a.journal",), "AAPL") == (
+            date(2023, 2, 10),
+            150,
+        )
+        assert backend.read_last_price(("a.journal",), "USD")[0] == date(2023, 2, 1)
+        assert backend.read_prices(("a.journal",), "BRL") == [("2023-02-10", 0.0066667)]
+        assert calls == [("prices", "--infer-reverse-prices")]
+
+    def test_infos_share_index(self, journals: Tuple[str, ...]):
+        backend = NativeBackend()
+        set_backend(backend)
+
+        all_info = AllFifoInfo(journals, "", False)
+        fifo_info = FifoInfo(journals, "AAPL", False)
+
+        assert fifo_info.price_index is all_info.price_index
+        assert list(backend.price_indexes) == [journals]
+
+    def test_as_of_price(self, journals: Tuple[str, ...]):
+        set_backend(NativeBackend())
+        fifo_info = FifoInfo(journals, "AAPL", False, as_of="2023-01-31")
+
+        assert (fifo_info.market_date, fifo_info.market_price) == (
+            date(2023, 1, 10),
+            5.5,
+        )
+        assert fifo_info.last_price == (date(2023, 2, 1), 6)
@@ -0,0 +1,151 @@
+from datetime import date
+from pathlib import Path
+from typing import List, Tuple
+
+import pytest
+
+from hledger_lots.hl import set_backend
+from hledger_lots.journal import Journal, NativeBackend
+from hledger_lots.price_index import PriceIndex
+from hledger_lots.price_store import get_store_paths, load_price_index
+
+main_journal = """include prices/*.journal
+
+2023-01-05 Buy AAPL
+    Asset:Stocks    3 AAPL @ 5.2 USD
+    Asset:Bank
+"""
+
+prices_journal = """P 2023-01-10 AAPL 5.5 USD
+P 2023-02-01 AAPL 6 USD
+P 2023-02-01 AAPL 6.1 USD
+P 2023-02-03 GOOG 30 BRL
+"""
+
+
+@pytest.fixture()
+def journals(tmp_path: Path) -> Tuple[str, ...]:
+    file_path = tmp_path.joinpath("main.journal")
+    file_path.write_text(main_journal)
+    tmp_path.joinpath("prices").mkdir()
+    tmp_path.joinpath("prices", "2023.journal").write_text(prices_journal)
+    return (str(file_path),)
+
+
+@pytest.fixture()
+def reads() -> List[Tuple[str, ...]]:
+    return []
+
+
+def load(journals: Tuple[str, ...], reads: List[Tuple[str, ...]]) -> PriceIndex:
+    def read():
+        reads.append(journals)
+        return PriceIndex.from_rows(Journal(journals).get_price_rows())
+
+    return load_price_index(journals, "native", read)
+
+
+def append(file_path: Path, text: str):
+    with open(file_path, "a") as f:
+        f.write(text)
+
+
+class TestPriceStore:
+    def test_round_trip(self, journals: Tuple[str, ...], reads: list):
+        read_index = load(journals, reads)
+        stored_index = load(journals, reads)
+
+        assert len(reads) == 1
+        assert list(stored_index.pairs) == list(read_index.pairs)
+        assert stored_index.quotes == read_index.quotes
+        for commodity in ["AAPL", "USD", "GOOG"]:
+            assert stored_index.get_last(commodity) == read_index.get_last(commodity)
+            assert stored_index.get_range(commodity) == read_index.get_range(commodity)
+        assert stored_index.get_last("AAPL") == (date(2023, 2, 1), 6.1)
+
+    def test_zero_copy(self, journals: Tuple[str, ...], reads: list):
+        load(journals, reads)
+        series = load(journals, reads).pairs[("AAPL", "USD")]
+
+        assert isinstance(series.dates, memoryview)
+        assert isinstance(series.prices, memoryview)
+        assert list(series.prices) == [5.5, 6, 6.1]
+
+    def test_txns_appended(
+        self, journals: Tuple[str, ...], reads: list, tmp_path: Path
+    ):
+        load(journals, reads)
+        append(Path(journals[0]), "\n2023-03-01 Buy AAPL\n    Asset:Stocks  1 AAPL\n")
+        load(journals, reads)
+        load(journals, reads)
+
+        assert len(reads) == 1
+
+    def test_prices_appended(
+        self, journals: Tuple[str, ...], reads: list, tmp_path: Path
+    ):
+        load(journals, reads)
+        append(tmp_path.joinpath("prices", "2023.journal"), "P 2023-03-01 AAPL 7 USD\n")
+
+        assert load(journals, reads).get_last("AAPL") == (date(2023, 3, 1), 7)
+        assert len(reads) == 2
+
+    def test_price_added_to_txns_file(self, journals: Tuple[str, ...], reads: list):
+        load(journals, reads)
+        append(Path(journals[0]), "\nP 2023-03-01 AAPL 7 USD\n")
+
+        assert load(journals, reads).get_last("AAPL") == (date(2023, 3, 1), 7)
+
+    def test_include_added_to_txns_file(
+        self, journals: Tuple[str, ...], reads: list, tmp_path: Path
+    ):
+        load(journals, reads)
+        tmp_path.joinpath("2024.prices").write_text("P 2024-01-01 AAPL 8 USD\n")
+        append(Path(journals[0]), "\ninclude 2024.prices\n")
+
+        assert load(journals, reads).get_last("AAPL") == (date(2024, 1, 1), 8)
+
+    def test_include_added(
+        self, journals: Tuple[str, ...], reads: list, tmp_path: Path
+    ):
+        load(journals, reads)
+        tmp_path.joinpath("prices", "2024.journal").write_text(
+            "P 2024-01-01 AAPL 8 USD\n"
+        )
+
+        assert load(journals, reads).get_last("AAPL") == (date(2024, 1, 1), 8)
+
+    def test_corrupted(self, journals: Tuple[str, ...], reads: list):
+        load(journals, reads)
+        bin_path, _ = get_store_paths(journals, "native")
+        with open(bin_path, "r+b") as f:
+            f.truncate(40)
+
+        assert load(journals, reads).get_last("AAPL") == (date(2023, 2, 1), 6.1)
+        assert len(reads) == 2
+
+
+class TestBackendPriceStore:
+    def test_disabled(self, journals: Tuple[str, ...], cache_dir: Path):
+        set_backend(NativeBackend())
+        NativeBackend().get_price_index(journals)
+
+        assert not list(cache_dir.glob("prices-*"))
+
+    def test_enabled(
+        self,
+        journals: Tuple[str, ...],
+        cache_dir: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ):
+        monkeypatch.setenv("HLEDGER_LOTS_PRICE_STORE", "1")
+        NativeBackend().get_price_index(journals)
+
+        def read_price_index(self, file_path):
+            raise AssertionError("prices read again")
+
+        monkeypatch.setattr(NativeBackend, "read_price_index", read_price_index)
+        price_index = NativeBackend().get_price_index(journals)
+
+        assert price_index.get_last("GOOG") == (date(2023, 2, 3), 30)
+        assert len(list(cache_dir.glob("prices-*"))) == 2
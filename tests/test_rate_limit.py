@@ -0,0 +1,214 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import pytest
+
+from hledger_lots import lib
+from hledger_lots.lib import parallel_map, set_workers
+from hledger_lots.rate_limit import (
+    CachedRateLimitedSession,
+    RateLimit,
+    RateLimitedSession,
+    TokenBucket,
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: List[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class YahooServer(ThreadingHTTPServer):
+    """Chart endpoint answering 429 to the first failures[ticker] requests"""
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), YahooHandler)
+        self.lock = threading.Lock()
+        self.failures: Dict[str, int] = {}
+        self.retry_after: Dict[str, str] = {}
+        self.requests: List[str] = []
+        self.times: List[float] = []
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class YahooHandler(BaseHTTPRequestHandler):
+    server: YahooServer
+
+    def do_GET(self):
+        ticker = self.path.split("?")[0].split("/")[-1]
+        with self.server.lock:
+            self.server.requests.append(ticker)
+            self.server.times.append(time.monotonic())
+            failures = self.server.failures.get(ticker, 0)
+            self.server.failures[ticker] = failures - 1
+
+        if failures > 0:
+            self.send_response(429)
+            retry_after = self.server.retry_after.get(ticker)
+            if retry_after:
+                self.send_header("Retry-After", retry_after)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body = json.dumps(
+            {
+                "chart": {
+                    "result": [
+                        {
+                            "meta": {"currency": "USD", "symbol": ticker},
+                            "timestamp": [1672876800],
+                            "indicators": {"quote": [{"close": [len(ticker)]}]},
+                        }
+                    ]
+                }
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture()
+def server() -> Iterator[YahooServer]:
+    yahoo_server = YahooServer()
+    thread = threading.Thread(
+        target=yahoo_server.serve_forever, args=(0.01,), daemon=True
+    )
+    thread.start()
+    yield yahoo_server
+    yahoo_server.shutdown()
+    yahoo_server.server_close()
+
+
+def get_chart(session, server: YahooServer, ticker: str):
+    response = session.get(f"{server.url}/v8/finance/chart/{ticker}")
+    if response.status_code != 200:
+        return response.status_code
+    result = response.json()["chart"]["result"][0]
+    return (result["meta"]["symbol"], result["indicators"]["quote"][0]["close"][0])
+
+
+class TestTokenBucket:
+    def test_burst_then_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(2, capacity=3, clock=clock, sleep=clock.sleep)
+
+        for _ in range(5):
+            bucket.acquire()
+
+        assert clock.sleeps == [0.5, 0.5]
+
+    def test_refill(self):
+        clock = FakeClock()
+        bucket = TokenBucket(2, capacity=1, clock=clock, sleep=clock.sleep)
+
+        bucket.acquire()
+        clock.now += 10
+        bucket.acquire()
+        assert clock.sleeps == []
+
+    def test_throttle_and_recover(self):
+        bucket = TokenBucket(16)
+
+        for _ in range(10):
+            bucket.throttle()
+        assert bucket.rate == 1
+
+        for _ in range(20):
+            bucket.recover()
+        assert bucket.rate == 16
+
+
+class TestRateLimit:
+    def test_backoff(self):
+        rate_limit = RateLimit(backoff=1, max_delay=5)
+        response = type("Response", (), {"headers": {}})()
+
+        delays = [rate_limit.get_delay(response, attempt) for attempt in range(5)]
+        assert delays == [1, 2, 4, 5, 5]
+
+    def test_retry_after(self):
+        rate_limit = RateLimit()
+        response = type("Response", (), {"headers": {"Retry-After": "3"}})()
+
+        assert rate_limit.get_delay(response, 4) == 3
+
+
+class TestRateLimitedSession:
+    @pytest.fixture(autouse=True)
+    def workers(self):
+        yield
+        set_workers(lib.DEFAULT_WORKERS)
+
+    def test_retries_429(self, server: YahooServer):
+        server.failures["AAPL"] = 3
+        server.retry_after["AAPL"] = "0.5"
+        clock = FakeClock()
+        session = RateLimitedSession(RateLimit(100, backoff=0.1, sleep=clock.sleep))
+
+        assert get_chart(session, server, "AAPL") == ("AAPL", 4)
+        assert server.requests == ["AAPL"] * 4
+        assert [delay for delay in clock.sleeps if delay >= 0.1] == [0.5, 0.5, 0.5]
+        assert session.rate_limit.bucket.rate < 100
+
+    def test_gives_up(self, server: YahooServer):
+        server.failures["AAPL"] = 10
+        clock = FakeClock()
+        session = RateLimitedSession(RateLimit(100, retries=2, sleep=clock.sleep))
+
+        assert get_chart(session, server, "AAPL") == 429
+        assert len(server.requests) == 3
+        assert [delay for delay in clock.sleeps if delay >= 1] == [1, 2]
+
+    def test_concurrent_order(self, server: YahooServer):
+        tickers = [f"T{i}" for i in range(12)]
+        server.failures = {"T2": 2, "T7": 1}
+        session = RateLimitedSession(RateLimit(1000, backoff=0.01))
+
+        set_workers(6)
+        charts = parallel_map(
+            lambda ticker: get_chart(session, server, ticker), tickers
+        )
+
+        assert charts == [(ticker, len(ticker)) for ticker in tickers]
+        assert len(server.requests) == 15
+
+    def test_rate(self, server: YahooServer):
+        session = RateLimitedSession(RateLimit(20))
+        session.rate_limit.bucket.capacity = session.rate_limit.bucket.tokens = 1
+
+        set_workers(4)
+        parallel_map(lambda i: get_chart(session, server, f"T{i}"), range(6))
+
+        assert max(server.times) - min(server.times) >= 5 / 20 * 0.9
+
+    def test_cached_responses_skip_limit(self, server: YahooServer, tmp_path: Path):
+        server.failures["AAPL"] = 1
+        session = CachedRateLimitedSession(
+            str(tmp_path.joinpath("yahoo")), RateLimit(100, backoff=0.01)
+        )
+
+        assert get_chart(session, server, "AAPL") == ("AAPL", 4)
+        assert get_chart(session, server, "AAPL") == ("AAPL", 4)
+        assert server.requests == ["AAPL", "AAPL"]
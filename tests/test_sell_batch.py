@@ -0,0 +1,135 @@
+from io import StringIO
+from pathlib import Path
+from typing import Tuple
+
+import pytest
+
+from hledger_lots.hl import set_backend
+from hledger_lots.journal import NativeBackend
+from hledger_lots.sell_batch import SellBatch, read_sells
+
+journal = """2022-01-01 Buy AAPL
+    Asset:Stocks    10 AAPL @ 10 USD
+    Asset:Bank
+
+2022-01-02 Buy AAPL
+    Asset:Stocks    10 AAPL @ 20 USD
+    Asset:Bank
+"""
+
+header = (
+    "commodity,commodity_account,cash_account,revenue_account,date,quantity,price\n"
+)
+rows = """aapl,Asset:Stocks,Asset:Bank,Revenue:Gains,2022-02-01,15,30
+AAPL,Asset:Stocks,Asset:Bank,Revenue:Gains,2022-02-02,3,30
+"""
+
+
+@pytest.fixture()
+def journals(tmp_path: Path) -> Tuple[str, ...]:
+    set_backend(NativeBackend())
+    file_path = tmp_path.joinpath("data.journal")
+    file_path.write_text(journal)
+    return (str(file_path),)
+
+
+class TestReadSells:
+    def test_rows(self):
+        sells = read_sells(StringIO(header + rows))
+
+        assert [sell.commodity for sell in sells] == ["AAPL", "AAPL"]
+        assert sells[0].quantity == 15
+        assert sells[0].value == 450
+
+    @pytest.mark.parametrize(
+        "row",
+        [
+            "AAPL,Asset:Stocks,Asset:Bank,,2022-02-01,15,30",
+            "AAPL,Asset:Stocks,Asset:Bank,Revenue:Gains,01/02/2022,15,30",
+            "AAPL,Asset:Stocks,Asset:Bank,Revenue:Gains,2022-02-01,-15,30",
+        ],
+    )
+    def test_invalid_row(self, row: str):
+        with pytest.raises(ValueError, match="Row 2"):
+            read_sells(StringIO(header + rows.split("\n")[0] + "\n" + row))
+
+
+class TestSellBatch:
+    def test_sells_take_remaining_lots(self, journals: Tuple[str, ...]):
+        batch = SellBatch(journals, False, False)
+        first, second = batch.get_sells_hl(read_sells(StringIO(header + rows)))
+
+        assert "-10.0 AAPL @ 10 USD" in first
+        assert "-5.0 AAPL @ 20 USD" in first
+        assert "-3.0 AAPL @ 20 USD" in second
+        assert "-3.0 AAPL @ 10 USD" not in second
+        assert batch.books["AAPL"].get_available() == 2
+
+    def test_without_validation(self, journals: Tuple[str, ...]):
+        batch = SellBatch(journals, False, False)
+        txns = batch.get_hl_txns(read_sells(StringIO(header + rows)), validate=False)
+
+        assert txns.count("Sold AAPL") == 2
+        assert "    Revenue:Gains            -250.00 USD\n\n2022-02-02" in txns
+
+    def test_avg_cost(self, journals: Tuple[str, ...]):
+        batch = SellBatch(journals, True, False)
+        first, second = batch.get_sells_hl(read_sells(StringIO(header + rows)))
+
+        assert "-15.0 AAPL @ 15 USD" in first
+        assert "-3.0 AAPL @ 15 USD" in second
+
+    def test_short_sell(self, journals: Tuple[str, ...]):
+        batch = SellBatch(journals, False, False)
+        row = "AAPL,Asset:Stocks,Asset:Bank,Revenue:Gains,2022-02-03,3,30\n"
+
+        with pytest.raises(ValueError, match="Row 3"):
+            batch.get_sells_hl(read_sells(StringIO(header + rows + row)))
+
+    def test_rows_out_of_order(self, journals: Tuple[str, ...]):
+        batch = SellBatch(journals, False, False)
+        first, second = rows.splitlines()
+        late, early = batch.get_sells_hl(
+            read_sells(StringIO(f"{header}{second}\n{first}\n"))
+        )
+
+        assert "-10.0 AAPL @ 10 USD" in early
+        assert "-5.0 AAPL @ 20 USD" in early
+        assert "-3.0 AAPL @ 20 USD" in late
+
+
+class TestBackdatedSells:
+    def write(self, tmp_path: Path, later: str) -> Tuple[str, ...]:
+        set_backend(NativeBackend())
+        file_path = tmp_path.joinpath("data.journal")
+        file_path.write_text(journal + later)
+        return (str(file_path),)
+
+    def test_before_last_txn(self, tmp_path: Path):
+        later = "\n2022-03-01 Buy AAPL\n    Asset:Stocks    5 AAPL @ 40 USD\n    Asset:Bank\n"
+        batch = SellBatch(self.write(tmp_path, later), False, True)
+        row = "AAPL,Asset:Stocks,Asset:Bank,Revenue:Gains,2022-01-15,12,30\n"
+        (txn,) = batch.get_sells_hl(read_sells(StringIO(header + row)))
+
+        assert "-10.0 AAPL @ 10 USD" in txn
+        assert "-2.0 AAPL @ 20 USD" in txn
+        assert "40 USD" not in txn
+        assert batch.books["AAPL"].get_available() == 13
+
+    def test_conflict_with_later_txns(self, tmp_path: Path):
+        later = "\n2022-03-01 Sell AAPL\n    Asset:Stocks    -18 AAPL @ 10 USD\n    Asset:Bank\n"
+        batch = SellBatch(self.write(tmp_path, later), False, False)
+        row = "AAPL,Asset:Stocks,Asset:Bank,Revenue:Gains,2022-01-15,5,30\n"
+
+        with pytest.raises(
+            ValueError, match="Row 1: Sale of AAPL on 2022-01-15 conflicts"
+        ):
+            batch.get_sells_hl(read_sells(StringIO(header + row)))
+
+    def test_specific(self, journals: Tuple[str, ...]):
+        batch = SellBatch(journals, False, True, lot_method="specific")
+        first, second = batch.get_sells_hl(read_sells(StringIO(header + rows)))
+
+        assert "-5.0 AAPL @ 20 USD  ; buy_date:2022-01-02" in first
+        assert "-3.0 AAPL @ 20 USD  ; buy_date:2022-01-02" in second
+        assert batch.books["AAPL"].get_available() == 2
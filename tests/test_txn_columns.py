@@ -0,0 +1,138 @@
+import pickle
+from datetime import date
+from fractions import Fraction
+
+import pytest
+
+from hledger_lots.avg import get_avg_cost
+from hledger_lots.lib import AdjustedTxn, Txn, dt_list2table, get_avg_fifo
+from hledger_lots.txn_columns import TxnColumns, div_round, ordinal2date, to_places
+
+from . import lots_data
+
+
+class TestTxnColumns:
+    txns = lots_data.txns_qtty_reaches_zero
+
+    def test_round_trip(self):
+        columns = TxnColumns.from_txns(self.txns)
+
+        assert len(columns) == len(self.txns)
+        assert columns.to_txns() == self.txns
+        assert columns == self.txns
+        assert columns != self.txns[1:]
+
+    def test_from_columns(self):
+        columns = TxnColumns.from_txns(self.txns)
+        assert TxnColumns.from_txns(columns) is columns
+
+    def test_columns(self):
+        columns = TxnColumns.from_txns(self.txns[:3])
+
+        assert list(columns.dates) == [738156, 738157, 738158]
+        assert list(columns.prices) == [10.0, 20.0, 30.0]
+        assert list(columns.qttys) == [5.0, 2.0, -3.0]
+        assert list(columns.accts) == [0, 0, 0]
+        assert columns.get_base_curs() == {"USD"}
+        assert ordinal2date(columns.dates[0]) == "2022-01-01"
+
+    def test_interned(self):
+        columns = TxnColumns()
+        columns.append("2022-01-01", 10, "USD", 1, "Acct1")
+        columns.append("2022-01-02", 10, "BRL", 2, "Acct2")
+        columns.append("2022-01-03", 10, "USD", 3, "Acct1")
+
+        assert list(columns.base_curs) == [0, 1, 0]
+        assert columns.base_cur_names.names == ["USD", "BRL"]
+        assert columns.get_acct_qtty("Acct1") == 4
+        assert columns.get_acct_qtty("Acct3") == 0
+
+    def test_view(self):
+        columns = TxnColumns.from_txns(self.txns)
+        view = columns[-1]
+
+        assert view.date == "2022-01-15"
+        assert view.date_ordinal == date(2022, 1, 15).toordinal()
+        assert view == self.txns[-1]
+        assert view.asdict() == {
+            "date": "2022-01-15",
+            "price": 30.0,
+            "base_cur": "USD",
+            "qtty": -3.0,
+            "acct": "Acct1",
+        }
+
+        with pytest.raises(IndexError):
+            columns[len(self.txns)]
+
+    def test_slice_copy(self):
+        columns = TxnColumns.from_txns(self.txns)
+        part = columns[1:3]
+        copy = columns.copy()
+        part.qttys[0] = 100
+        copy.qttys[0] = 100
+
+        assert part == [
+            AdjustedTxn("2022-01-02", 20.0, "USD", 100, "Acct1"),
+            self.txns[2],
+        ]
+        assert columns == self.txns
+
+    def test_pickle(self):
+        columns = TxnColumns.from_txns(self.txns)
+        assert pickle.loads(pickle.dumps(columns)) == self.txns
+
+    def test_consumers(self):
+        columns = TxnColumns.from_txns(self.txns)
+
+        assert get_avg_cost(columns, False) == get_avg_cost(self.txns, False)
+        assert get_avg_cost(columns, False, date(2022, 1, 4)) == get_avg_cost(
+            self.txns, False, date(2022, 1, 4)
+        )
+        assert get_avg_fifo(columns) == get_avg_fifo(self.txns)
+        assert dt_list2table(columns) == dt_list2table(columns.to_txns())
+
+
+class TestExactColumns:
+    def test_mantissas(self):
+        columns = TxnColumns()
+        columns.append("2022-01-01", 10.25, "USD", 3, "Acct1", (3, 0, 1025, 2))
+        columns.append("2022-01-02", 10.1, "USD", 0.5, "Acct1", (5, 1, 101, 1))
+
+        assert columns.qtty_scale == 1
+        assert list(columns.qtty_mantissas) == [30, 5]
+        assert columns.get_exact_qtty() == Fraction(7, 2)
+        assert columns.get_unit_price(1) == 10_100_000_000_000
+
+    def test_from_floats(self):
+        columns = TxnColumns.from_txns(lots_data.txns_only_buying)
+
+        assert list(columns.qtty_mantissas) == [100, 20, 50, 480, 210]
+        assert columns.get_exact_avg_cost() == Fraction(1535, 86)
+
+    def test_total_price(self):
+        columns = TxnColumns()
+        columns.append_txn(
+            Txn("2022-01-01", 100, "USD", 3, "Acct1", "TotalPrice", (3, 0, 100, 0))
+        )
+
+        assert columns.get_unit_price(0) == 33_333_333_333_333
+        assert columns.get_exact_amount() == 100
+
+    def test_rounding(self):
+        assert div_round(5, 2) == 2
+        assert div_round(7, 2) == 4
+        assert div_round(-7, 2) == -4
+        assert div_round(7, -2) == -4
+        assert to_places(1025, 2, 1) == 102
+        assert to_places(1035, 2, 1) == 104
+        assert to_places(101, 1, 3) == 10100
+
+    def test_overflow(self):
+        columns = TxnColumns()
+        columns.append("2022-01-01", 1, "USD", 1, "Acct1", (1, 0, 1, 0))
+        columns.append("2022-01-02", 1, "USD", 1, "Acct1", (10**30, 30, 1, 0))
+
+        assert isinstance(columns.qtty_mantissas, list)
+        assert columns.get_exact_qtty() == 2
+        assert columns.take([1]).get_exact_qtty() == 1
@@ -0,0 +1,118 @@
+import pytest
+
+from hledger_lots.journal import Amount
+from hledger_lots.txn_print import (
+    PrintPosting,
+    PrintTxn,
+    format_txn,
+    get_balancing,
+    quote_commodity,
+    to_amount,
+)
+
+
+def get_buy(qtty: float, price: float, comm: str = "AAPL") -> PrintTxn:
+    postings = [
+        PrintPosting(
+            "Asset:Stocks", to_amount(qtty, comm), to_amount(price, "USD"), "UnitPrice"
+        ),
+        PrintPosting("Asset:Bank", None),
+    ]
+    return PrintTxn("2023-01-05", f"Buy {comm}", postings)
+
+
+class TestToAmount:
+    @pytest.mark.parametrize(
+        "value,expected",
+        [
+            (10, Amount("USD", 10, 0)),
+            (-2.0, Amount("USD", -20, 1)),
+            ("1000.00", Amount("USD", 100000, 2)),
+            (1e-05, Amount("USD", 1, 5)),
+        ],
+    )
+    def test_places(self, value, expected: Amount):
+        assert to_amount(value, "USD") == expected
+
+
+class TestQuoteCommodity:
+    @pytest.mark.parametrize(
+        "commodity,expected",
+        [("AAPL", "AAPL"), ("PETR4", '"PETR4"'), ("y.BTC", '"y.BTC"'), ("€", "€")],
+    )
+    def test_quote(self, commodity: str, expected: str):
+        assert quote_commodity(commodity) == expected
+
+
+class TestFormatTxn:
+    def test_buy(self):
+        expected = """2023-01-05 Buy AAPL
+    Asset:Stocks    10.0 AAPL @ 5.25 USD
+    Asset:Bank                 -52.5 USD
+
+"""
+        assert format_txn(get_buy(10.0, 5.25)) == expected
+
+    def test_buy_quoted(self):
+        expected = """2023-01-05 Buy PETR4.SA
+    Asset:Stocks    3 "PETR4.SA" @ 20 USD
+    Asset:Bank                    -60 USD
+
+"""
+        assert format_txn(get_buy(3, 20, "PETR4.SA")) == expected
+
+    def test_comments_and_styles(self):
+        postings = [
+            PrintPosting("Bank", to_amount("160.00", "USD")),
+            PrintPosting(
+                "Acct1",
+                to_amount(-2.0, "USD"),
+                to_amount(35.0, "USD"),
+                "UnitPrice",
+                "buy_date:2022-01-12",
+            ),
+            PrintPosting("Revenue", None),
+        ]
+        txn = PrintTxn("2022-02-01", "Sold USD", postings, ["a:1", "b:2"])
+
+        assert format_txn(txn) == """2022-02-01 Sold USD  ; a:1
+    ; b:2
+    Bank                 160.00 USD
+    Acct1      -2.00 USD @ 35.0 USD  ; buy_date:2022-01-12
+    Revenue              -90.00 USD
+
+"""
+
+    def test_total_price(self):
+        postings = [
+            PrintPosting(
+                "Asset:FOREX", to_amount(-55, "BRL"), to_amount(10, "USD"), "TotalPrice"
+            ),
+            PrintPosting("Asset:Bank", None),
+        ]
+        lines = format_txn(PrintTxn("2023-01-10", "Sell BRL", postings)).split("\n")
+
+        assert lines[1] == "    Asset:FOREX    -55 BRL @@ 10 USD"
+        assert lines[2] == "    Asset:Bank                10 USD"
+
+    def test_zero_balancing(self):
+        postings = [
+            PrintPosting("Asset:Bank", to_amount("10.00", "USD")),
+            PrintPosting("Asset:Cash", to_amount("-10.00", "USD")),
+        ]
+
+        assert get_balancing(postings) == [Amount("", 0, 0)]
+
+    def test_unbalanced(self):
+        txn = get_buy(2, 5)
+        txn.postings[1].amount = to_amount(1, "USD")
+
+        with pytest.raises(ValueError):
+            format_txn(txn)
+
+    def test_two_missing_amounts(self):
+        txn = get_buy(2, 5)
+        txn.postings.append(PrintPosting("Equity", None))
+
+        with pytest.raises(ValueError):
+            format_txn(txn)
@@ -0,0 +1,127 @@
+import json
+import threading
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+import pytest
+import requests
+
+from hledger_lots.hl import hledger2txn, hledger2txns_by_cur, set_backend
+from hledger_lots.lib import AdjustedTxn
+from hledger_lots.web import WebBackend
+
+from .lots_data import hl_amount, hl_txn, hledger_print_json
+
+web_txns = [
+    *hledger_print_json,
+    hl_txn(
+        "2023-01-20",
+        "Sell AAPL",
+        [
+            ("Asset:Stocks", [hl_amount("AAPL", -1, 0)]),
+            ("Asset:Bank", [hl_amount("USD", 6, 0)]),
+        ],
+    ),
+]
+
+web_prices = [
+    {"pdate": "2023-01-05", "pcommodity": "AAPL", "pamount": hl_amount("USD", 6, 0)},
+    {"pdate": "2023-01-21", "pcommodity": "USD", "pamount": hl_amount("AAPL", 1, 1)},
+    {"pdate": "2023-01-20", "pcommodity": "AAPL", "pamount": hl_amount("USD", 25, 0)},
+]
+
+web_routes = {
+    "/transactions": web_txns,
+    "/prices": web_prices,
+    "/commodities": ["AAPL", "BRL", "USD"],
+    "/accountnames": ["Asset:Bank", "Asset:FOREX", "Asset:Stocks", "Expenses:Fees"],
+}
+
+
+class HledgerWebHandler(BaseHTTPRequestHandler):
+    requests_log: List[str] = []
+
+    def do_GET(self):
+        self.requests_log.append(self.path)
+        if self.path not in web_routes:
+            self.send_error(404)
+            return
+
+        body = json.dumps(web_routes[self.path]).encode("utf8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture()
+def web_url():
+    HledgerWebHandler.requests_log = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), HledgerWebHandler)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+
+class TestWebBackend:
+    def test_txns(self, web_url: str):
+        web = WebBackend(web_url)
+
+        assert web.read_txns((), "aapl") == [
+            AdjustedTxn("2023-01-05", 5.2, "USD", 3, "Asset:Stocks")
+        ]
+        assert web.read_txns_by_cur((), "brl") == {
+            "AAPL": [AdjustedTxn("2023-01-05", 5.2, "USD", 3, "Asset:Stocks")]
+        }
+
+    def test_last_price(self, web_url: str):
+        web = WebBackend(web_url)
+
+        assert web.read_last_price((), "AAPL") == (date(2023, 1, 21), 10)
+        assert web.read_last_price((), "BRL") == (None, None)
+
+    def test_commodities_accounts(self, web_url: str):
+        web = WebBackend(web_url)
+
+        assert web.read_commodities(()) == ["AAPL", "BRL", "USD"]
+        assert "Expenses:Fees" in web.read_accounts(())
+        assert web.read_accounts((), "AAPL") == ["Asset:Stocks"]
+        assert web.read_accounts((), no_desc="buy") == ["Asset:Bank", "Asset:Stocks"]
+
+    def test_last_purchase(self, web_url: str):
+        web = WebBackend(web_url)
+
+        assert web.read_last_purchase((), "AAPL") == "2023-01-05"
+        assert web.read_last_purchase((), "AAPL", "aapl") is None
+
+    def test_single_request_per_endpoint(self, web_url: str):
+        web = WebBackend(web_url)
+        web.read_txns_by_cur(())
+        web.read_accounts((), "AAPL")
+        web.read_last_purchase((), "AAPL")
+
+        assert HledgerWebHandler.requests_log == ["/transactions"]
+
+    def test_not_found(self, web_url: str):
+        web = WebBackend(web_url + "missing")
+
+        with pytest.raises(requests.HTTPError):
+            web.read_commodities(())
+
+    def test_not_cached(self, web_url: str, tmp_path):
+        journal = tmp_path.joinpath("options.journal")
+        journal.write_text("")
+        set_backend(WebBackend(web_url))
+
+        hledger2txns_by_cur((str(journal),))
+        set_backend(WebBackend(web_url))
+        assert len(hledger2txn((str(journal),), "AAPL")) == 1
+
+        assert HledgerWebHandler.requests_log == ["/transactions", "/transactions"]
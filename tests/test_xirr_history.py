@@ -0,0 +1,156 @@
+from datetime import date
+from pathlib import Path
+from typing import Tuple
+
+import pytest
+
+from hledger_lots import lib, xirr_history
+from hledger_lots.fifo_info import FifoInfo
+from hledger_lots.hl import set_backend
+from hledger_lots.journal import NativeBackend
+from hledger_lots.lib import AdjustedTxn
+from hledger_lots.txn_columns import TxnColumns
+from hledger_lots.xirr_history import (
+    AllXirrHistory,
+    get_period_prices,
+    sweep_xirrs,
+)
+
+txns = [
+    AdjustedTxn("2023-01-05", 5.2, "USD", 3, "Asset:Stocks"),
+    AdjustedTxn("2023-03-05", 6, "USD", 2, "Asset:Stocks"),
+    AdjustedTxn("2023-04-05", 7, "USD", -1, "Asset:Stocks"),
+]
+
+prices = [
+    ("2023-01-01", 5),
+    ("2023-01-20", 5.5),
+    ("2023-02-01", 6),
+    ("2023-02-15", 5.8),
+    ("2023-04-10", 7.2),
+    ("2023-04-10", 7.4),
+]
+
+
+@pytest.fixture()
+def journals(tmp_path: Path) -> Tuple[str, ...]:
+    set_backend(NativeBackend())
+    journal = """2023-01-05 Buy AAPL
+    Asset:Stocks    3 AAPL @ 5.2 USD
+    Asset:Bank
+
+P 2023-01-20 AAPL 5.5 USD
+P 2023-02-01 AAPL 6 USD
+"""
+    file_path = tmp_path.joinpath("data.journal")
+    file_path.write_text(journal)
+    return (str(file_path),)
+
+
+class TestPeriodPrices:
+    def test_daily(self):
+        daily = get_period_prices(prices, "daily")
+        assert [price_date for price_date, _ in daily] == [
+            "2023-01-01",
+            "2023-01-20",
+            "2023-02-01",
+            "2023-02-15",
+            "2023-04-10",
+        ]
+        assert daily[-1] == ("2023-04-10", 7.4)
+
+    def test_monthly(self):
+        assert get_period_prices(prices, "monthly") == [
+            ("2023-01-20", 5.5),
+            ("2023-02-15", 5.8),
+            ("2023-04-10", 7.4),
+        ]
+
+
+class TestSweepXirrs:
+    def test_same_as_cold(self):
+        points = sweep_xirrs(TxnColumns.from_txns(txns), prices)
+
+        assert [point.date for point in points] == [price[0] for price in prices[1:]]
+        for point in points:
+            point_txns = [txn for txn in txns if txn.date <= point.date]
+            expected = lib.get_xirr(
+                point.mkt_price, date.fromisoformat(point.date), point_txns
+            )
+            assert point.xirr == pytest.approx(expected)
+
+    def test_held_qtty(self):
+        points = sweep_xirrs(TxnColumns.from_txns(txns), prices)
+        assert [point.qtty for point in points] == [3, 3, 3, 4, 4]
+        assert points[-1].mkt_amount == pytest.approx(4 * 7.4)
+
+    def test_warm_same_as_cold(self):
+        columns = TxnColumns.from_txns(txns)
+        warm = sweep_xirrs(columns, prices)
+        cold = sweep_xirrs(columns, prices, warm=False)
+
+        assert [point.xirr for point in warm] == pytest.approx(
+            [point.xirr for point in cold]
+        )
+
+    def test_without_numpy(self, monkeypatch: pytest.MonkeyPatch):
+        columns = TxnColumns.from_txns(txns)
+        expected = [point.xirr for point in sweep_xirrs(columns, prices)]
+        monkeypatch.setattr(xirr_history, "HAS_NUMPY", False)
+
+        points = sweep_xirrs(columns, prices)
+        assert [point.xirr for point in points] == pytest.approx(expected)
+
+    def test_unsorted_txns(self):
+        points = sweep_xirrs(TxnColumns.from_txns(txns[::-1]), prices)
+        expected = sweep_xirrs(TxnColumns.from_txns(txns), prices)
+
+        assert points == expected
+
+    def test_errors_per_date(self):
+        points = sweep_xirrs(
+            TxnColumns.from_txns(txns), [*prices[:3], ("2023-02-10", 0)]
+        )
+
+        assert [point.error for point in points[:2]] == ["", ""]
+        assert points[2].xirr is None
+        assert "negative and positive" in points[2].error
+
+    def test_no_convergence(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(xirr_history, "xirr", lambda *args, **kwargs: None)
+        points = sweep_xirrs(TxnColumns.from_txns(txns), prices)
+
+        assert {point.error for point in points} == {"Xirr did not converge"}
+
+
+class TestAllXirrHistory:
+    def test_history(self, journals: Tuple[str, ...]):
+        history = AllXirrHistory(journals, "", "daily").history
+
+        assert [point["date"] for point in history] == ["2023-01-20", "2023-02-01"]
+        assert history[-1]["comm"] == "AAPL"
+        assert history[-1]["xirr"] == pytest.approx(6.2528, abs=0.0001)
+
+    def test_monthly_csv(self, journals: Tuple[str, ...]):
+        history_csv = AllXirrHistory(journals, "", "monthly", "aapl").history_csv()
+        rows = history_csv.read().splitlines()
+
+        assert rows[0] == "comm,date,qtty,mkt_price,mkt_amount,xirr,error"
+        assert len(rows) == 3
+
+    def test_same_as_list(self, journals: Tuple[str, ...]):
+        with open(journals[0], "a") as f:
+            f.write(
+                "\n2023-01-25 Sell AAPL\n"
+                "    Asset:Stocks    -1 AAPL @ 5.2 USD\n"
+                "    Asset:Bank    5.8 USD\n"
+                "    Revenue:Gains\n"
+            )
+
+        history = AllXirrHistory(journals, "", "daily").history
+        info = FifoInfo(journals, "AAPL", False)
+
+        assert history[-1]["qtty"] == 2
+        assert history[-1]["xirr"] == pytest.approx(
+            info.get_lots_xirr(date(2023, 1, 5))
+        )